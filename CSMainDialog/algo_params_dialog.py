@@ -0,0 +1,140 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QWidget, QLabel,
+                             QPushButton, QComboBox, QSpinBox, QDoubleSpinBox)
+from PyQt5.QtCore import QTimer
+
+try:
+    from .spot_algorithms import ALGORITHMS, get_algorithm, measure_cost
+except ImportError:
+    from spot_algorithms import ALGORITHMS, get_algorithm, measure_cost
+
+class AlgoParamsDialog(QDialog):
+    """
+    检测算法参数面板：按注册表中每个算法声明的参数生成输入控件，修改立即生效，
+    处理线程从下一帧起使用新参数，不需要重启。
+    参数保存在算法实例上，整个进程共享，三个相机使用同一套设置（各处统一经由 CSMainDialog 包导入）。
+    """
+
+    def __init__(self, parent=None, algo_type="A", log_func=None):
+        super(AlgoParamsDialog, self).__init__(parent)
+        self.setWindowTitle("检测算法参数")
+        self.setMinimumWidth(420)
+        self.log_func = log_func
+        self.editors = {}
+
+        self.init_ui()
+        index = self.algo_combo.findData(algo_type)
+        self.algo_combo.setCurrentIndex(max(index, 0))
+        self._build_form()
+
+        # 实测耗时每秒刷新
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._update_cost)
+        self.timer.start(1000)
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        self.algo_combo = QComboBox()
+        for key in sorted(ALGORITHMS):
+            self.algo_combo.addItem(f"{key} - {ALGORITHMS[key].name}", key)
+        self.algo_combo.currentIndexChanged.connect(self._build_form)
+        layout.addWidget(self.algo_combo)
+
+        self.desc_label = QLabel()
+        self.desc_label.setWordWrap(True)
+        layout.addWidget(self.desc_label)
+
+        self.form_container = QVBoxLayout()
+        layout.addLayout(self.form_container)
+        self.form_widget = None
+
+        self.cost_label = QLabel()
+        layout.addWidget(self.cost_label)
+
+        btn_layout = QHBoxLayout()
+        self.measure_btn = QPushButton("测量耗时")
+        self.measure_btn.clicked.connect(self.measure)
+        btn_layout.addWidget(self.measure_btn)
+        self.reset_btn = QPushButton("恢复默认")
+        self.reset_btn.clicked.connect(self.reset_params)
+        btn_layout.addWidget(self.reset_btn)
+        btn_layout.addStretch()
+        self.close_btn = QPushButton("关闭")
+        self.close_btn.clicked.connect(self.close)
+        btn_layout.addWidget(self.close_btn)
+        layout.addLayout(btn_layout)
+
+    def current_algo(self):
+        return get_algorithm(self.algo_combo.currentData())
+
+    def _build_form(self, *_):
+        """按当前算法的参数声明重建输入控件"""
+        algo = self.current_algo()
+        self.desc_label.setText(algo.description)
+        if self.form_widget is not None:
+            self.form_container.removeWidget(self.form_widget)
+            self.form_widget.deleteLater()
+        self.form_widget = QWidget()
+        form = QFormLayout(self.form_widget)
+        self.editors = {}
+        values = algo.get_params()
+        for p in algo.params:
+            if p.choices:
+                editor = QComboBox()
+                for text, value in p.choices:
+                    editor.addItem(text, value)
+                editor.setCurrentIndex(max(editor.findData(values[p.name]), 0))
+                editor.currentIndexChanged.connect(
+                    lambda _, name=p.name, e=editor: self._apply(name, e.currentData()))
+            elif isinstance(p.default, int):
+                editor = QSpinBox()
+                editor.setRange(int(p.minimum), int(p.maximum))
+                # 只取奇数的参数（核尺寸）最小值为奇数、步长 2，手动输入的偶数由 coerce 取到奇数
+                editor.setSingleStep(int(p.step))
+                editor.setValue(values[p.name])
+                editor.valueChanged.connect(lambda v, name=p.name: self._apply(name, v))
+            else:
+                editor = QDoubleSpinBox()
+                editor.setDecimals(2 if p.step >= 0.01 else 3)
+                editor.setRange(p.minimum, p.maximum)
+                editor.setSingleStep(p.step)
+                editor.setValue(values[p.name])
+                editor.valueChanged.connect(lambda v, name=p.name: self._apply(name, v))
+            self.editors[p.name] = editor
+            form.addRow(p.label, editor)
+        self.form_container.addWidget(self.form_widget)
+        self._update_cost()
+
+    def _apply(self, name, value):
+        algo = self.current_algo()
+        applied = algo.set_params(**{name: value})
+        editor = self.editors.get(name)
+        if applied[name] != value and isinstance(editor, (QSpinBox, QDoubleSpinBox)):
+            # 显示实际生效的值（如偶数核尺寸被取到奇数）
+            editor.blockSignals(True)
+            editor.setValue(applied[name])
+            editor.blockSignals(False)
+        if self.log_func:
+            self.log_func(f"[算法 {algo.key}] {algo.param(name).label} = {applied[name]}")
+
+    def _update_cost(self):
+        self.cost_label.setText(f"耗时：{self.current_algo().cost_text()}")
+
+    def measure(self):
+        """在合成帧上实测当前算法耗时（当前参数）"""
+        algo = self.current_algo()
+        cost = measure_cost([algo.key])[algo.key]
+        self._update_cost()
+        if self.log_func:
+            self.log_func(f"[算法 {algo.key}] 合成帧实测耗时 {cost:.1f} ms/MPix")
+
+    def reset_params(self):
+        algo = self.current_algo()
+        algo.reset_params()
+        self._build_form()
+        if self.log_func:
+            self.log_func(f"[算法 {algo.key}] 参数已恢复默认")
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        super(AlgoParamsDialog, self).closeEvent(event)
@@ -0,0 +1,224 @@
+# beam_analysis.py
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    from .frame_context import FrameContext
+    from .spot_algorithms import _background_level, _foreign_blobs, _neighbour_limits, _outside_cell
+except ImportError:
+    from frame_context import FrameContext
+    from spot_algorithms import _background_level, _foreign_blobs, _neighbour_limits, _outside_cell
+
+# 质心的亚像素偏移按 1/_SUBPIX 像素量化，半径图按 (半宽, 量化偏移) 缓存
+_SUBPIX = 4
+# 积分窗口半宽的上下限（像素），上限保证大光斑也能逐帧计算
+_MIN_HALF = 8
+_MAX_HALF = 512
+# 报告的能量比例：50% 与 1/e²（86.5%）
+EE_LEVELS = (0.5, 0.865)
+
+
+# ---------------- 半径图 ----------------
+@lru_cache(maxsize=256)
+def _radius_map(half, qx, qy):
+    """
+    (2·half+1)² 的整数半径图：像素到中心 (half + qx/_SUBPIX, half + qy/_SUBPIX) 的距离向下取整，
+    不小于 half 的像素都归入第 half 档（窗口内切圆以外，不计入曲线）。只读
+    """
+    r = np.arange(-half, half + 1, dtype=np.float64)
+    dx = r - qx / _SUBPIX
+    dy = r - qy / _SUBPIX
+    dist = np.sqrt(dy[:, None] ** 2 + dx[None, :] ** 2)
+    rmap = np.minimum(dist.astype(np.intp), half)
+    rmap.flags.writeable = False
+    return rmap
+
+@lru_cache(maxsize=256)
+def _ring_counts(half, qx, qy):
+    """完整窗口内每个半径档的像素数（用于减背景）"""
+    counts = np.bincount(_radius_map(half, qx, qy).ravel(), minlength=half + 1)[:half].astype(np.float64)
+    counts.flags.writeable = False
+    return counts
+
+def _window_half(spot, limit=np.inf):
+    """
+    积分窗口半宽：与二阶矩相同取 1.5 倍 D4σ（ISO 11146 的 3 倍光束宽度窗口），
+    且不超过 limit（到最近的其他光斑距离的一半，见 _spot_windows）
+    """
+    d4 = max(float(spot["d4x"]), float(spot["d4y"]))
+    half = int(np.ceil(1.5 * d4)) + 1 if d4 > 0 else int(float(spot["radius"]) * 8)
+    half = min(max(half, _MIN_HALF), _MAX_HALF)
+    if np.isfinite(limit):
+        half = min(half, max(int(limit), 1))
+    return half
+
+def _spot_windows(gray, spots, background):
+    """
+    各光斑的积分窗口半宽：1.5 倍 D4σ，再限制在到最近的其他光斑（已检出的光斑，
+    以及窗口里未检出的亮斑，见 spot_algorithms._foreign_blobs）距离的一半以内，
+    半径不超过窗口半宽的圆不会进入相邻光斑一侧
+    """
+    h, w = gray.shape[:2]
+    windows = []
+    for s, limit in zip(spots, _neighbour_limits(spots)):
+        half = _window_half(s, limit)
+        x, y = int(round(float(s["x"]))), int(round(float(s["y"])))
+        x0, y0 = max(x - half, 0), max(y - half, 0)
+        roi = gray[y0:min(y + half + 1, h), x0:min(x + half + 1, w)].astype(np.float32)
+        roi -= background
+        blobs = _foreign_blobs(roi, x - x0, y - y0)
+        if blobs:
+            nearest = min(np.hypot(bx + x0 - x, by + y0 - y) for bx, by in blobs)
+            half = min(half, max(int(nearest / 2.0), 1))
+        windows.append(half)
+    return windows
+
+
+# ---------------- 环围能量 ----------------
+@dataclass
+class EncircledEnergy:
+    """一个光斑的环围能量曲线（以亮度加权质心为圆心）"""
+    cx: float
+    cy: float
+    radii: np.ndarray            # 圆半径（像素）：1, 2, …, half
+    fraction: np.ndarray         # 该半径以内能量占窗口内总能量的比例，单调不减，0~1
+    total: float                 # 窗口内总能量（已减背景，灰度×像素）
+    clipped: bool = False        # 积分窗口超出图像边界，曲线偏低
+
+    def radius_at(self, level):
+        """包含 level（0~1）比例能量的圆半径（像素，线性插值）"""
+        return float(np.interp(level, self.fraction, self.radii))
+
+    def power_in_bucket(self, radius):
+        """半径 radius（像素）的桶内能量比例"""
+        return float(np.interp(radius, np.r_[0.0, self.radii], np.r_[0.0, self.fraction]))
+
+def encircled_energy(gray, cx, cy, half, background=0.0):
+    """
+    以 (cx, cy) 为圆心、半宽 half 的窗口内的环围能量曲线。
+    每个像素的整数半径取自缓存的半径图（圆心亚像素偏移量化到 1/_SUBPIX 像素），
+    各半径档的能量用一次带权 np.bincount 求出，再减去背景、累加、归一。
+    窗口内没有能量时返回 None
+    """
+    h, w = gray.shape[:2]
+    ix, iy = int(np.floor(cx)), int(np.floor(cy))
+    qx, qy = int(round((cx - ix) * _SUBPIX)), int(round((cy - iy) * _SUBPIX))
+    if qx == _SUBPIX:
+        ix, qx = ix + 1, 0
+    if qy == _SUBPIX:
+        iy, qy = iy + 1, 0
+    x0, y0 = ix - half, iy - half
+    sx0, sy0 = max(x0, 0), max(y0, 0)
+    sx1, sy1 = min(ix + half + 1, w), min(iy + half + 1, h)
+    if sx0 >= sx1 or sy0 >= sy1:
+        return None
+    rmap = _radius_map(half, qx, qy)
+    clipped = (sx1 - sx0, sy1 - sy0) != (2 * half + 1, 2 * half + 1)
+    if clipped:
+        rmap = rmap[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0]
+        counts = np.bincount(rmap.ravel(), minlength=half + 1)[:half]
+    else:
+        counts = _ring_counts(half, qx, qy)
+    roi = gray[sy0:sy1, sx0:sx1]
+    ring = np.bincount(rmap.ravel(), weights=roi.ravel(), minlength=half + 1)[:half]
+    ring -= background * counts
+    cum = np.cumsum(ring)
+    total = float(cum[-1])
+    if total <= 0:
+        return None
+    fraction = np.maximum.accumulate(np.clip(cum / total, 0.0, 1.0))
+    return EncircledEnergy(float(cx), float(cy), np.arange(1, half + 1, dtype=np.float64),
+                           fraction, total, clipped)
+
+def analyze_spots(img, result):
+    """
+    为 result（SpotResult）中每个光斑计算环围能量，写入 result.energy 并返回该列表
+    （与 spots 同序，无能量的光斑为 None；多光斑时各自的窗口见 _spot_windows）；同时把主光斑（spots[0]）的 X / Y 剖面写入 result.profile。
+    img 可以是本帧的 FrameContext，背景与二阶矩使用同一估计。
+    每个光斑只有两次 bincount，剖面只是切片和求和，可以与 detect_spots 一起逐帧运行。
+    """
+    result.energy = []
+    result.profile = None
+    if not result.ok or not len(result):
+        return result.energy
+    ctx = FrameContext.of(img)
+    gray = ctx.gray
+    background = _background_level(ctx)
+    windows = _spot_windows(gray, result.spots, background)
+    result.energy = [encircled_energy(gray, float(s["cx"]), float(s["cy"]), half, background)
+                     for s, half in zip(result.spots, windows)]
+    others = [(float(s["x"]), float(s["y"])) for s in result.spots[1:]]
+    result.profile = beam_profile(gray, result.spots[0], background, windows[0], others)
+    return result.energy
+
+
+# ---------------- X / Y 剖面 ----------------
+@dataclass
+class BeamProfile:
+    """过主光斑质心的 X / Y 切线和窗口内的积分投影，坐标为整幅图的像素坐标"""
+    cx: float
+    cy: float
+    x: np.ndarray                # 横向像素坐标
+    x_cut: np.ndarray            # 过质心的一行灰度
+    x_proj: np.ndarray           # 窗口内按列求和（已减背景）
+    y: np.ndarray                # 纵向像素坐标
+    y_cut: np.ndarray            # 过质心的一列灰度
+    y_proj: np.ndarray           # 窗口内按行求和（已减背景）
+
+def beam_profile(gray, spot, background=0.0, half=None, others=()):
+    """
+    一个光斑的 X / Y 剖面：窗口与环围能量相同（half，默认 _window_half），切线直接取 gray 的一行 / 一列切片，
+    投影为窗口 ROI 减去背景后的 sum(axis=0) / sum(axis=1)；窗口角上离 others（其他光斑圆心）
+    或窗口内其他亮斑更近的像素不计入投影。结果是窗口内几百个数的副本，不引用帧缓冲区
+    """
+    h, w = gray.shape[:2]
+    cx, cy = float(spot["cx"]), float(spot["cy"])
+    if half is None:
+        half = _window_half(spot)
+    ix = min(max(int(round(cx)), 0), w - 1)
+    iy = min(max(int(round(cy)), 0), h - 1)
+    x0, x1 = max(ix - half, 0), min(ix + half + 1, w)
+    y0, y1 = max(iy - half, 0), min(iy + half + 1, h)
+    roi = gray[y0:y1, x0:x1].astype(np.float64)
+    roi -= background
+    blobs = [(bx + x0, by + y0) for bx, by in _foreign_blobs(roi, ix - x0, iy - y0)]
+    outside = _outside_cell(x0, y0, y1 - y0, x1 - x0, float(spot["x"]), float(spot["y"]), list(others) + blobs)
+    if outside is not None:
+        roi[outside] = 0.0
+    return BeamProfile(cx, cy,
+                       np.arange(x0, x1, dtype=np.float64), gray[iy, x0:x1].astype(np.float64),
+                       roi.sum(axis=0),
+                       np.arange(y0, y1, dtype=np.float64), gray[y0:y1, ix].astype(np.float64),
+                       roi.sum(axis=1))
+
+
+# ---------------- 导出 ----------------
+def energy_summary(ee, bucket_radius=None):
+    """一行文字摘要：r50 / r86.5 以及桶内能量"""
+    parts = [f"r{level * 100:g}={ee.radius_at(level):.1f}px" for level in EE_LEVELS]
+    if bucket_radius:
+        parts.append(f"PIB(r={bucket_radius:g}px)={ee.power_in_bucket(bucket_radius):.1%}")
+    if ee.clipped:
+        parts.append("窗口超出图像边界")
+    return " ".join(parts)
+
+def save_energy_csv(path, energies, bucket_radius=None):
+    """
+    把各光斑的环围能量曲线写成 CSV：开头每个光斑一行 # 注释（质心、r50、r86.5、桶内能量），
+    之后为 radius_px, spot1, spot2, … 各列，曲线较短的光斑后面留空。
+    没有曲线的光斑（None）不写，其余光斑保留原来的序号，与能量曲线窗口里的 #N 一致
+    """
+    energies = [(i + 1, ee) for i, ee in enumerate(energies) if ee is not None]
+    if not energies:
+        return False
+    n = max(len(ee.radii) for _, ee in energies)
+    with open(path, 'w', encoding='utf-8') as f:
+        for no, ee in energies:
+            f.write(f"# 光斑 {no}: cx={ee.cx:.2f} cy={ee.cy:.2f} {energy_summary(ee, bucket_radius)}\n")
+        f.write("radius_px," + ",".join(f"spot{no}" for no, _ in energies) + "\n")
+        for k in range(n):
+            cells = [f"{ee.fraction[k]:.5f}" if k < len(ee.fraction) else "" for _, ee in energies]
+            f.write(f"{k + 1}," + ",".join(cells) + "\n")
+    return True
@@ -0,0 +1,281 @@
+# calibration.py
+import os
+import threading
+
+import cv2
+import numpy as np
+
+CALIB_DIR = "calibration"
+
+# 平场增益上限：死像素 / 暗角极深处不再无限放大
+_MAX_GAIN = 4.0
+
+# 坏点判定：暗场中比 3×3 中值高出 HOT_THRESHOLD 个灰度级为热像素，
+# 平场中偏离 3×3 中值超过 DEAD_RATIO 倍为死像素 / 亮像素
+HOT_THRESHOLD = 20
+DEAD_RATIO = 0.5
+
+# 不原地校正时轮流使用的输出缓冲区个数：校正后的帧会交给界面线程显示，
+# 下一帧不能马上覆盖它
+OUT_BUFFERS = 3
+
+# 8 邻域偏移 (dy, dx)
+_NEIGHBORS = np.array([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+
+
+def find_defects(dark=None, flat=None, hot_threshold=HOT_THRESHOLD, dead_ratio=DEAD_RATIO):
+    """由平均暗场 / 平场找出坏点，返回按行优先的平面像素下标（升序）；多通道任一通道异常即算坏点"""
+    bad = None
+    if dark is not None:
+        med = cv2.medianBlur(dark, 3)
+        hot = dark.astype(np.int16) - med > hot_threshold
+        bad = hot if hot.ndim == 2 else hot.any(axis=2)
+    if flat is not None:
+        med = cv2.medianBlur(flat.astype(np.float32), 3)
+        dead = np.abs(flat - med) > dead_ratio * np.maximum(med, 1.0)
+        dead = dead if dead.ndim == 2 else dead.any(axis=2)
+        bad = dead if bad is None else bad | dead
+    if bad is None:
+        return np.zeros(0, np.int64)
+    return np.flatnonzero(bad)
+
+
+class DefectMap:
+    """
+    稀疏坏点表：坏点下标，以及每个坏点 8 邻域中好像素的下标和个数（加载时算好）。
+    每帧只做一次 gather（邻域取值求平均）和一次 scatter（写回坏点），
+    开销只与坏点数有关，与画面大小无关。
+    """
+    __slots__ = ("index", "neighbors", "valid", "count")
+
+    def __init__(self, index, shape):
+        h, w = shape[:2]
+        index = np.asarray(index, np.int64)
+        ys, xs = np.divmod(index, w)
+        ny = ys[:, None] + _NEIGHBORS[:, 0]
+        nx = xs[:, None] + _NEIGHBORS[:, 1]
+        valid = (ny >= 0) & (ny < h) & (nx >= 0) & (nx < w)
+        neighbors = np.where(valid, ny * w + nx, 0)
+        is_bad = np.zeros(h * w, bool)
+        is_bad[index] = True
+        valid &= ~is_bad[neighbors]
+        count = valid.sum(axis=1)
+        keep = count > 0          # 成片坏点中间没有好邻居的像素保持原样
+        self.index = index[keep]
+        self.neighbors = neighbors[keep]
+        self.valid = valid[keep][:, :, None]
+        self.count = count[keep][:, None]
+
+    def __len__(self):
+        return len(self.index)
+
+    def apply(self, frame):
+        """用好邻居的均值原地替换坏点；frame 须为 C 连续数组"""
+        if not len(self.index):
+            return frame
+        pixels = frame.reshape(frame.shape[0] * frame.shape[1], -1)
+        vals = (pixels[self.neighbors] * self.valid).sum(axis=1) // self.count
+        pixels[self.index] = vals
+        return frame
+
+
+class CalibrationMaps:
+    """
+    一台相机在一种分辨率下的标定图：暗场（uint8）、平场均值（float32）、
+    由两者得到的增益图，以及坏点表
+    """
+    __slots__ = ("dark", "flat", "gain", "defects")
+
+    def __init__(self, dark=None, flat=None, defects=None):
+        self.dark = dark
+        self.flat = flat
+        self.gain = None
+        self.defects = defects
+        self.update_gain()
+
+    def update_gain(self):
+        """增益 = 平场信号均值 / 各像素平场信号（先减暗场），按通道归一到均值 1"""
+        if self.flat is None:
+            self.gain = None
+            return
+        signal = self.flat - self.dark if self.dark is not None else self.flat.copy()
+        np.maximum(signal, 1.0, out=signal)
+        gain = signal.mean(axis=(0, 1)) / signal
+        np.minimum(gain, _MAX_GAIN, out=gain)
+        self.gain = gain.astype(np.float32)
+
+    @property
+    def empty(self):
+        return self.dark is None and self.gain is None and self.defects is None
+
+
+class Calibrator:
+    """
+    单台相机的暗场 / 平场 / 坏点校正。
+    标定图按 相机名 + 分辨率（含通道数）保存在 CALIB_DIR 下，第一次遇到该尺寸的帧时才从磁盘读取；
+    每帧在原数组上（或按尺寸预先分配、轮流使用的输出缓冲区中）cv2.subtract 暗场、
+    cv2.multiply 增益，不分配新数组，再用坏点表把热像素 / 死像素替换成邻域均值。
+    采集标定：start_capture("dark" / "flat", n) 后，接下来的 n 帧原样累加到预先分配的
+    float64 缓冲区（这些帧不做校正），满 n 帧取平均、保存并立即生效；
+    每次采集完成后由现有的暗场 / 平场重新生成坏点表（find_defects）。
+    坏点校正过的帧不再有孤立热像素，检测时可以少做开运算（见 corrects_defects）。
+    process() 可在采集 / 处理线程中调用，start_capture 等在界面线程中调用。
+    """
+
+    def __init__(self, camera, root=CALIB_DIR):
+        self.camera = camera
+        self.root = root
+        self.enabled = True
+        self.fix_defects = True    # 坏点替换开关
+        self.message = ""          # 最近一次采集 / 加载的结果说明，供界面显示
+        self._maps = {}            # 帧形状 -> CalibrationMaps
+        self._lock = threading.Lock()
+        self._capture = None       # 采集中：[类型, 目标帧数, 已采帧数, 累加缓冲区]
+        self._out = {}             # 帧形状 -> [输出缓冲区列表, 下一个使用的序号]
+
+    # ---------------- 文件 ----------------
+    def _path(self, shape, kind):
+        h, w = shape[:2]
+        c = shape[2] if len(shape) == 3 else 1
+        return os.path.join(self.root, f"{self.camera}_{w}x{h}x{c}_{kind}.npy")
+
+    def maps(self, shape):
+        """该尺寸的标定图，第一次调用时从磁盘加载（没有文件时为空的 CalibrationMaps）"""
+        shape = tuple(shape)
+        m = self._maps.get(shape)
+        if m is None:
+            arrays = {}
+            for kind in ("dark", "flat", "defects"):
+                path = self._path(shape, kind)
+                if os.path.exists(path):
+                    arrays[kind] = np.load(path)
+            defects = DefectMap(arrays["defects"], shape) if "defects" in arrays else None
+            m = self._maps[shape] = CalibrationMaps(arrays.get("dark"), arrays.get("flat"), defects)
+            if not m.empty:
+                self.message = f"已加载 {self.camera} {shape[1]}×{shape[0]} 标定图"
+        return m
+
+    def clear(self):
+        """删除本相机所有已保存的标定图"""
+        with self._lock:
+            for shape in list(self._maps):
+                for kind in ("dark", "flat", "defects"):
+                    path = self._path(shape, kind)
+                    if os.path.exists(path):
+                        os.remove(path)
+            self._maps.clear()
+            self._capture = None
+        self.message = f"{self.camera} 标定图已清除"
+
+    # ---------------- 采集 ----------------
+    def start_capture(self, kind, n=32):
+        """开始采集 n 帧暗场（遮住镜头）或平场（均匀照明）"""
+        if kind not in ("dark", "flat"):
+            raise ValueError(f"未知标定类型 {kind}")
+        with self._lock:
+            self._capture = [kind, max(int(n), 1), 0, None]
+        self.message = f"正在采集{'暗场' if kind == 'dark' else '平场'}…"
+
+    def progress(self):
+        """采集中返回 (类型, 已采帧数, 目标帧数)，否则返回 None"""
+        cap = self._capture
+        return None if cap is None else (cap[0], cap[2], cap[1])
+
+    def _accumulate(self, frame):
+        kind, n, count, acc = self._capture
+        if acc is None or acc.shape != frame.shape:
+            # 第一帧或中途分辨率变化：重新开始累加
+            acc = np.zeros(frame.shape, np.float64)
+            count = 0
+        cv2.accumulate(frame, acc)
+        count += 1
+        self._capture = [kind, n, count, acc]
+        if count < n:
+            return
+        self._capture = None
+        mean = acc / n
+        m = self.maps(frame.shape)
+        if kind == "dark":
+            arr = np.clip(np.round(mean), 0, 255).astype(np.uint8)
+            m.dark = arr
+        else:
+            arr = mean.astype(np.float32)
+            m.flat = arr
+        m.update_gain()
+        index = find_defects(m.dark, m.flat)
+        m.defects = DefectMap(index, frame.shape)
+        os.makedirs(self.root, exist_ok=True)
+        np.save(self._path(frame.shape, kind), arr)
+        np.save(self._path(frame.shape, "defects"), index)
+        self.message = (f"{'暗场' if kind == 'dark' else '平场'}已保存（{n} 帧平均，"
+                        f"{frame.shape[1]}×{frame.shape[0]}），坏点 {len(m.defects)} 个")
+
+    # ---------------- 每帧调用 ----------------
+    def _out_buffer(self, shape):
+        """该尺寸的下一个输出缓冲区（OUT_BUFFERS 个轮流使用，只在第一次遇到该尺寸时分配）"""
+        entry = self._out.get(shape)
+        if entry is None:
+            entry = self._out[shape] = [[np.empty(shape, np.uint8) for _ in range(OUT_BUFFERS)], 0]
+        bufs, i = entry
+        entry[1] = (i + 1) % len(bufs)
+        return bufs[i]
+
+    def process(self, frame, inplace=True):
+        """
+        每帧调用一次：采集中把原始帧累加进标定缓冲区；否则若有标定图，原地校正。
+        返回校正后的帧（通常就是传入的数组）。
+        传入的帧同时被其他线程使用（如界面直接显示原始帧）时用 inplace=False：
+        校正结果直接写进本尺寸轮流使用的输出缓冲区，不改动传入的数组，也不每帧复制；
+        返回的帧在之后的 OUT_BUFFERS - 1 次调用内保持不变。只读 / 非连续数组同样写入输出缓冲区
+        """
+        if frame is None or frame.dtype != np.uint8:
+            return frame
+        if self._capture is not None:
+            with self._lock:
+                if self._capture is not None:
+                    self._accumulate(frame)
+                    return frame
+        if not self.enabled:
+            return frame
+        m = self.maps(frame.shape)
+        if m.empty:
+            return frame
+        out = frame
+        if not (inplace and frame.flags.writeable and frame.flags.c_contiguous):
+            out = self._out_buffer(frame.shape)
+        if m.dark is not None:
+            cv2.subtract(frame, m.dark, dst=out)
+            frame = out
+        if m.gain is not None:
+            cv2.multiply(frame, m.gain, dst=out, dtype=cv2.CV_8U)
+            frame = out
+        if self.fix_defects and m.defects is not None:
+            if frame is not out:
+                np.copyto(out, frame)
+            m.defects.apply(out)
+        return out
+
+    def corrects_defects(self, shape):
+        """该尺寸的帧是否经过坏点替换（检测可据此减少开运算次数）"""
+        if not (self.enabled and self.fix_defects) or self._capture is not None:
+            return False
+        m = self._maps.get(tuple(shape))
+        return m is not None and m.defects is not None
+
+    def status_text(self):
+        p = self.progress()
+        if p is not None:
+            kind, count, n = p
+            return f"{'暗场' if kind == 'dark' else '平场'}采集中 {count}/{n}"
+        loaded = [s for s, m in self._maps.items() if not m.empty]
+        state = "校正已启用" if self.enabled else "校正已关闭"
+        if not loaded:
+            return f"{state}（当前分辨率无标定图）"
+        parts = []
+        for s in loaded:
+            m = self._maps[s]
+            kinds = "+".join(k for k, a in (("暗场", m.dark), ("平场", m.flat)) if a is not None)
+            if m.defects is not None:
+                kinds += f"，坏点 {len(m.defects)} 个" + ("" if self.fix_defects else "（未替换）")
+            parts.append(f"{s[1]}×{s[0]} {kinds}")
+        return f"{state}：" + "，".join(parts)
@@ -0,0 +1,101 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                             QCheckBox, QSpinBox)
+from PyQt5.QtCore import QTimer
+
+
+class CalibrationDialog(QDialog):
+    """
+    暗场 / 平场标定面板：采集 N 帧求平均并保存，之后每帧自动校正。
+    采集在相机处理线程中进行，这里每 200 ms 轮询一次进度，不跨线程调用界面。
+    """
+
+    def __init__(self, calibrator, parent=None, log_func=None):
+        super(CalibrationDialog, self).__init__(parent)
+        self.setWindowTitle(f"{calibrator.camera} 暗场 / 平场标定")
+        self.setMinimumWidth(420)
+        self.calibrator = calibrator
+        self.log_func = log_func
+        self._last_message = calibrator.message
+
+        self.init_ui()
+        self.refresh()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(200)
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        n_layout = QHBoxLayout()
+        n_layout.addWidget(QLabel("平均帧数"))
+        self.n_spin = QSpinBox()
+        self.n_spin.setRange(1, 500)
+        self.n_spin.setValue(32)
+        n_layout.addWidget(self.n_spin)
+        n_layout.addStretch()
+        layout.addLayout(n_layout)
+
+        btn_layout = QHBoxLayout()
+        self.dark_btn = QPushButton("采集暗场（遮光）")
+        self.dark_btn.clicked.connect(lambda: self.start("dark"))
+        btn_layout.addWidget(self.dark_btn)
+        self.flat_btn = QPushButton("采集平场（均匀照明）")
+        self.flat_btn.clicked.connect(lambda: self.start("flat"))
+        btn_layout.addWidget(self.flat_btn)
+        self.clear_btn = QPushButton("清除标定")
+        self.clear_btn.clicked.connect(self.clear)
+        btn_layout.addWidget(self.clear_btn)
+        layout.addLayout(btn_layout)
+
+        check_layout = QHBoxLayout()
+        self.enable_check = QCheckBox("启用校正")
+        self.enable_check.setChecked(self.calibrator.enabled)
+        self.enable_check.toggled.connect(self.toggle_enabled)
+        check_layout.addWidget(self.enable_check)
+        # 坏点表由暗场 / 平场自动生成；替换后检测少做开运算
+        self.defects_check = QCheckBox("坏点替换")
+        self.defects_check.setChecked(self.calibrator.fix_defects)
+        self.defects_check.toggled.connect(self.toggle_defects)
+        check_layout.addWidget(self.defects_check)
+        check_layout.addStretch()
+        layout.addLayout(check_layout)
+
+        self.status_label = QLabel()
+        self.status_label.setWordWrap(True)
+        layout.addWidget(self.status_label)
+
+        self.close_btn = QPushButton("关闭")
+        self.close_btn.clicked.connect(self.close)
+        layout.addWidget(self.close_btn)
+
+    def start(self, kind):
+        self.calibrator.start_capture(kind, self.n_spin.value())
+        self.refresh()
+
+    def clear(self):
+        self.calibrator.clear()
+        self.refresh()
+
+    def toggle_enabled(self, enabled):
+        self.calibrator.enabled = enabled
+        self.refresh()
+
+    def toggle_defects(self, enabled):
+        self.calibrator.fix_defects = enabled
+        self.refresh()
+
+    def refresh(self):
+        capturing = self.calibrator.progress() is not None
+        self.dark_btn.setEnabled(not capturing)
+        self.flat_btn.setEnabled(not capturing)
+        self.status_label.setText(self.calibrator.status_text())
+        message = self.calibrator.message
+        if message != self._last_message:
+            self._last_message = message
+            if self.log_func and message:
+                self.log_func(f"[标定] {message}")
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        super(CalibrationDialog, self).closeEvent(event)
@@ -7,6 +7,11 @@ import time
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
+try:
+    from .frame_context import FrameContext
+except ImportError:
+    from frame_context import FrameContext
+
 # 隐藏 tkinter 主窗口
 root = tk.Tk()
 root.withdraw()
@@ -107,7 +112,7 @@ def AutoAdjustExposureGain(camera,
 
         img = np.frombuffer(buf.GetBufferPtr(), dtype=np.uint8).reshape(
             buf.GetHeight(), buf.GetWidth())
-        initial_bright_value = np.percentile(img, percentile)
+        initial_bright_value = FrameContext(img).percentile(percentile)
         print(f"初始检测: 第 {percentile}% 亮度 = {initial_bright_value:.2f}")
 
         if initial_bright_value < min_bright_threshold:
@@ -129,7 +134,7 @@ def AutoAdjustExposureGain(camera,
 
             img = np.frombuffer(buf.GetBufferPtr(), dtype=np.uint8).reshape(
                 buf.GetHeight(), buf.GetWidth())
-            bright_value = np.percentile(img, percentile)
+            bright_value = FrameContext(img).percentile(percentile)
             print(f"迭代 {i + 1}: 第 {percentile}% 亮度 = {bright_value:.2f}  "
                   f"(曝光={current_exp:.1f}, 增益={current_gain:.2f})")
 
@@ -178,6 +183,24 @@ def AutoAdjustExposureGain(camera,
     return True
 
 
+def GetFrameRate(camera, names=("AcquisitionFrameRate", "AcquisitionFrameRateAbs")):
+    """读取相机当前的采集帧率（Hz），相机不支持或读取失败时返回 None"""
+    pars = camera.GetCameraParameters()
+    if pars is None:
+        return None
+    for name in names:
+        try:
+            par = pars.GetFloat(name)
+            if par is None:
+                continue
+            fps = float(par.GetValue()[1])
+            if fps > 0:
+                return fps
+        except Exception as e:
+            print(f"读取 {name} 失败: {e}")
+    return None
+
+
 # ---------------- 以下函数保持原样 ----------------
 def SetupExposure(camera, expValue):
     pars = camera.GetCameraParameters()
@@ -0,0 +1,89 @@
+import time
+
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox,
+                             QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+
+try:
+    from .spot_algorithms import get_error_stats, reset_error_stats, set_error_logger
+except ImportError:
+    from spot_algorithms import get_error_stats, reset_error_stats, set_error_logger
+
+class DiagnosticsDialog(QDialog):
+    """
+    检测诊断面板：按错误码显示累计次数和最后一次发生的时间 / 信息，每秒刷新。
+    勾选“限频日志”后，检测错误按错误码每 5 秒最多写一条到 log_func（在界面线程中调用）。
+    统计在整个进程内共享，三个相机的检测错误都计入同一张表
+    （前提是各处都经由 CSMainDialog.spot_algorithms 导入，重复导入时 spot_algorithms 会给出警告）。
+    """
+    error_log_signal = pyqtSignal(str)
+
+    def __init__(self, parent=None, log_func=None):
+        super(DiagnosticsDialog, self).__init__(parent)
+        self.setWindowTitle("检测诊断")
+        self.setMinimumSize(640, 360)
+        self.log_func = log_func
+        # 检测线程里触发的日志经信号转到界面线程再写
+        self.error_log_signal.connect(self._write_log)
+
+        self.init_ui()
+        self.refresh()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["错误码", "说明", "次数", "最后发生"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        btn_layout = QHBoxLayout()
+        self.log_check = QCheckBox("限频日志（每类错误 5 秒最多一条）")
+        self.log_check.setEnabled(self.log_func is not None)
+        self.log_check.toggled.connect(self.toggle_logging)
+        btn_layout.addWidget(self.log_check)
+        btn_layout.addStretch()
+
+        self.reset_btn = QPushButton("清零")
+        self.reset_btn.clicked.connect(self.reset_stats)
+        btn_layout.addWidget(self.reset_btn)
+
+        self.close_btn = QPushButton("关闭")
+        self.close_btn.clicked.connect(self.close)
+        btn_layout.addWidget(self.close_btn)
+        layout.addLayout(btn_layout)
+
+    def refresh(self):
+        stats = get_error_stats()
+        self.table.setRowCount(len(stats))
+        for row, (code, st) in enumerate(stats.items()):
+            last = "-"
+            if st["last_time"] is not None:
+                last = time.strftime("%H:%M:%S", time.localtime(st["last_time"])) + "  " + st["last_message"]
+            for col, text in enumerate([str(code), st["name"], str(st["count"]), last]):
+                item = QTableWidgetItem(text)
+                if col in (0, 2):
+                    item.setTextAlignment(Qt.AlignCenter)
+                self.table.setItem(row, col, item)
+
+    def reset_stats(self):
+        reset_error_stats()
+        self.refresh()
+
+    def toggle_logging(self, enabled):
+        set_error_logger(self.error_log_signal.emit if enabled else None)
+
+    def _write_log(self, message):
+        if self.log_func:
+            self.log_func(message)
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        if self.log_check.isChecked():
+            set_error_logger(None)
+        super(DiagnosticsDialog, self).closeEvent(event)
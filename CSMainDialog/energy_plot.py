@@ -0,0 +1,76 @@
+import pyqtgraph as pg
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox
+
+try:
+    from .beam_analysis import energy_summary
+except ImportError:
+    from beam_analysis import energy_summary
+
+# 各光斑曲线颜色，按光斑编号
+_CURVE_COLORS = ((231, 76, 60), (46, 204, 113), (52, 152, 219))
+
+class EnergyPlotWidget(QWidget):
+    """
+    环围能量小图：每个光斑一条曲线（横轴半径 px，纵轴能量比例），
+    竖线为桶半径，下方文字为各光斑 r50 / r86.5 和桶内能量。
+    只在界面线程中调用 update_energy；曲线数据来自 SpotResult.energy。
+    """
+
+    def __init__(self, parent=None, bucket_radius=20):
+        super(EnergyPlotWidget, self).__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.plot = pg.PlotWidget()
+        self.plot.setBackground('w')
+        self.plot.setLabel('left', '能量比例')
+        self.plot.setLabel('bottom', '半径 (px)')
+        self.plot.setYRange(0, 1.05)
+        self.plot.showGrid(x=True, y=True, alpha=0.3)
+        self.plot.setMinimumHeight(140)
+        self.curves = [self.plot.plot(pen=pg.mkPen(color, width=2)) for color in _CURVE_COLORS]
+        self.bucket_line = pg.InfiniteLine(pos=bucket_radius, angle=90, movable=False,
+                                           pen=pg.mkPen((127, 140, 141), style=Qt.DashLine))
+        self.plot.addItem(self.bucket_line)
+        layout.addWidget(self.plot)
+
+        bucket_layout = QHBoxLayout()
+        bucket_layout.addWidget(QLabel("桶半径"))
+        self.bucket_spin = QSpinBox()
+        self.bucket_spin.setRange(1, 2000)
+        self.bucket_spin.setSuffix(" px")
+        self.bucket_spin.setValue(bucket_radius)
+        self.bucket_spin.valueChanged.connect(self._on_bucket_changed)
+        bucket_layout.addWidget(self.bucket_spin)
+        bucket_layout.addStretch()
+        layout.addLayout(bucket_layout)
+
+        self.info_label = QLabel("无光斑")
+        self.info_label.setWordWrap(True)
+        layout.addWidget(self.info_label)
+
+        self._energies = []
+
+    def bucket_radius(self):
+        return self.bucket_spin.value()
+
+    def _on_bucket_changed(self, value):
+        self.bucket_line.setValue(value)
+        self._update_text()
+
+    def update_energy(self, energies):
+        """刷新曲线；energies 为 SpotResult.energy（与光斑同序，可含 None）"""
+        self._energies = list(energies or [])
+        for i, curve in enumerate(self.curves):
+            ee = self._energies[i] if i < len(self._energies) else None
+            if ee is None:
+                curve.clear()
+            else:
+                curve.setData(ee.radii, ee.fraction)
+        self._update_text()
+
+    def _update_text(self):
+        lines = [f"#{i + 1} {energy_summary(ee, self.bucket_radius())}"
+                 for i, ee in enumerate(self._energies[:len(self.curves)]) if ee is not None]
+        self.info_label.setText("\n".join(lines) if lines else "无光斑")
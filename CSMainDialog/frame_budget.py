@@ -0,0 +1,175 @@
+# frame_budget.py
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class BudgetLevel:
+    """一个降级档位：在用户设置的基础上覆盖哪些处理参数"""
+    name: str
+    pyramid: int = 1                 # 检测分辨率下限（与用户选择取较大者）
+    stride: int = 1                  # 每 stride 帧处理一帧
+
+
+# 阶段名在界面上的显示文字
+_STAGE_NAMES = {"detect": "检测", "energy": "环围能量", "display": "显示"}
+
+# 由轻到重逐级降级，每一级都包含前一级的措施，且每一级都确实减少每帧耗时、不丢光斑：
+# 1/4 金字塔对 A / B / C / D 不增加漏检，检测耗时降到约 1/3；
+# 连通域算法 E 与 A 全分辨率耗时相近、又不走金字塔，换成 E 反而比降采样慢，不作为档位；
+# 热度图与原图、叠加图由同一张缩小图生成，跳过它几乎不省时间，也不作为档位
+BUDGET_LEVELS = [
+    BudgetLevel("全速"),
+    BudgetLevel("降采样", pyramid=4),
+    BudgetLevel("隔帧处理", pyramid=4, stride=2),
+    BudgetLevel("每4帧处理", pyramid=4, stride=4),
+]
+
+
+class FrameBudget:
+    """
+    帧预算控制器：让每帧处理耗时不超过相机帧周期。
+    处理线程每帧调用：
+      begin_frame()  帧到达时调用，返回本帧是否需要处理（隔帧档位下跳过其余帧）；
+      plan(...)      得到当前档位下实际使用的 (算法, 金字塔倍数)；
+      record(...)    上报各阶段耗时（毫秒）。
+    界面线程中完成的阶段（显示窗格渲染）用 record_deferred(...) 上报，并入下一帧的 record。
+    连续 degrade_after 帧超出预算就降一级；连续 recover_after 帧预计的上一级耗时
+    低于上一级预算的 recover_ratio 倍才恢复一级（迟滞，避免来回抖动）。
+    上一级的耗时不能用当前（更廉价）档位的耗时代替：每一级记录实测耗时的滑动平均，
+    在当前档位稳定 recover_after 帧后记下上一级与本级的耗时比，之后按本级实测耗时 × 该比例估计，
+    场景变化使本级变快时估计也随之下降；还没有上一级实测时按金字塔倍数的像素比放大估计。
+    fps 为 None 时按帧到达间隔自动估计帧周期。可在多个线程中调用。
+    """
+
+    def __init__(self, fps=None, headroom=0.9, degrade_after=3, recover_after=30, recover_ratio=0.8):
+        self.fps = fps
+        self.headroom = headroom
+        self.degrade_after = degrade_after
+        self.recover_after = recover_after
+        self.recover_ratio = recover_ratio
+        self.level = 0
+        self.stages = {}            # 各阶段耗时的滑动平均（毫秒）
+        self._lock = threading.Lock()
+        self._over = 0
+        self._under = 0
+        self._deferred = {}         # 界面线程上报、计入下一次 record 的阶段耗时
+        self._level_cost = {}       # 档位 -> 每个被处理帧总耗时的滑动平均（毫秒）
+        self._cost_ratio = {}       # 档位 -> 上一级与本级的耗时比（在本级稳定后记下）
+        self._level_frames = 0      # 进入当前档位后上报的帧数
+        self._frame_no = 0
+        self._last_arrival = None
+        self._period_ms = 1000.0 / fps if fps else None
+
+    # ---------------- 帧周期与预算 ----------------
+    def set_fps(self, fps):
+        with self._lock:
+            self.fps = fps
+            self._period_ms = 1000.0 / fps if fps else None
+
+    def period_ms(self):
+        """当前帧周期（毫秒），尚未估计出来时返回 None"""
+        return self._period_ms
+
+    def _budget_ms(self, level):
+        """第 level 档下每个被处理的帧可用的时间"""
+        return self._period_ms * BUDGET_LEVELS[level].stride * self.headroom
+
+    def _estimate_ms(self, level):
+        """回到 level 档时每个被处理帧的预计耗时（在 level + 1 档调用，该档已有实测）"""
+        cost = self._level_cost[level + 1]
+        ratio = self._cost_ratio.get(level + 1)
+        if ratio is not None:
+            return cost * ratio
+        if level in self._level_cost:
+            return self._level_cost[level]
+        # 没有实测：检测耗时近似与像素数成正比
+        return cost * (BUDGET_LEVELS[level + 1].pyramid / BUDGET_LEVELS[level].pyramid) ** 2
+
+    def _set_level(self, level):
+        self.level = level
+        self._level_frames = 0
+        self._over = self._under = 0
+        # 重新进入的档位重新学习与上一级的耗时比
+        self._cost_ratio.pop(level, None)
+
+    # ---------------- 每帧调用 ----------------
+    def begin_frame(self):
+        """帧到达：更新帧周期估计，并按当前档位的 stride 决定本帧是否处理"""
+        with self._lock:
+            now = time.perf_counter()
+            if self.fps is None and self._last_arrival is not None:
+                dt = (now - self._last_arrival) * 1000.0
+                self._period_ms = dt if self._period_ms is None else 0.9 * self._period_ms + 0.1 * dt
+            self._last_arrival = now
+            self._frame_no += 1
+            return self._frame_no % BUDGET_LEVELS[self.level].stride == 0
+
+    def plan(self, algo_type, pyramid=1):
+        """当前档位下实际使用的 (算法, 金字塔倍数)；各档位都沿用用户选择的算法"""
+        return algo_type, max(pyramid, BUDGET_LEVELS[self.level].pyramid)
+
+    def record(self, **stage_ms):
+        """
+        上报本帧各阶段耗时，如 record(detect=12.1, energy=3.4)。
+        返回档位是否发生变化
+        """
+        with self._lock:
+            if self._deferred:
+                stage_ms = dict(stage_ms)
+                for name, ms in self._deferred.items():
+                    stage_ms.setdefault(name, ms)
+                self._deferred.clear()
+            for name, ms in stage_ms.items():
+                old = self.stages.get(name)
+                self.stages[name] = ms if old is None else 0.8 * old + 0.2 * ms
+            if self._period_ms is None:
+                return False
+            total = sum(stage_ms.values())
+            old_level = level = self.level
+            old = self._level_cost.get(level)
+            self._level_cost[level] = total if old is None else 0.8 * old + 0.2 * total
+            self._level_frames += 1
+            if (level > 0 and level not in self._cost_ratio and level - 1 in self._level_cost
+                    and self._level_frames >= self.recover_after):
+                self._cost_ratio[level] = self._level_cost[level - 1] / max(self._level_cost[level], 1e-3)
+            if total > self._budget_ms(level):
+                self._under = 0
+                self._over += 1
+                if self._over >= self.degrade_after and level < len(BUDGET_LEVELS) - 1:
+                    self._set_level(level + 1)
+            else:
+                self._over = 0
+                if level > 0 and self._estimate_ms(level - 1) < self._budget_ms(level - 1) * self.recover_ratio:
+                    self._under += 1
+                    if self._under >= self.recover_after:
+                        self._set_level(level - 1)
+                else:
+                    self._under = 0
+            return self.level != old_level
+
+    def record_deferred(self, **stage_ms):
+        """在界面线程中完成的阶段（如显示分辨率热度图）上报耗时，计入下一次 record 的总耗时"""
+        with self._lock:
+            self._deferred.update(stage_ms)
+
+    def reset(self):
+        """回到全速档并清空统计"""
+        with self._lock:
+            self._set_level(0)
+            self.stages = {}
+            self._deferred.clear()
+            self._level_cost.clear()
+            self._cost_ratio.clear()
+
+    # ---------------- 界面显示 ----------------
+    def level_text(self):
+        return f"L{self.level} {BUDGET_LEVELS[self.level].name}"
+
+    def status_text(self):
+        """如：L1 降采样 | 检测 8.2ms 热度图 3.1ms / 预算 30.0ms"""
+        stages = " ".join(f"{_STAGE_NAMES.get(k, k)} {v:.1f}ms" for k, v in self.stages.items())
+        if self._period_ms is None:
+            return f"{self.level_text()} | {stages}"
+        return f"{self.level_text()} | {stages} / 预算 {self._budget_ms(self.level):.1f}ms"
@@ -0,0 +1,96 @@
+# frame_context.py
+import cv2
+import numpy as np
+
+try:
+    from .hist_stats import gray_hist, hist_max, hist_percentile, spot_threshold
+except ImportError:
+    from hist_stats import gray_hist, hist_max, hist_percentile, spot_threshold
+
+
+class FrameContext:
+    """
+    单帧共享上下文。
+    灰度图、最大值、256 级直方图、百分位、51×51 高斯模糊图都在第一次用到时计算，
+    并在这一帧的生命周期内缓存，供 detect_spots / energy_distribution /
+    generate_3d_image / 自动曝光共享，避免各处对同一帧重复做整幅运算。
+    """
+    __slots__ = ("image", "defects_corrected", "_gray", "_hist", "_cdf", "_max", "_blur", "_thresh")
+
+    def __init__(self, image, defects_corrected=False):
+        self.image = image
+        # 已做坏点替换（见 calibration.Calibrator），检测时可减少开运算次数
+        self.defects_corrected = defects_corrected
+        self._gray = None
+        self._hist = None
+        self._cdf = None
+        self._max = None
+        self._blur = None
+        self._thresh = {}
+
+    @classmethod
+    def of(cls, img):
+        """已是 FrameContext 则原样返回，否则包装 ndarray"""
+        return img if isinstance(img, cls) else cls(img)
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    @property
+    def gray(self):
+        """单通道图直接使用，BGR 图只转换一次"""
+        if self._gray is None:
+            img = self.image
+            self._gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def hist(self):
+        """uint8 灰度直方图（256 个 bin，int64）"""
+        if self._hist is None:
+            self._hist = gray_hist(self.gray)
+        return self._hist
+
+    @property
+    def max(self):
+        """最大灰度值，取直方图最高的非空 bin"""
+        if self._max is None:
+            if self.gray.dtype == np.uint8:
+                self._max = hist_max(self.hist)
+            else:
+                self._max = self.gray.max()
+        return self._max
+
+    def percentile(self, q):
+        """
+        第 q 百分位灰度值，与 np.percentile 默认的线性插值结果一致，
+        但只查累计直方图，不对整幅图排序。
+        """
+        if self.gray.dtype != np.uint8:
+            return float(np.percentile(self.gray, q))
+        if self._cdf is None:
+            self._cdf = np.cumsum(self.hist)
+        return hist_percentile(self.hist, q, self._cdf)
+
+    def threshold(self, method="max", ratio=0.85):
+        """
+        光斑二值化阈值（见 hist_stats.THRESHOLD_METHODS）：max 为 ratio × 最大灰度，
+        otsu / triangle 由直方图计算（忽略 ratio），按 (方法, 比例) 缓存
+        """
+        key = (method, ratio)
+        t = self._thresh.get(key)
+        if t is None:
+            if method == "max" or self.gray.dtype != np.uint8:
+                t = int(self.max * ratio)
+            else:
+                t = spot_threshold(self.hist, method)
+            self._thresh[key] = t
+        return t
+
+    @property
+    def blur(self):
+        """51×51 高斯模糊图，只在真正用到时计算"""
+        if self._blur is None:
+            self._blur = cv2.GaussianBlur(self.gray, (51, 51), 0)
+        return self._blur
@@ -0,0 +1,118 @@
+# hist_stats.py
+"""
+8 位图像的直方图统计：一次线性扫描得到 256 级直方图，之后的百分位、最大值、
+Otsu / 三角法阈值都只在 256 个 bin 上计算，不对整幅图排序或复制。
+浮点数据（如距离变换结果）的百分位用 np.partition 做线性时间选择，不做完整排序。
+"""
+import cv2
+import numpy as np
+
+# 光斑检测阈值方法（界面显示文字, 方法名）
+THRESHOLD_METHODS = [("最大值×比例", "max"), ("Otsu", "otsu"), ("三角法", "triangle")]
+
+_EPS = float(np.finfo(np.float32).eps)
+
+def gray_hist(gray, mask=None):
+    """uint8 灰度直方图（256 个 bin，int64）"""
+    if gray.dtype != np.uint8:
+        raise TypeError(f"直方图统计只支持 uint8 图像，当前为 {gray.dtype}")
+    return cv2.calcHist([gray], [0], mask, [256], [0, 256]).ravel().astype(np.int64)
+
+def hist_max(hist):
+    """最高的非空 bin，空直方图返回 0"""
+    nz = np.flatnonzero(hist)
+    return int(nz[-1]) if len(nz) else 0
+
+def hist_percentile(hist, q, cdf=None):
+    """
+    第 q 百分位灰度值，与 np.percentile 默认的线性插值结果一致，只查累计直方图。
+    cdf 可传入已算好的 np.cumsum(hist)，避免重复累加
+    """
+    if cdf is None:
+        cdf = np.cumsum(hist)
+    n = int(cdf[-1])
+    if n == 0:
+        return 0.0
+    pos = q / 100.0 * (n - 1)
+    k = int(np.floor(pos))
+    frac = pos - k
+    lo = int(np.searchsorted(cdf, k, side="right"))
+    hi = int(np.searchsorted(cdf, min(k + 1, n - 1), side="right"))
+    return lo + frac * (hi - lo)
+
+def otsu_threshold(hist):
+    """Otsu 阈值（类间方差最大），与 cv2.THRESH_OTSU 的结果一致；像素 > 阈值为前景"""
+    n = hist.sum()
+    if n == 0:
+        return 0
+    p = hist / float(n)
+    i = np.arange(len(hist))
+    q1 = np.cumsum(p)
+    m1 = np.cumsum(i * p)
+    q2 = 1.0 - q1
+    valid = (np.minimum(q1, q2) >= _EPS) & (np.maximum(q1, q2) <= 1.0 - _EPS)
+    if not valid.any():
+        return 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mu1 = m1 / q1
+        mu2 = (m1[-1] - m1) / q2
+        sigma = q1 * q2 * (mu1 - mu2) ** 2
+    sigma = np.where(valid, sigma, 0.0)
+    k = int(np.argmax(sigma))
+    return k if sigma[k] > 0 else 0
+
+def triangle_threshold(hist):
+    """
+    三角法阈值，与 cv2.THRESH_TRIANGLE 的结果一致：在直方图峰值与较远一端的连线上
+    找距离最远的 bin。适合暗背景上的小亮斑（直方图单峰、长尾）。
+    """
+    n = len(hist)
+    nz = np.flatnonzero(hist)
+    if not len(nz):
+        return 0
+    left, right = int(nz[0]), int(nz[-1])
+    if left > 0:
+        left -= 1
+    if right < n - 1:
+        right += 1
+    peak = int(np.argmax(hist))
+    flipped = peak - left < right - peak
+    h = hist[::-1] if flipped else hist
+    if flipped:
+        left, peak = n - 1 - right, n - 1 - peak
+    thresh = left
+    if peak > left:
+        i = np.arange(left + 1, peak + 1)
+        d = float(h[peak]) * i + (left - peak) * h[left + 1:peak + 1].astype(np.float64)
+        k = int(np.argmax(d))
+        if d[k] > 0:
+            thresh = left + 1 + k
+    thresh -= 1
+    return n - 1 - thresh if flipped else thresh
+
+def spot_threshold(hist, method="max", ratio=0.85):
+    """光斑二值化阈值：max 为 ratio × 最大灰度（原有做法），otsu / triangle 为自动阈值"""
+    if method == "max":
+        return int(hist_max(hist) * ratio)
+    if method == "otsu":
+        return otsu_threshold(hist)
+    if method == "triangle":
+        return triangle_threshold(hist)
+    raise ValueError(f"未知阈值方法 {method}")
+
+def partition_percentile(values, q):
+    """
+    浮点数组的第 q 百分位（np.percentile 默认的线性插值，按 float64 计算），
+    用 np.partition 做 O(n) 选择而不是完整排序。values 会被原地重排
+    """
+    n = values.size
+    pos = q / 100.0 * (n - 1)
+    k = int(np.floor(pos))
+    frac = pos - k
+    if frac == 0 or k + 1 >= n:
+        values.partition(k)
+        return float(values.flat[k])
+    values.partition((k, k + 1))
+    lo, hi = float(values.flat[k]), float(values.flat[k + 1])
+    # 与 numpy 的插值写法相同（t ≥ 0.5 时从 hi 端回退）
+    return hi - (hi - lo) * (1 - frac) if frac >= 0.5 else lo + (hi - lo) * frac
@@ -55,8 +55,10 @@ class CropDialog(QDialog):
         # 创建显示用图像
         display_img = self.image.copy()
         
-        # 绘制选择框
+        # 绘制选择框（灰度图只在需要画彩色框时才转成 BGR）
         if self.is_selecting and not self.start_point.isNull() and not self.end_point.isNull():
+            if display_img.ndim == 2:
+                display_img = cv.cvtColor(display_img, cv.COLOR_GRAY2BGR)
             cv.rectangle(display_img, 
                         (self.start_point.x(), self.start_point.y()),
                         (self.end_point.x(), self.end_point.y()),
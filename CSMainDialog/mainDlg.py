@@ -11,19 +11,33 @@ import cv2 as cv
 from threading import Thread
 import CSMainDialog.spot_detection
 sys.path.append(os.path.dirname(__file__))  # 添加当前文件夹到模块搜索路径
-from spot_detection import preprocess_image_cv, detect_and_draw_spots, energy_distribution
-from reconstruction3d import generate_3d_image
-from parameter_calculation import ParameterCalculationWindow
-from RangeFinder_driverForGUI import DistanceMeterManager, ContinuousMeasureThread, ProtocolConst, MeasureResult
-from camera_control import (
+# 本目录的模块统一经由 CSMainDialog 包导入（与 Cam2 / Cam3 相同），算法注册表、错误统计等
+# 模块级状态在进程内只有一份；按顶层模块名再导入一次会得到另一份互不相通的副本
+from CSMainDialog.spot_detection import detect_and_draw_spots, energy_distribution, FrameRenderer
+from CSMainDialog.pane_view import show_panes
+from CSMainDialog.frame_context import FrameContext
+from CSMainDialog.frame_budget import FrameBudget
+from CSMainDialog.reconstruction3d import generate_3d_image
+from CSMainDialog.parameter_calculation import ParameterCalculationWindow
+from CSMainDialog.RangeFinder_driverForGUI import DistanceMeterManager, ContinuousMeasureThread, ProtocolConst, MeasureResult
+from CSMainDialog.camera_control import (
     AutoAdjustExposureGain, SetupExposure, SetupGain,
-    g_autoAdjust, SaveExposureAndGain, LoadExposureAndGain
+    g_autoAdjust, SaveExposureAndGain, LoadExposureAndGain, GetFrameRate
 )
-from image_cropper import CropDialog
-from spot_algorithms import detect_spots,get_center_area
+from CSMainDialog.image_cropper import CropDialog
+from CSMainDialog.diagnostics_dialog import DiagnosticsDialog
+from CSMainDialog.algo_params_dialog import AlgoParamsDialog
+from CSMainDialog.calibration import Calibrator
+from CSMainDialog.calibration_dialog import CalibrationDialog
+from CSMainDialog.spot_pool import SpotProcessPool, BACKEND as POOL_BACKEND
+from CSMainDialog.beam_analysis import analyze_spots, save_energy_csv
+from CSMainDialog.energy_plot import EnergyPlotWidget
+from CSMainDialog.profile_plot import ProfilePlotWidget
+from CSMainDialog.spot_algorithms import (detect_spots, draw_spots,
+                                          PYRAMID_MODES, pyramid_accuracy, format_accuracy)
 from Cam2.camera_2 import Camera2Widget
 from Cam3.camera_3 import Camera3Widget
-from complete_version import ADCWindow
+from CSMainDialog.complete_version import ADCWindow
 if platform.system() == 'Windows':
     sys.path.append(os.environ['IPX_CAMSDK_ROOT'] + '/bin/win64_x64/')
     sys.path.append(os.environ['IPX_CAMSDK_ROOT'] + '/bin/win32_i86/')
@@ -49,11 +63,21 @@ class main_Dialog(QWidget):
         self.cropped_image = None
         self.last_original_image = None
         self.last_gray = None
+        self.last_ctx = None         # 最近一帧的 FrameContext（自动调节复用其直方图）
         self.last_3d_image = None
+        self.last_heatmap_gray = None  # 最近显示的热度图对应的灰度图，保存时才按全分辨率着色
+        self.frame_renderer = FrameRenderer()
+        self.last_result = None      # 最近一次光斑检测结果（SpotResult）
         self.counter = 0
         self.stop = False
         self.parView = None
         self.algo_type = "A"
+        self.pyramid_level = 1       # 检测分辨率：1 为全分辨率，4 / 8 为金字塔粗到精
+        # 帧预算控制器。采集循环是同步取帧的，处理慢时取帧间隔会跟着变长，
+        # 不能用来估计帧周期；开始回放时读取相机实际帧率（camPlay），读不到时按 25fps
+        self.budget = FrameBudget(fps=25)
+        self.calibrator = Calibrator("Cam1")   # 暗场 / 平场校正，标定图按分辨率懒加载
+        self.spot_pool = None        # 多进程检测（SpotProcessPool），None 表示在采集线程中检测
         self.adjusting = False   #读图像初始标志位
         # 外部图片模式相关
         self.external_mode = False           # 当前是否处于外部图片模式
@@ -82,6 +106,9 @@ class main_Dialog(QWidget):
     def closeEvent(self, event):
         """关闭事件，确保所有相机线程都停止"""
         self.camDisconnect()
+        if self.spot_pool is not None:
+            self.spot_pool.close()
+            self.spot_pool = None
 
         for i in range(self.camera_stack.count()):
             widget = self.camera_stack.widget(i)
@@ -228,6 +255,15 @@ class main_Dialog(QWidget):
                        args=(cropped_img,), daemon=True).start()
     
    # 位置：将此方法添加到 main_Dialog 类中 (建议放在 crop_image 附近)
+    def on_pyramid_changed(self, index):
+        """切换检测分辨率；切到金字塔模式时用当前帧报告与全分辨率结果的差异"""
+        self.pyramid_level = self.pyramid_combo.itemData(index)
+        self.log(f"检测分辨率已切换为: {self.pyramid_combo.itemText(index)}")
+        if self.pyramid_level > 1 and self.last_original_image is not None:
+            report, _, _ = pyramid_accuracy(self.last_original_image, self.algo_type,
+                                            self.pyramid_level)
+            self.log(format_accuracy(report, self.pyramid_level))
+
     def toggle_mirror(self):
         """切换镜像状态，并刷新当前显示"""
         self.is_mirrored = not self.is_mirrored
@@ -252,34 +288,35 @@ class main_Dialog(QWidget):
                 
                 # 3. 重新运行算法 (确保文字画在新的底图上，字就是正的)
                 # 注意：这里复用了 GrabNewBuffer 里的处理逻辑
-                gray, blur = preprocess_image_cv(new_img)
-                spots_output = detect_spots(new_img, self.algo_type)
-                heatmap = energy_distribution(gray)
-                self.last_gray = gray
-
-                # 4. 更新界面显示
-                self.image_signal.emit((new_img, spots_output, heatmap))
+                ctx = FrameContext(new_img)
+                _, result = detect_spots(ctx, self.algo_type, draw=False, pyramid=self.pyramid_level)
+                analyze_spots(ctx, result)
+                self.last_gray = ctx.gray
+                self.last_ctx = ctx
+
+                # 4. 更新界面显示（叠加层和热度图都在显示时按标签尺寸绘制）
+                self.image_signal.emit((new_img, None, ctx.gray, result))
                 
             except Exception as e:
                 self.log(f"镜像刷新失败: {e}")
 
     def _process_cropped_image_background(self, cropped_img):
         try:
-            gray, blur = preprocess_image_cv(cropped_img)
+            ctx = FrameContext(cropped_img)
 
             # 使用与实时处理完全一致的算法
-            spots_output = detect_spots(cropped_img, self.algo_type)
-
-            heatmap = energy_distribution(gray)
+            _, result = detect_spots(ctx, self.algo_type, draw=False, pyramid=self.pyramid_level)
+            analyze_spots(ctx, result)
 
             # 更新公共状态
             self.cropped_image = cropped_img
-            self.last_gray = gray
+            self.last_gray = ctx.gray
+            self.last_ctx = ctx
             self.last_original_image = cropped_img.copy()
         
 
             # 发信号到主线程显示
-            self.cropped_image_signal.emit((cropped_img, spots_output, heatmap))
+            self.cropped_image_signal.emit((cropped_img, None, ctx.gray, result))
 
         except Exception as e:
             self.log(f"处理裁切图像时出错: {e}")
@@ -287,18 +324,19 @@ class main_Dialog(QWidget):
 
     def _process_cropped_image(self, imgs):
         try:
-            cropped_img, spots_output, heatmap = imgs
+            cropped_img, _, heat_gray, result = imgs
 
             # 更新 4 个窗格中的前 3 个
-            self.show_cv_image(self.label1, cropped_img)
-            self.show_cv_image(self.label2, spots_output)
-            self.show_cv_image(self.label3, heatmap)
+            self.show_frame_panes(cropped_img, result)
+            self.energy_plot.update_energy(result.energy)
+            self.profile_plot.update_profile(result.profile)
 
             # 更新内部状态，便于 3D 重构使用
             self.last_original_image = cropped_img.copy()
-            self.last_gray = cv.cvtColor(cropped_img, cv.COLOR_BGR2GRAY)
-            self.last_spots_output = spots_output
-            self.last_heatmap = heatmap
+            self.last_ctx = FrameContext(cropped_img)
+            self.last_gray = self.last_ctx.gray
+            self.last_heatmap_gray = heat_gray
+            self.last_result = result
 
             self.log("已更新裁切图像及其处理结果")
 
@@ -377,23 +415,24 @@ class main_Dialog(QWidget):
             if self.is_mirrored:
                 img_processing = cv.flip(img_processing, 1)
 
-            gray, blur = preprocess_image_cv(img_processing)
-            spots_output = detect_spots(img_processing, self.algo_type)
-            heatmap = energy_distribution(gray)
+            ctx = FrameContext(img_processing)
+            _, result = detect_spots(ctx, self.algo_type, draw=False, pyramid=self.pyramid_level)
+            analyze_spots(ctx, result)
 
             # 更新状态，供3D重构等使用
             self.last_original_image = img_processing.copy()
-            self.last_gray = gray
-            self.last_spots_output = spots_output
-            self.last_heatmap = heatmap
+            self.last_gray = ctx.gray
+            self.last_ctx = ctx
+            self.last_heatmap_gray = ctx.gray
+            self.last_result = result
 
             # 显示
-            self.show_cv_image(self.label1, img_processing)
-            self.show_cv_image(self.label2, spots_output)
-            self.show_cv_image(self.label3, heatmap)
+            self.show_frame_panes(img_processing, result)
+            self.energy_plot.update_energy(result.energy)
+            self.profile_plot.update_profile(result.profile)
             # 取得光斑中心和面积 并按照右上角原点输出
-            centers, areas = get_center_area()
-            if centers and isinstance(centers, list):
+            centers, areas = result.centers(), result.areas()
+            if centers:
                 h, w = img_color.shape[:2]
                 centers_rt = [(w - x, y) for (x, y) in centers]
                 self.log(f"光斑坐标：{centers_rt}")
@@ -444,11 +483,28 @@ class main_Dialog(QWidget):
                 self.log(f"❌ 保存 {name} 失败。")
 
         # 使用真正的 numpy 数据，而不是 UI label 缩放后的pixmap
+        # 光斑叠加图只在保存时按全分辨率绘制
+        spots_img = None
+        if self.last_original_image is not None and self.last_result is not None:
+            spots_img = draw_spots(self.last_original_image, self.last_result.spots)
         save_numpy_image(self.last_original_image, "original")
-        save_numpy_image(self.last_spots_output, "spots")
-        save_numpy_image(self.last_heatmap, "heatmap")
+        save_numpy_image(spots_img, "spots")
+        # 热度图同样只在保存时按全分辨率着色
+        heatmap = None
+        if self.last_heatmap_gray is not None:
+            heatmap = energy_distribution(self.last_heatmap_gray)
+        save_numpy_image(heatmap, "heatmap")
         save_numpy_image(self.last_3d_image, "3d")
 
+        # 环围能量曲线（各光斑 EE 与桶内能量）
+        if self.last_result is not None and self.last_result.ok and self.last_original_image is not None:
+            energies = self.last_result.energy or analyze_spots(self.last_original_image, self.last_result)
+            file_path = os.path.join(save_dir, f"{timestamp}_energy.csv")
+            if save_energy_csv(file_path, energies, self.energy_plot.bucket_radius()):
+                self.log(f"✅ 已保存 {file_path}")
+            else:
+                self.log("⚠️ 光斑环围能量为空，跳过保存。")
+
         self.log("✅ 保存图片完成。")
 
 
@@ -501,6 +557,15 @@ class main_Dialog(QWidget):
         except Exception as e:
             self.log(f"show_cv_image 错误: {e}")
 
+    def show_frame_panes(self, img, result):
+        """原图 / 光斑叠加 / 热度图三个窗格由同一张缩小图生成（见 FrameRenderer），耗时计入帧预算"""
+        try:
+            t0 = time.perf_counter()
+            spots = result.spots if result is not None else None
+            show_panes(self.frame_renderer, img, spots, self.label1, self.label2, self.label3)
+            self.budget.record_deferred(display=(time.perf_counter() - t0) * 1000.0)
+        except Exception as e:
+            self.log(f"show_frame_panes 错误: {e}")
 
     def GrabNewBuffer(self):
         # 若处于外部图片模式，则不再从相机取帧，避免状态混乱
@@ -517,11 +582,13 @@ class main_Dialog(QWidget):
             self.data_stream.QueueBuffer(buffer)
             return 0
 
+        # Mono 帧保持单通道，检测、热度图、录像都直接使用灰度图，只在画彩色叠加层时才转 BGR
         img = np.array(buffer.GetBufferPtr()).reshape((buffer.GetHeight(), buffer.GetWidth()))
-        img_color = cv.cvtColor(img, cv.COLOR_GRAY2BGR)
+        # 暗场 / 平场校正（传感器坐标系，先于镜像），原地完成；采集标定时累加原始帧
+        img = self.calibrator.process(img)
         if self.is_mirrored:
-            img_color = cv.flip(img_color,1)    #原始图像的左右镜像翻转
-        self.last_original_image = img_color.copy()
+            img = cv.flip(img,1)    #原始图像的左右镜像翻转
+        self.last_original_image = img
 
         # ===== 录像：在这里写入视频帧 =====
         if self.recording:
@@ -532,10 +599,12 @@ class main_Dialog(QWidget):
                 filename = f"{self.record_start_time}.mp4"
                 self.last_video_path = os.path.join(save_dir, filename)
 
-                h, w, _ = img_color.shape
-                # 使用 mp4v 编码，帧率假设 25fps（如果你知道真实帧率，可自行修改）
+                h, w = img.shape[:2]
+                # 使用 mp4v 编码，帧率与帧预算相同（开始回放时读取的相机帧率，读不到时为 25fps）
+                # 单通道帧以灰度方式写入，不再逐帧转换为 BGR
                 fourcc = cv.VideoWriter_fourcc(*'mp4v')
-                self.video_writer = cv.VideoWriter(self.last_video_path, fourcc, 25.0, (w, h))
+                self.video_writer = cv.VideoWriter(self.last_video_path, fourcc, float(self.budget.fps), (w, h),
+                                                   img.ndim == 3)
 
                 if not self.video_writer.isOpened():
                     self.log("视频写入器创建失败，停止录像")
@@ -545,15 +614,30 @@ class main_Dialog(QWidget):
                     self.log(f"开始写入视频：{self.last_video_path}")
 
             if self.video_writer is not None:
-                self.video_writer.write(img_color)
+                self.video_writer.write(img)
         # ===== 录像逻辑结束 =====
 
-        gray, blur = preprocess_image_cv(img_color)
-        spots_output = detect_spots(img_color, self.algo_type)
-        heatmap = energy_distribution(gray)
-        self.last_gray = gray
-
-        self.image_signal.emit((img_color, spots_output, heatmap))
+        # 帧预算：超出帧周期时按档位降级，隔帧档位下直接跳过本帧处理
+        if self.budget.begin_frame():
+            algo, pyramid = self.budget.plan(self.algo_type, self.pyramid_level)
+            # 本帧共享的统计量（灰度图、最大值、直方图）只计算一次
+            ctx = FrameContext(img, self.calibrator.corrects_defects(img.shape))
+            pool = self.spot_pool
+            # 热度图只传灰度图，在界面线程按标签尺寸着色（与原图、叠加图一起由 show_frame_panes 生成，耗时计入帧预算）
+            heat_gray = ctx.gray
+            self.last_gray = ctx.gray
+            self.last_ctx = ctx
+
+            if pool is None:
+                _, result = detect_spots(ctx, algo, draw=False, pyramid=pyramid)
+                t0 = time.perf_counter()
+                analyze_spots(ctx, result)   # 环围能量，复用本帧的背景估计
+                self.budget.record(detect=result.elapsed_ms, energy=(time.perf_counter() - t0) * 1000.0)
+                self.image_signal.emit((img, None, heat_gray, result))
+            else:
+                # 检测交给工作进程，结果由 _on_pool_result 发出；工作进程都忙时本帧只录像不检测
+                pool.submit(img, algo, pyramid=pyramid, defects_corrected=ctx.defects_corrected,
+                            payload=(img, heat_gray))
 
         self.data_stream.QueueBuffer(buffer)
         self.counter += 1
@@ -563,6 +647,26 @@ class main_Dialog(QWidget):
         IpxCameraGuiApiPy.PyShowImageOnDisplay(buffer.GetImage())
         return 0
 
+    def _on_pool_result(self, result, payload):
+        """多进程检测的结果回调（在结果线程中调用）"""
+        img, heat_gray = payload
+        pool = self.spot_pool
+        workers = pool.workers if pool is not None else 1
+        # 多个工作进程并行，每帧实际占用的时间按检测耗时 / 进程数计入帧预算
+        self.budget.record(detect=result.elapsed_ms / workers)
+        self.image_signal.emit((img, None, heat_gray, result))
+
+    def toggle_process_pool(self):
+        """开启 / 关闭多进程检测"""
+        if self.spot_pool is None:
+            self.spot_pool = SpotProcessPool(callback=self._on_pool_result, log_func=self.log)
+            self.log(f"多进程检测已开启：{self.spot_pool.workers} 个工作进程（{POOL_BACKEND}）")
+        else:
+            pool, self.spot_pool = self.spot_pool, None
+            pool.close()
+            self.log(f"多进程检测已关闭，工作进程忙时丢弃 {pool.dropped} 帧")
+        self.pbProcessPool.setText(f"多进程检测: {'开启' if self.spot_pool is not None else '关闭'}")
+
     def threaded_function(self):
         self.stop = False
         self.log("开始图像采集线程")
@@ -644,8 +748,9 @@ class main_Dialog(QWidget):
         """
         相机一键测量（自动调节“积分时间 + 增益”的等效值）
 
-        思路：不再自己抓 buffer，而是利用实时预览线程更新的 self.last_gray，
+        思路：不再自己抓 buffer，而是利用实时预览线程更新的 self.last_ctx，
         按照画面亮度闭环调节 GainRaw，使第 99% 高亮像素的亮度接近目标值。
+        百分位由该帧 FrameContext 的 256 级直方图得到，不对整幅图排序。
         """
         global g_fake_exp_coeff, g_real_gain_offset
 
@@ -661,8 +766,8 @@ class main_Dialog(QWidget):
             QMessageBox.information(self, "提示", "请先点击“开始”按钮，让相机有实时图像，再进行一键测量")
             return
 
-        if self.last_gray is None:
-            self.log("当前没有有效图像（last_gray 为空），无法自动调节")
+        if self.last_ctx is None:
+            self.log("当前没有有效图像（last_ctx 为空），无法自动调节")
             QMessageBox.information(self, "提示", "请先让相机运行几帧，让画面稳定后再点击一键测量")
             return
 
@@ -693,8 +798,8 @@ class main_Dialog(QWidget):
             self.log("开始自动调节增益（基于实时图像的亮度闭环）...")
 
             # ---- 2. 初次检查亮度 ----
-            gray0 = self.last_gray
-            initial_bright = float(np.percentile(gray0, percentile))
+            ctx0 = self.last_ctx
+            initial_bright = float(ctx0.percentile(percentile))
             self.log(f"[自动调节] 初始亮度 P{percentile} = {initial_bright:.1f}")
 
             if initial_bright < min_bright:
@@ -704,14 +809,14 @@ class main_Dialog(QWidget):
 
             # ---- 3. 迭代闭环调节 ----
             for i in range(max_iter):
-                # 每轮都用最新的 last_gray
-                gray = self.last_gray
-                if gray is None:
+                # 每轮都用最新一帧的 FrameContext
+                ctx = self.last_ctx
+                if ctx is None:
                     self.log(f"[自动调节] 第 {i+1} 轮：没有最新图像，等待下一帧")
                     time.sleep(0.15)
                     continue
 
-                bright = float(np.percentile(gray, percentile))
+                bright = float(ctx.percentile(percentile))
                 self.log(f"[自动调节] 第 {i+1} 轮：P{percentile} = {bright:.1f}，当前增益 = {current_gain:.2f}")
 
                 # 判断是否已在目标范围内
@@ -851,6 +956,14 @@ class main_Dialog(QWidget):
         self.gPars.SetIntegerValue("TLParamsLocked", 1)
         self.data_stream.StartAcquisition()
         self.gPars.ExecuteCommand("AcquisitionStart")
+        # 帧预算按相机实际帧率计算
+        fps = GetFrameRate(self.device)
+        if fps is None:
+            fps = 25
+            self.log("无法读取相机帧率，帧预算按 25fps 计算")
+        else:
+            self.log(f"相机帧率 {fps:.1f}fps，帧预算 {1000.0 / fps:.1f}ms")
+        self.budget.set_fps(fps)
         self.thread = Thread(target=self.threaded_function)
         self.thread.start()
         self.pbAutoAdjust.setEnabled(1)
@@ -952,23 +1065,24 @@ class main_Dialog(QWidget):
 
     def _update_display(self, imgs):
         try:
-            img_color, spots_output, heatmap = imgs
+            img_color, spots_output, heat_gray, result = imgs
             if img_color is not None:
-                self.show_cv_image(self.label1, img_color)
+                self.show_frame_panes(img_color, result)
             if spots_output is not None:
                 self.show_cv_image(self.label2, spots_output)
-            if heatmap is not None:
-                self.show_cv_image(self.label3, heatmap)
+            self.energy_plot.update_energy(result.energy)
+            self.profile_plot.update_profile(result.profile)
             
             # 记录最新的处理结果
-            self.last_spots_output = spots_output
-            self.last_heatmap = heatmap
+            self.last_heatmap_gray = heat_gray
+            self.last_result = result
+            self._update_budget_label()
 
-            # 从算法模块取出光斑中心和面积
-            centers, areas = get_center_area()
+            # 本帧检测结果中的光斑中心和面积
+            centers, areas = result.centers(), result.areas()
 
             # 以图像右上角为原点的坐标变换
-            if centers and isinstance(centers, list) and img_color is not None:
+            if centers and img_color is not None:
                 h, w = img_color.shape[:2]
                 centers_rt = [(w - x, y) for (x, y) in centers]
                 self.log(f"光斑坐标：{centers_rt}")
@@ -976,11 +1090,36 @@ class main_Dialog(QWidget):
                 self.log("光斑坐标：[]")
 
             self.log(f"光斑面积：{areas}")
+            if centers:
+                self.log("光斑 D4σ：" + ", ".join(f"{dx:.1f}×{dy:.1f}" for dx, dy in result.widths()))
         except Exception as e:
             self.log(f"_update_display 异常: {e}")
 
+    def open_diagnostics(self):
+        """打开检测诊断面板（各错误码计数和最后发生时间）"""
+        self.diagnostics_dialog = DiagnosticsDialog(self, self.log)
+        self.diagnostics_dialog.show()
+
+    def open_algo_params(self):
+        """打开检测算法参数面板，修改后下一帧生效"""
+        self.algo_params_dialog = AlgoParamsDialog(self, self.algo_type, self.log)
+        self.algo_params_dialog.show()
+
+    def open_calibration(self):
+        """打开暗场 / 平场标定面板"""
+        self.calibration_dialog = CalibrationDialog(self.calibrator, self, self.log)
+        self.calibration_dialog.show()
+
+    def _update_budget_label(self):
+        """刷新帧预算档位显示，档位变化时写日志"""
+        text = self.budget.level_text()
+        if not self.budget_label.text().endswith(text):
+            self.log(f"性能档位切换为 {self.budget.status_text()}")
+        self.budget_label.setText(f"性能档位: {text}")
+        self.budget_label.setToolTip(self.budget.status_text())
+
     def open_parameter_calculation_window(self):
-        self.parameter_calculation_window = ParameterCalculationWindow()
+        self.parameter_calculation_window = ParameterCalculationWindow(lambda: self.last_result)
         self.parameter_calculation_window.show()
         self.log("参数计算器已打开")
 
@@ -1219,9 +1358,13 @@ class main_Dialog(QWidget):
         self.pbSaveAll = create_function_btn('保存图片', self.save_all, True)
         self.pbParameterCalculation = create_function_btn('参数计算',
                                                           self.open_parameter_calculation_window, True)
+        self.pbDiagnostics = create_function_btn('检测诊断', self.open_diagnostics, True)
+        self.pbAlgoParams = create_function_btn('算法参数', self.open_algo_params, True)
+        self.pbCalibration = create_function_btn('暗场/平场标定', self.open_calibration, True)
         self.pbImport = create_function_btn('导入图片', self.toggle_import_mode, True)
         self.pbRecord = create_function_btn('录制视频', self.toggle_record, False)
         self.pbMirror = create_function_btn('🔁 镜像: 关闭', self.toggle_mirror, True)
+        self.pbProcessPool = create_function_btn('多进程检测: 关闭', self.toggle_process_pool, True)
 
 
         control_layout.addWidget(self.pbConnect)
@@ -1236,12 +1379,16 @@ class main_Dialog(QWidget):
         control_layout.addWidget(self.pbMirror)
         control_layout.addWidget(self.pbSaveAll)
         control_layout.addWidget(self.pbParameterCalculation)
+        control_layout.addWidget(self.pbDiagnostics)
+        control_layout.addWidget(self.pbAlgoParams)
+        control_layout.addWidget(self.pbCalibration)
         control_layout.addWidget(self.pbImport)   
         control_layout.addWidget(self.pbRecord)
+        control_layout.addWidget(self.pbProcessPool)
         control_layout.addWidget(QLabel(" | "))
         self.btn_grp = QButtonGroup(self)
         algo_list = [("标准算法", "A"), ("双光斑算法", "B"),
-             ("单光斑去噪", "C"), ("框选识别", "D")]
+             ("单光斑去噪", "C"), ("框选识别", "D"), ("连通域算法", "E")]
         for idx, (text, key) in enumerate(algo_list):
             btn = QPushButton(text)
             btn.setCheckable(True)
@@ -1255,6 +1402,18 @@ class main_Dialog(QWidget):
 # 连接槽函数——只读 key，不再碰 text
         self.btn_grp.buttonClicked.connect(lambda b: setattr(self, 'algo_type', b.property("algo_key")))
 
+        # 检测分辨率（金字塔粗到精）
+        self.pyramid_combo = QComboBox()
+        for text, level in PYRAMID_MODES:
+            self.pyramid_combo.addItem(text, level)
+        self.pyramid_combo.setFixedHeight(40)
+        self.pyramid_combo.currentIndexChanged.connect(self.on_pyramid_changed)
+        control_layout.addWidget(self.pyramid_combo)
+
+        # 帧预算档位
+        self.budget_label = QLabel(f"性能档位: {self.budget.level_text()}")
+        control_layout.addWidget(self.budget_label)
+
         control_layout.addStretch()
         control_layout.addStretch()
 
@@ -1310,6 +1469,18 @@ class main_Dialog(QWidget):
         settings_layout.addWidget(self.pbLoadSettings, 5, 0, 1, 2)
 
         left_layout.addWidget(settings_group)
+
+        energy_group = QGroupBox("环围能量")
+        energy_layout = QVBoxLayout(energy_group)
+        self.energy_plot = EnergyPlotWidget()
+        energy_layout.addWidget(self.energy_plot)
+        left_layout.addWidget(energy_group)
+
+        profile_group = QGroupBox("X / Y 剖面")
+        profile_layout = QVBoxLayout(profile_group)
+        self.profile_plot = ProfilePlotWidget()
+        profile_layout.addWidget(self.profile_plot)
+        left_layout.addWidget(profile_group)
         left_layout.addStretch()
 
         right_panel = QWidget()
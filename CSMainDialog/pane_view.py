@@ -0,0 +1,46 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QPixmap
+
+try:
+    from .spot_detection import jet_color_table
+except ImportError:
+    from spot_detection import jet_color_table
+
+
+def pane_pixmap(arr, width, height, indexed=False):
+    """
+    把 FrameRenderer 生成的小图直接包装成 QPixmap，不做颜色转换：
+    灰度图按 Grayscale8、RGB 图按 RGB888，indexed=True 时灰度按 Indexed8 + JET 颜色表（热度图）。
+    小图已按显示区域缩好，只有标签尺寸不同时才再缩放
+    """
+    h, w = arr.shape[:2]
+    if indexed:
+        fmt = QImage.Format_Indexed8
+    elif arr.ndim == 2:
+        fmt = QImage.Format_Grayscale8
+    else:
+        fmt = QImage.Format_RGB888
+    qimg = QImage(arr.data, w, h, arr.strides[0], fmt)
+    if indexed:
+        qimg.setColorTable(jet_color_table())
+    pixmap = QPixmap.fromImage(qimg)
+    if w > width or h > height:
+        pixmap = pixmap.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return pixmap
+
+def show_panes(renderer, img, spots, original_label=None, overlay_label=None, heat_label=None):
+    """
+    用 renderer（FrameRenderer）一次生成三个窗格并显示到对应标签；不需要的窗格传 None。
+    按第一个给出的标签的尺寸缩小，三个显示区域大小相同
+    """
+    labels = [label for label in (original_label, overlay_label, heat_label) if label is not None]
+    if not labels:
+        return
+    width, height = labels[0].width(), labels[0].height()
+    original, overlay, heat = renderer.render(img, spots, width, height)
+    if original_label is not None:
+        original_label.setPixmap(pane_pixmap(original, original_label.width(), original_label.height()))
+    if overlay_label is not None:
+        overlay_label.setPixmap(pane_pixmap(overlay, overlay_label.width(), overlay_label.height()))
+    if heat_label is not None:
+        heat_label.setPixmap(pane_pixmap(heat, heat_label.width(), heat_label.height(), indexed=True))
@@ -9,6 +9,9 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdi
                             QSpacerItem, QSizePolicy, QMessageBox,QFileDialog,QHeaderView)
 
 
+# 每像素实际距离，单位：米/像素 (0.5mm/px)
+PIXEL_SCALE = 0.0005
+
 def calculate_ideal_divergence(wavelength, aperture):
     """计算理想半发散角"""
     # 将波长从纳米转换为米
@@ -38,11 +41,13 @@ def calculate_distance(coord1, coord2):
     return math.sqrt((x2 - x1)**2 + (y2 - y1)**2)
 
 class ParameterCalculationWindow(QDialog):
-    def __init__(self):
+    def __init__(self, result_provider=None):
         super(ParameterCalculationWindow, self).__init__()
         self.setWindowTitle('激光参数计算器')
         self.setMinimumSize(963, 760)
         self.coordinates = []  # 用于存储读取的坐标数据
+        # 返回相机最近一次检测结果（SpotResult）的回调，用于直接读取实时光斑
+        self.result_provider = result_provider
 
         self.layout = QVBoxLayout(self)  
         self.layout.setContentsMargins(20, 5, 20, 20)
@@ -180,7 +185,13 @@ class ParameterCalculationWindow(QDialog):
         self.read_log_button.setStyleSheet("font-size: 14px; height: 30px;")
         self.read_log_button.clicked.connect(self.read_log_file)
 
+        self.read_live_button = QPushButton('读取实时光斑')
+        self.read_live_button.setStyleSheet("font-size: 14px; height: 30px;")
+        self.read_live_button.clicked.connect(self.read_live_spots)
+        self.read_live_button.setEnabled(result_provider is not None)
+
         self.layout.addWidget(self.read_log_button)
+        self.layout.addWidget(self.read_live_button)
         self.layout.addWidget(self.submit_button)
         self.setLayout(self.layout)
 
@@ -206,6 +217,40 @@ class ParameterCalculationWindow(QDialog):
         except ValueError as e:
             QMessageBox.critical(self, "输入错误", str(e))
 
+    def read_live_spots(self):
+        """从相机最近一帧读取光斑：D4σ 直径填入光斑直径，三个光斑时亚像素质心作为坐标"""
+        result = self.result_provider() if self.result_provider else None
+        if result is None or not result.ok or not len(result):
+            QMessageBox.warning(self, "提示", "当前没有有效的光斑检测结果")
+            return
+        try:
+            n_spots = self.set_spot_result(result)
+        except ValueError as e:
+            QMessageBox.warning(self, "提示", str(e))
+            return
+        if n_spots < 3:
+            QMessageBox.warning(self, "读取实时光斑",
+                                f"已读取光斑直径，但当前只有 {n_spots} 个光斑，夹角计算需要 3 个；"
+                                f"之前读取的坐标已清除")
+            return
+        QMessageBox.information(self, "读取实时光斑", "已读取当前光斑参数！")
+
+    def set_spot_result(self, result):
+        """
+        用一次检测结果（SpotResult）填充输入：第 1 个光斑的 D4σ 平均直径换算为毫米；
+        有 3 个光斑时亚像素质心作为坐标，不足 3 个时清除之前读取的坐标（不再沿用旧日志的数据）。
+        第 1 个光斑的二阶矩计算失败（D4σ 为 0）时抛 ValueError，不改动任何输入。
+        返回光斑个数
+        """
+        d4x, d4y = result.widths()[0]
+        if d4x <= 0 or d4y <= 0:
+            raise ValueError("第 1 个光斑的 D4σ 宽度计算失败（为 0），未读取光斑参数")
+        diameter_mm = (d4x + d4y) / 2 * PIXEL_SCALE * 1000
+        self.input_spot_diameter.setText(f"{diameter_mm:.3f}")
+        centroids = result.centroids()
+        self.coordinates = [centroids[:3]] if len(centroids) >= 3 else []
+        return len(centroids)
+
     def calculate_parameters(self):
         try:
             if not self.input_wavelength.text() or not self.input_aperture.text() or not self.input_spot_diameter.text() or not self.input_laser_power.text() or not self.input_transmission_distance.text() or not self.input_distance.text():
@@ -244,7 +289,7 @@ class ParameterCalculationWindow(QDialog):
             self.output_quality_factor.setText(f"{quality_factor:.3e}")
 
             # 获取每像素实际距离 (直接使用事先设定的值)
-            pixel_scale = 0.0005  # 每像素实际距离，单位：米/像素 (0.5mm/px)
+            pixel_scale = PIXEL_SCALE
             # 获取传输距离
             # transmission_distance = float(self.input_transmission_distance.text().strip())
             distances = []
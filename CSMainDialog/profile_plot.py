@@ -0,0 +1,76 @@
+import pyqtgraph as pg
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox
+
+# 切线 / 投影曲线颜色
+_CUT_COLOR = (52, 152, 219)
+_PROJ_COLOR = (231, 76, 60)
+
+class ProfilePlotWidget(QWidget):
+    """
+    主光斑 X / Y 剖面小图：左右两幅，实线为过质心的一行 / 一列灰度，
+    勾选“积分投影”时叠加窗口内的列 / 行求和（虚线，缩放到与切线同峰值，只看形状），竖线为质心。
+    数据来自 SpotResult.profile，只在界面线程中调用 update_profile；每帧只 setData，不生成图像。
+    """
+
+    def __init__(self, parent=None, projections=True):
+        super(ProfilePlotWidget, self).__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        plots_layout = QHBoxLayout()
+        self.x_plot, self.x_cut, self.x_proj, self.x_line = self._make_plot('X (px)')
+        self.y_plot, self.y_cut, self.y_proj, self.y_line = self._make_plot('Y (px)')
+        plots_layout.addWidget(self.x_plot)
+        plots_layout.addWidget(self.y_plot)
+        layout.addLayout(plots_layout)
+
+        option_layout = QHBoxLayout()
+        self.proj_check = QCheckBox("积分投影")
+        self.proj_check.setChecked(projections)
+        self.proj_check.toggled.connect(self._on_proj_toggled)
+        option_layout.addWidget(self.proj_check)
+        self.info_label = QLabel("无光斑")
+        option_layout.addWidget(self.info_label)
+        option_layout.addStretch()
+        layout.addLayout(option_layout)
+
+        self._profile = None
+
+    def _make_plot(self, bottom_label):
+        plot = pg.PlotWidget()
+        plot.setBackground('w')
+        plot.setLabel('left', '灰度')
+        plot.setLabel('bottom', bottom_label)
+        plot.showGrid(x=True, y=True, alpha=0.3)
+        plot.setMinimumHeight(140)
+        cut = plot.plot(pen=pg.mkPen(_CUT_COLOR, width=2))
+        proj = plot.plot(pen=pg.mkPen(_PROJ_COLOR, width=1, style=Qt.DashLine))
+        line = pg.InfiniteLine(angle=90, movable=False, pen=pg.mkPen((127, 140, 141), style=Qt.DotLine))
+        plot.addItem(line)
+        return plot, cut, proj, line
+
+    def _on_proj_toggled(self, checked):
+        self.update_profile(self._profile)
+
+    def update_profile(self, profile):
+        """刷新曲线；profile 为 SpotResult.profile（无光斑时为 None）"""
+        self._profile = profile
+        if profile is None:
+            for curve in (self.x_cut, self.x_proj, self.y_cut, self.y_proj):
+                curve.clear()
+            self.info_label.setText("无光斑")
+            return
+        show_proj = self.proj_check.isChecked()
+        for cut_curve, proj_curve, line, pos, cut, proj, center in (
+                (self.x_cut, self.x_proj, self.x_line, profile.x, profile.x_cut, profile.x_proj, profile.cx),
+                (self.y_cut, self.y_proj, self.y_line, profile.y, profile.y_cut, profile.y_proj, profile.cy)):
+            cut_curve.setData(pos, cut)
+            line.setValue(center)
+            peak = proj.max() if len(proj) else 0.0
+            if show_proj and peak > 0:
+                proj_curve.setData(pos, proj * (cut.max() / peak))
+            else:
+                proj_curve.clear()
+        self.info_label.setText(f"质心 ({profile.cx:.1f}, {profile.cy:.1f})  "
+                                f"峰值 X {profile.x_cut.max():.0f} / Y {profile.y_cut.max():.0f}")
@@ -1,15 +1,25 @@
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # 禁止弹出窗口
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-import io
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from mpl_toolkits.mplot3d import Axes3D  # 注册 projection='3d'
 import cv2
 
+try:
+    from .frame_context import FrameContext
+except ImportError:
+    from frame_context import FrameContext
+
+# 输出图像尺寸（与 label4 适配）：4×3 英寸 × 100 dpi = 400×300 像素，画布直接按此尺寸渲染
+_FIG_SIZE = (4, 3)
+_FIG_DPI = 100
+
 def generate_3d_image(gray_img):
     """
     根据灰度图生成伪3D表面重构图像（返回OpenCV格式BGR图）
+    gray_img 也可以是该帧的 FrameContext
     """
+    if isinstance(gray_img, FrameContext):
+        gray_img = gray_img.gray
     if gray_img is None or len(gray_img.shape) != 2:
         raise ValueError("输入图像必须是灰度图。")
 
@@ -31,26 +41,20 @@ def generate_3d_image(gray_img):
     Z = cv2.GaussianBlur(Z, (5, 5), 0)
     Z = (Z - np.min(Z)) / (np.max(Z) - np.min(Z) + 1e-6)
 
-    # 绘制3D表面
-    fig = plt.figure(figsize=(4, 3), dpi=120)
+    # 绘制3D表面：不经过 pyplot，Figure 只属于本次调用，可以在工作线程中使用
+    fig = Figure(figsize=_FIG_SIZE, dpi=_FIG_DPI)
+    canvas = FigureCanvasAgg(fig)
     ax = fig.add_subplot(111, projection='3d')
 
     ax.plot_surface(X, Y, Z, rstride=2, cstride=2, cmap='viridis', linewidth=0, antialiased=True)
 
     ax.set_axis_off()
     ax.view_init(elev=60, azim=45)
-    plt.tight_layout(pad=0)
-
-    # 将matplotlib图像渲染为numpy数组
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight', pad_inches=0)
-    plt.close(fig)
-    buf.seek(0)
-
-    img_array = np.frombuffer(buf.getvalue(), dtype=np.uint8)
-    img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-
-    # 适配到label4大小（保持比例）
-    img = cv2.resize(img, (400, 300), interpolation=cv2.INTER_AREA)
-
-    return img
+    fig.subplots_adjust(left=0, right=1, bottom=0, top=1)
+
+    # 直接取 Agg 画布的 RGBA 缓冲区（已是 400×300），不再经过 PNG 编码 / 解码和缩放
+    canvas.draw()
+    width, height = canvas.get_width_height()
+    rgba = np.frombuffer(canvas.buffer_rgba(), dtype=np.uint8).reshape(height, width, 4)
+    # cvtColor 生成独立的 BGR 副本，画布释放后仍然有效
+    return cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR)
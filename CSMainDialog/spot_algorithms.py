@@ -1,174 +1,1021 @@
 # spot_algorithms.py
+import sys
+import threading
+import time
+import warnings
+from dataclasses import dataclass, field
+from functools import lru_cache
+
 import cv2
 import numpy as np
 
+try:
+    from .frame_context import FrameContext
+    from .hist_stats import THRESHOLD_METHODS, partition_percentile
+except ImportError:
+    from frame_context import FrameContext
+    from hist_stats import THRESHOLD_METHODS, partition_percentile
+
 # ---------------- 错误码 ----------------
+ERR_OK = 0
 (ERR_IMG_NONE, ERR_IMG_CHANNEL, ERR_IMG_TOO_SMALL, ERR_IMG_BLACK,
  ERR_BINARY_ALL_ZERO, ERR_OPEN_ALL_ZERO, ERR_NO_LOCAL_MAX,
  ERR_ALL_RADIUS_TOO_SMALL, ERR_NO_VALID_SPOT) = range(51, 60)
 
-# ---------------- 仅提示，不终止 ----------------
+# 错误码的简短说明（诊断面板显示用）
+ERR_NAMES = {
+    ERR_IMG_NONE: "图像为空",
+    ERR_IMG_CHANNEL: "通道数不支持",
+    ERR_IMG_TOO_SMALL: "图像尺寸过小",
+    ERR_IMG_BLACK: "整幅图全黑",
+    ERR_BINARY_ALL_ZERO: "二值化后全黑",
+    ERR_OPEN_ALL_ZERO: "开运算后全黑",
+    ERR_NO_LOCAL_MAX: "无候选光斑",
+    ERR_ALL_RADIUS_TOO_SMALL: "半径全部过小",
+    ERR_NO_VALID_SPOT: "无有效光斑",
+}
+
+# ---------------- 模块级状态只能有一份 ----------------
+# 错误统计和算法注册表都是模块级状态。本模块既能作为 CSMainDialog.spot_algorithms 导入，
+# 也能在 sys.path 含本目录时作为 spot_algorithms 导入，两个名字会加载出互不相通的两份：
+# 一份上的计数和参数修改在另一份上看不到。界面统一经由 CSMainDialog 包导入，这里发现重复时给出警告
+_MODULE_NAMES = ("CSMainDialog.spot_algorithms", "spot_algorithms")
+if __name__ in _MODULE_NAMES and any(name in sys.modules for name in _MODULE_NAMES if name != __name__):
+    warnings.warn("spot_algorithms 以两个模块名被导入，错误统计和算法参数不会在两份之间共享；"
+                  "请统一使用 CSMainDialog.spot_algorithms", RuntimeWarning, stacklevel=2)
+
+# ---------------- 错误统计（仅计数，不终止） ----------------
+# 检测热路径里不再 print：每个错误码只累加计数并记下最后一次发生的时间和信息，
+# 由 get_error_stats() / 诊断面板查看。需要文字日志时用 set_error_logger 开启，按错误码限频输出。
+_err_lock = threading.Lock()
+_err_counts = dict.fromkeys(ERR_NAMES, 0)
+_err_last = {}              # 错误码 -> (时间戳, 信息)
+_err_logger = None          # 限频日志回调 func(str)，None 表示不输出
+_err_log_interval = 5.0     # 同一错误码两次日志的最短间隔（秒）
+_err_last_logged = {}
+
 def _die(code: int, msg: str):
-    print(f"【检测错误 {code}】{msg}")
+    now = time.time()
+    with _err_lock:
+        count = _err_counts.get(code, 0) + 1
+        _err_counts[code] = count
+        _err_last[code] = (now, msg)
+        logger = _err_logger
+        if logger is not None and now - _err_last_logged.get(code, 0.0) >= _err_log_interval:
+            _err_last_logged[code] = now
+        else:
+            logger = None
+    if logger is not None:
+        logger(f"【检测错误 {code}】{msg}（累计 {count} 次）")
     return None   # 不再抛异常
 
-spot_center = []
-spot_areas = []
+def get_error_stats():
+    """
+    各错误码的统计快照：
+    {错误码: {"name": 说明, "count": 次数, "last_time": 最后发生的时间戳或 None, "last_message": 最后信息}}
+    """
+    with _err_lock:
+        return {code: {"name": ERR_NAMES.get(code, ""),
+                       "count": _err_counts.get(code, 0),
+                       "last_time": _err_last.get(code, (None, ""))[0],
+                       "last_message": _err_last.get(code, (None, ""))[1]}
+                for code in sorted(set(ERR_NAMES) | set(_err_counts))}
+
+def reset_error_stats():
+    """清零所有错误计数"""
+    with _err_lock:
+        for code in _err_counts:
+            _err_counts[code] = 0
+        _err_last.clear()
+        _err_last_logged.clear()
+
+def set_error_logger(func, interval=5.0):
+    """开启限频错误日志：同一错误码每 interval 秒最多调用一次 func(文字)；func 为 None 时关闭"""
+    global _err_logger, _err_log_interval
+    with _err_lock:
+        _err_logger = func
+        _err_log_interval = interval
+        _err_last_logged.clear()
+
+# ---------------- 检测结果 ----------------
+# 每行一个光斑：圆心 (x, y)、半径、圆内像素面积、圆内平均亮度，
+# 以及 ISO 11146 二阶矩结果：亚像素亮度加权质心 (cx, cy) 和 x / y 方向 D4σ 宽度（像素）
+SPOT_DTYPE = np.dtype([("x", np.float32), ("y", np.float32), ("radius", np.float32),
+                       ("area", np.int32), ("mean", np.float32),
+                       ("cx", np.float32), ("cy", np.float32),
+                       ("d4x", np.float32), ("d4y", np.float32)])
+
+def _empty_spots():
+    return np.zeros(0, dtype=SPOT_DTYPE)
+
+def _put(spots, i, x, y, r, area, mean_val):
+    """写入一行检测结果；cx / cy / D4σ 先占位，由 _add_moments 统一计算"""
+    spots[i] = (x, y, r, area, mean_val, x, y, 0.0, 0.0)
+
+@dataclass
+class SpotResult:
+    """
+    一次 detect_spots 调用的结果，只属于本次调用，不再写模块全局变量，
+    可以在多个相机 / 多个工作线程中并行检测。
+    """
+    spots: np.ndarray = field(default_factory=_empty_spots)  # SPOT_DTYPE 结构化数组
+    error: int = ERR_OK          # ERR_OK 表示成功，否则为 ERR_* 错误码
+    elapsed_ms: float = 0.0      # 检测耗时（毫秒）
+    energy: list = field(default_factory=list)  # 各光斑环围能量（见 beam_analysis.analyze_spots），未计算时为空
+    profile: object = None       # 主光斑 X / Y 剖面（beam_analysis.BeamProfile），未计算时为 None
+    pyramid: int = 1             # 实际使用的金字塔倍数；请求金字塔但退回全分辨率时为 1
+
+    def __len__(self):
+        return len(self.spots)
+
+    @property
+    def ok(self) -> bool:
+        return self.error == ERR_OK
+
+    def centers(self):
+        """光斑中心 [(x, y), ...]，整数像素坐标"""
+        return [(int(x), int(y)) for x, y in zip(self.spots["x"], self.spots["y"])]
+
+    def areas(self):
+        """光斑面积 [area, ...]，单位像素"""
+        return [int(a) for a in self.spots["area"]]
+
+    def centroids(self):
+        """亚像素亮度加权质心 [(cx, cy), ...]"""
+        return [(float(x), float(y)) for x, y in zip(self.spots["cx"], self.spots["cy"])]
+
+    def widths(self):
+        """D4σ 宽度 [(d4x, d4y), ...]，单位像素"""
+        return [(float(x), float(y)) for x, y in zip(self.spots["d4x"], self.spots["d4y"])]
+
 # ---------------- 通用预处理 ----------------
-def _pre_check(img):
+def _pre_check(ctx):
+    """
+    接受单通道灰度图（相机原生 Mono 帧，直接使用不复制）或 BGR 图。
+    返回 (gray, 错误码)，失败时 gray 为 None
+    """
+    img = ctx.image
     if img is None:
         _die(ERR_IMG_NONE, "读取图片失败（None）")
-        return None
-    if len(img.shape) != 3 or img.shape[2] != 3:
-        _die(ERR_IMG_CHANNEL, "图片通道数≠3，请确认 BGR 图像")
-        return None
+        return None, ERR_IMG_NONE
+    if not (img.ndim == 2 or (img.ndim == 3 and img.shape[2] == 3)):
+        _die(ERR_IMG_CHANNEL, "图片须为单通道灰度图或 3 通道 BGR 图像")
+        return None, ERR_IMG_CHANNEL
     h, w = img.shape[:2]
     if min(h, w) < 20:
         _die(ERR_IMG_TOO_SMALL, f"图片尺寸过小 ({w}×{h})")
-        return None
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    if np.max(gray) == 0:
+        return None, ERR_IMG_TOO_SMALL
+    gray = ctx.gray
+    if ctx.max == 0:
         _die(ERR_IMG_BLACK, "整幅图全黑")
-        return None
-    return gray
+        return None, ERR_IMG_BLACK
+    return gray, ERR_OK
+
+# ---------------- 复用的核 ----------------
+@lru_cache(maxsize=16)
+def _ellipse_kernel(size: int):
+    """size×size 椭圆结构元素（开运算与局部极大值邻域共用），按尺寸缓存"""
+    return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
+
+def _open_iter(ctx, p):
+    """开运算次数：已做坏点替换的帧没有孤立热像素，用 open_iter_clean（可为 0，即跳过）"""
+    return p["open_iter_clean"] if ctx.defects_corrected else p["open_iter"]
+
+def _binary_opening_dist(gray, thresh_val, kernel, iterations, scratch):
+    """
+    阈值 → iterations 次开运算（0 次则跳过）→ 距离变换，结果写入 scratch 提供的复用缓冲区；
+    返回 (binary, opening, dist)
+    """
+    shape = gray.shape[:2]
+    binary = scratch("binary", shape, np.uint8)
+    cv2.threshold(gray, thresh_val, 255, cv2.THRESH_BINARY, binary)
+    opening = binary
+    if iterations > 0:
+        opening = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel,
+                                   dst=scratch("opening", shape, np.uint8), iterations=iterations)
+    dist = cv2.distanceTransform(opening, cv2.DIST_L2, 5, dst=scratch("dist", shape, np.float32))
+    return binary, opening, dist
 
-def get_center_area():
-    return spot_center,spot_areas
+# ---------------- 候选光斑 ROI 局部评分 ----------------
+# 只缓存半径不超过此值的模板：64 个最多约 4 MB。大半径（Cam1 上可达上千像素，
+# 单个模板就有数 MB）每次现画，画圆的开销远小于对同样大小 ROI 的评分
+_STAMP_CACHE_MAX_R = 128
+
+def _make_disk_stamp(r: int):
+    stamp = np.zeros((2 * r + 1, 2 * r + 1), np.uint8)
+    cv2.circle(stamp, (r, r), r, 1, -1)
+    stamp = stamp.astype(bool)
+    stamp.flags.writeable = False
+    return stamp
+
+_cached_disk_stamp = lru_cache(maxsize=64)(_make_disk_stamp)
+
+def _disk_stamp(r: int):
+    """半径 r 的实心圆模板（2r+1 方阵，bool），与 cv2.circle 光栅化结果一致，小半径按半径缓存"""
+    if r <= _STAMP_CACHE_MAX_R:
+        return _cached_disk_stamp(r)
+    return _make_disk_stamp(r)
+
+def _disk_roi(shape, x, y, r):
+    """返回圆 (x, y, r) 在整幅图中的外接框切片，以及裁剪到图内的圆模板"""
+    h, w = shape[:2]
+    x0, y0 = max(x - r, 0), max(y - r, 0)
+    x1, y1 = min(x + r + 1, w), min(y + r + 1, h)
+    stamp = _disk_stamp(r)[y0 - (y - r):y1 - (y - r), x0 - (x - r):x1 - (x - r)]
+    return (slice(y0, y1), slice(x0, x1)), stamp
+
+class _SpotGrid:
+    """
+    已选光斑的网格空间哈希：按 cell 像素边长分桶，查询只看候选附近的格子，
+    代替整幅 used 掩膜。cell 取最大候选半径的 2 倍左右时每次查询只扫 3×3 个格子。
+    """
+
+    def __init__(self, shape, cell):
+        self.shape = shape[:2]
+        self.cell = max(int(cell), 1)
+        self.cells = {}
+        self.max_r = 0
+
+    def add(self, x, y, r):
+        self.cells.setdefault((x // self.cell, y // self.cell), []).append((x, y, r))
+        self.max_r = max(self.max_r, r)
+
+    def near(self, x, y, reach):
+        """圆心落在 (x, y) 周围 reach 像素方框内的已选光斑 (x, y, r)"""
+        c = self.cell
+        gx0, gx1 = (x - reach) // c, (x + reach) // c
+        gy0, gy1 = (y - reach) // c, (y + reach) // c
+        if (gx1 - gx0 + 1) * (gy1 - gy0 + 1) > len(self.cells):
+            # 查询范围比已有格子还多时直接遍历全部
+            for items in self.cells.values():
+                for s in items:
+                    if abs(s[0] - x) <= reach and abs(s[1] - y) <= reach:
+                        yield s
+            return
+        for gx in range(gx0, gx1 + 1):
+            for gy in range(gy0, gy1 + 1):
+                for s in self.cells.get((gx, gy), ()):
+                    yield s
+
+    def overlap(self, x, y, r, roi, stamp):
+        """
+        候选圆与已选光斑并集的重叠像素数 / πr²。附近没有已选光斑时直接返回 0，
+        不做任何掩膜运算；否则只把相邻光斑的圆模板拼进候选外接框内计算，
+        与整幅 used 掩膜的结果完全一致。
+        """
+        hits = list(self.near(x, y, r + self.max_r + 1))
+        if not hits:
+            return 0.0
+        ys, xs = roi
+        local = np.zeros(stamp.shape, bool)
+        for x2, y2, r2 in hits:
+            (ys2, xs2), stamp2 = _disk_roi(self.shape, x2, y2, r2)
+            y0, y1 = max(ys.start, ys2.start), min(ys.stop, ys2.stop)
+            x0, x1 = max(xs.start, xs2.start), min(xs.stop, xs2.stop)
+            if y0 >= y1 or x0 >= x1:
+                continue
+            local[y0 - ys.start:y1 - ys.start, x0 - xs.start:x1 - xs.start] |= \
+                stamp2[y0 - ys2.start:y1 - ys2.start, x0 - xs2.start:x1 - xs2.start]
+        return np.count_nonzero(local & stamp) / (np.pi * r * r + 1e-6)
+
+def _score_candidate(gray, grid, x, y, r):
+    """
+    只在候选圆的外接框内计算：与已选光斑（grid）的重叠比例、圆内平均亮度、圆内像素面积。
+    与整幅掩膜版本（np.zeros_like + cv2.circle + cv2.mean）结果完全一致。
+    """
+    roi, stamp = _disk_roi(gray.shape, x, y, r)
+    area = int(np.count_nonzero(stamp))
+    overlap = grid.overlap(x, y, r, roi, stamp)
+    mean_val = float(gray[roi][stamp].sum()) / area if area else 0.0
+    return roi, stamp, overlap, mean_val, area
+
+def _top_k(values, k):
+    """
+    取 values 中最大的 k 个的下标，按值从大到小排列；值相同时下标（行优先，即先上后左）小的在前。
+    先用 argpartition 找出第 k 大的值，取所有更大的值和下标最小的若干个并列值，只对这 k 个排序，
+    总开销 O(n + k log k)，饱和光斑平台上成千上万个相等的极大值不会参与排序。
+    注意：原实现 np.argsort(-values) 的并列顺序由快速排序决定、没有规律，
+    这里改为按下标确定；平台上有多个等半径极大值时保留的圆心可能换成另一个等价的极大值
+    （圆心相差 1 像素左右，半径和面积不变）。
+    """
+    n = len(values)
+    if n > k:
+        kth = values[np.argpartition(-values, k - 1)[k - 1]]
+        above = np.flatnonzero(values > kth)
+        ties = np.flatnonzero(values == kth)[:k - len(above)]
+        idx = np.concatenate((above, ties))
+    else:
+        idx = np.arange(n)
+    return idx[np.lexsort((idx, -values[idx]))]
 
 # ================== A：标准多光斑 ==================
-def _algo_A(img, max_spots=3):
-    gray = _pre_check(img)
-    if gray is None: return img         # 预处理失败，直接返原图，修改1
-    thresh_val = int(np.max(gray) * 0.85)
-    _, binary = cv2.threshold(gray, thresh_val, 255, cv2.THRESH_BINARY)
+def _algo_A(ctx, max_spots, p, scratch):
+    """只做检测不画图，返回 (光斑结构化数组, 错误码)；p 为参数快照（见 _PARAMS_A）"""
+    gray, err = _pre_check(ctx)
+    if gray is None: return _empty_spots(), err         # 预处理失败，修改1
+    thresh_val = ctx.threshold(p["threshold"], p["ratio"])
+    kernel = _ellipse_kernel(p["kernel"])
+    binary, opening, dist = _binary_opening_dist(gray, thresh_val, kernel, _open_iter(ctx, p), scratch)
     if not np.count_nonzero(binary):
-        print(f"【检测错误 {ERR_BINARY_ALL_ZERO}】二值化后全黑")
-        return img
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-    opening = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel, iterations=2)
+        _die(ERR_BINARY_ALL_ZERO, "二值化后全黑")
+        return _empty_spots(), ERR_BINARY_ALL_ZERO
     if not np.count_nonzero(opening):
-        print(f"【检测错误 {ERR_OPEN_ALL_ZERO}】开运算后全黑")
-        return img
-    dist = cv2.distanceTransform(opening, cv2.DIST_L2, 5)
-    local_max = (dist == cv2.dilate(dist, kernel)) & (dist > 0)
-    coords = np.column_stack(np.where(local_max))
-    if not len(coords):
-        print(f"【检测错误 {ERR_NO_LOCAL_MAX}】无局部极大值")
-        return img
-    radii = dist[coords[:, 0], coords[:, 1]]
-    idx = np.argsort(-radii)[:20]
-    coords, radii = coords[idx], radii[idx]
-    out, used = img.copy(), np.zeros_like(opening, bool)
+        _die(ERR_OPEN_ALL_ZERO, "开运算后全黑")
+        return _empty_spots(), ERR_OPEN_ALL_ZERO
+    dist_max = cv2.dilate(dist, kernel, dst=scratch("dist_max", dist.shape, np.float32))
+    local_max = (dist == dist_max) & (dist > 0)
+    flat = np.flatnonzero(local_max)
+    if not len(flat):
+        _die(ERR_NO_LOCAL_MAX, "无局部极大值")
+        return _empty_spots(), ERR_NO_LOCAL_MAX
+    radii = dist.ravel()[flat]
+    idx = _top_k(radii, p["candidates"])
+    coords = np.column_stack(np.unravel_index(flat[idx], dist.shape))
+    radii = radii[idx]
+    grid = _SpotGrid(gray.shape, 2 * int(radii[0]) + 1)
     det = 0
-    areas = []      # 保存面积
-    centers = []    # 保存圆心坐标
+    spots = np.zeros(min(max_spots, len(coords)), dtype=SPOT_DTYPE)
     for (y, x), r in zip(coords, radii):
         if det >= max_spots: break
         r = int(r)
         # ---------- 半径钳位 ----------
-        if r < 3 or r > 3000: continue
-        mask = np.zeros_like(opening, dtype=np.uint8)
-        cv2.circle(mask, (x, y), r, 1, -1)
-        overlap = np.logical_and(used, mask.astype(bool)).sum() / (np.pi * r * r + 1e-6)
-        if overlap > 0.5: continue
-        if cv2.mean(gray, mask=mask * 255)[0] < thresh_val: continue
-        # 画圆
-        cv2.circle(out, (x, y), r, (0, 0, 255), 2)
-        # 画圆心
-        cv2.circle(out, (x, y), 3, (255, 0, 0), -1)
-        # 计算面积
-        area = int(np.sum(mask > 0))
-        areas.append(area)
-        centers.append((int(x), int(y)))
-        # 标编号 
-        label_id = det + 1          # 当前是第几个光斑
-        cv2.putText(out, str(label_id), (x + r + 5, y),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0),
-                    2, cv2.LINE_AA)
-        used |= mask.astype(bool)
+        if r < p["min_radius"] or r > p["max_radius"]: continue
+        x, y = int(x), int(y)
+        roi, stamp, overlap, mean_val, area = _score_candidate(gray, grid, x, y, r)
+        if overlap > p["max_overlap"]: continue
+        if mean_val < thresh_val: continue
+        # 记录圆心、半径、面积、平均亮度（编号即行号 + 1）
+        _put(spots, det, x, y, r, area, mean_val)
+        grid.add(x, y, r)
         det += 1
     if not det:
-        print(f"【检测错误 {ERR_NO_VALID_SPOT}】最终可画光斑数为 0")
-        return img #修改2
-    # 控制台打印
-    global spot_center,spot_areas
-    spot_center = centers
-    spot_areas = areas
-    return out #返回光斑中心，修改3
-
-# ================== B：双光斑 ==================
-def _algo_B(img, max_spots=2):
-    return _algo_A(img, max_spots)
+        _die(ERR_NO_VALID_SPOT, "最终可画光斑数为 0")
+        return _empty_spots(), ERR_NO_VALID_SPOT #修改2
+    return spots[:det], ERR_OK #返回光斑结果，修改3
 
 # ================== C：单光斑 + 去噪 ==================
-def _algo_C(img, max_spots=1):
-    gray = _pre_check(img)
-    if gray is None: return img
-    thresh_val = int(np.max(gray) * 0.85)
-    _, binary = cv2.threshold(gray, thresh_val, 255, cv2.THRESH_BINARY)
+def _algo_C(ctx, max_spots, p, scratch):
+    gray, err = _pre_check(ctx)
+    if gray is None: return _empty_spots(), err
+    thresh_val = ctx.threshold(p["threshold"], p["ratio"])
+    binary, opening, dist = _binary_opening_dist(gray, thresh_val, _ellipse_kernel(p["kernel"]),
+                                                 _open_iter(ctx, p), scratch)
     if not np.count_nonzero(binary):
-        print(f"【检测错误 {ERR_BINARY_ALL_ZERO}】二值化后全黑")
-        return img
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-    opening = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel, iterations=2)
+        _die(ERR_BINARY_ALL_ZERO, "二值化后全黑")
+        return _empty_spots(), ERR_BINARY_ALL_ZERO
     if not np.count_nonzero(opening):
-        print(f"【检测错误 {ERR_OPEN_ALL_ZERO}】开运算后全黑")
-        return img
-    dist = cv2.distanceTransform(opening, cv2.DIST_L2, 5)
-    thr = np.percentile(dist[dist > 0], 95)
+        _die(ERR_OPEN_ALL_ZERO, "开运算后全黑")
+        return _empty_spots(), ERR_OPEN_ALL_ZERO
+    # 距离变换的前景值拷进复用缓冲区再选百分位（会被重排），不每帧分配掩膜和副本
+    fg = np.greater(dist, 0, out=scratch("fg", dist.shape, np.bool_))
+    values = scratch("fg_values", (dist.size,), np.float32)[:np.count_nonzero(fg)]
+    np.compress(fg.ravel(), dist.ravel(), out=values)
+    thr = partition_percentile(values, p["core_percentile"])
     mask = (dist >= thr).astype(np.uint8)
     n_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
     candidates = []
     for i in range(1, n_labels):
         x, y = centroids[i][:2]
         area = stats[i, cv2.CC_STAT_AREA]
-        if area < 3: continue
-        r = max(3, int(np.sqrt(area / np.pi) * 3.6))
+        if area < p["min_core_area"]: continue
+        r = max(p["min_radius"], int(np.sqrt(area / np.pi) * p["radius_scale"]))
         candidates.append((int(x), int(y), r))
     if not candidates:
-        print(f"【检测错误 {ERR_NO_LOCAL_MAX}】无有效候选光斑")
-        return img
+        _die(ERR_NO_LOCAL_MAX, "无有效候选光斑")
+        return _empty_spots(), ERR_NO_LOCAL_MAX
     candidates.sort(key=lambda x: x[2], reverse=True)
+    # 按半径从大到小，圆心落在已保留光斑半径内的候选被抑制；
+    # 已保留的半径都不小于当前候选，min(r, r2) 即 r，网格只需查 r 范围
     keep = []
+    nms = _SpotGrid(gray.shape, candidates[0][2])
     for x, y, r in candidates:
-        for (x2, y2, r2) in keep:
-            if np.hypot(x - x2, y - y2) < min(r, r2): break
-        else: keep.append((x, y, r))
-    keep = keep[:max_spots]
-    out, used = img.copy(), np.zeros_like(opening, bool)
+        if any((x - x2) ** 2 + (y - y2) ** 2 < r * r for x2, y2, _ in nms.near(x, y, r)): continue
+        keep.append((x, y, r))
+        nms.add(x, y, r)
+        if len(keep) >= max_spots: break
+    grid = _SpotGrid(gray.shape, 2 * candidates[0][2] + 1)
     det = 0
-    areas = []
-    centers = []
+    spots = np.zeros(len(keep), dtype=SPOT_DTYPE)
     for x, y, r in keep:
-        mask = np.zeros_like(opening, dtype=np.uint8)
-        cv2.circle(mask, (x, y), r, 1, -1)
-        if cv2.mean(gray, mask=mask * 255)[0] < thresh_val: continue
-        cv2.circle(out, (x, y), r, (0, 0, 255), 2)
-        cv2.circle(out, (x, y), 3, (255, 0, 0), -1)
-        area = int(np.sum(mask > 0))
-        areas.append(area)
-        centers.append((int(x), int(y)))
-        label_id = det + 1
-        cv2.putText(out, str(label_id), (x + r + 5, y),
+        roi, stamp, _, mean_val, area = _score_candidate(gray, grid, x, y, r)
+        if mean_val < thresh_val: continue
+        _put(spots, det, x, y, r, area, mean_val)
+        grid.add(x, y, r); det += 1
+    if not det:
+        _die(ERR_NO_VALID_SPOT, "最终可画光斑数为 0")
+        return _empty_spots(), ERR_NO_VALID_SPOT #修改4
+    return spots[:det], ERR_OK #修改5
+
+# ================== 亚像素质心与 D4σ（ISO 11146 二阶矩） ==================
+@lru_cache(maxsize=64)
+def _ramp(n: int):
+    """长度 n 的坐标斜坡 (0..n-1) 及其平方，按长度缓存，供投影矩求和复用"""
+    r = np.arange(n, dtype=np.float64)
+    r2 = r * r
+    r.flags.writeable = False
+    r2.flags.writeable = False
+    return r, r2
+
+def _neighbour_limits(spots):
+    """
+    每个光斑的窗口半宽上限：到最近的其他已检出光斑圆心距离的一半（像素），
+    只有一个光斑时为 inf。多光斑帧上以此把各光斑的积分窗口限制在自己一侧
+    """
+    n = len(spots)
+    if n < 2:
+        return np.full(n, np.inf)
+    x = spots["x"].astype(np.float64)
+    y = spots["y"].astype(np.float64)
+    d = np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :])
+    np.fill_diagonal(d, np.inf)
+    return d.min(axis=1) / 2.0
+
+def _outside_cell(x0, y0, h, w, sx, sy, others):
+    """
+    左上角 (x0, y0)、h×w 的 ROI 中离 others 里某个圆心比离 (sx, sy) 更近的像素（bool 掩膜），
+    即不属于本光斑 Voronoi 单元的部分；每个邻居只是一个半平面判断。others 为空时返回 None
+    """
+    if not len(others):
+        return None
+    xs = np.arange(x0, x0 + w, dtype=np.float64)
+    ys = np.arange(y0, y0 + h, dtype=np.float64)
+    mask = np.zeros((h, w), bool)
+    for nx, ny in others:
+        dx, dy = nx - sx, ny - sy
+        mx, my = (nx + sx) / 2.0, (ny + sy) / 2.0
+        mask |= (dy * (ys - my))[:, None] + (dx * (xs - mx))[None, :] > 0
+    return mask
+
+# 窗口内其他亮斑的判定：高于本光斑峰值（减背景后）的这一比例、面积不小于 _BLOB_MIN_AREA
+# 且不小于本光斑连通域 _BLOB_MIN_FRACTION 的连通域（大光斑边缘被噪声切出的碎块达不到）
+_BLOB_LEVEL = 0.2
+_BLOB_MIN_AREA = 9
+_BLOB_MIN_FRACTION = 0.01
+# 判定在隔点采样的 ROI 上进行，采样后边长不超过此值，大光斑的窗口也只扫几万个点
+_BLOB_GRID = 128
+
+def _foreign_blobs(roi, ix, iy):
+    """
+    减过背景的 ROI 中不与 (ix, iy) 相连的亮斑质心（ROI 坐标），即窗口里没有被检出的相邻光斑；
+    热像素、噪声和光斑边缘的碎块达不到面积下限。(ix, iy) 本身不够亮（如环形光斑中心）时不做判断，返回空列表
+    """
+    h, w = roi.shape[:2]
+    ix, iy = min(max(int(round(ix)), 0), w - 1), min(max(int(round(iy)), 0), h - 1)
+    peak = float(roi[iy, ix])
+    if peak <= 0:
+        return []
+    step = max(1, -(-max(h, w) // _BLOB_GRID))
+    mask = (roi[iy % step::step, ix % step::step] > _BLOB_LEVEL * peak).astype(np.uint8)
+    n, labels, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    own = labels[iy // step, ix // step]
+    if own == 0:
+        return []
+    min_area = max(_BLOB_MIN_AREA, _BLOB_MIN_FRACTION * stats[own, cv2.CC_STAT_AREA])
+    return [(centroids[i][0] * step + ix % step, centroids[i][1] * step + iy % step) for i in range(1, n)
+            if i != own and stats[i, cv2.CC_STAT_AREA] >= min_area]
+
+def _beam_moments(gray, x, y, half, background, iterations=5, limit=np.inf, others=()):
+    """
+    在以 (x, y) 为中心、半宽 half 的 ROI 内计算一阶、二阶矩：
+    先减背景（不截断负值，噪声正负抵消，截断会把 D4σ 撑大），
+    再把 ROI 投影到 x / y 轴，用缓存的坐标斜坡做点积，
+    不生成任何与 ROI 同尺寸的坐标网格。按 ISO 11146 迭代：
+    积分窗口取上一次 D4σ 的 3 倍，直到窗口不再变化或满 iterations 次。
+    多光斑时窗口半宽不超过 limit（见 _neighbour_limits），窗口中离 others（其他已检出光斑圆心）
+    或窗口内未检出的其他亮斑（_foreign_blobs）更近的像素置零，邻近光斑的能量不会计入本光斑。
+    返回 (cx, cy, d4x, d4y)，ROI 内没有能量时返回 None
+    """
+    h, w = gray.shape[:2]
+    sx, sy = x, y
+    limit = max(int(limit), 1) if np.isfinite(limit) else None
+    result = None
+    for _ in range(iterations):
+        if limit is not None:
+            half = min(half, limit)
+        x0, y0 = max(int(round(x)) - half, 0), max(int(round(y)) - half, 0)
+        x1, y1 = min(int(round(x)) + half + 1, w), min(int(round(y)) + half + 1, h)
+        roi = gray[y0:y1, x0:x1].astype(np.float32)
+        roi -= background
+        blobs = [(bx + x0, by + y0) for bx, by in _foreign_blobs(roi, sx - x0, sy - y0)]
+        outside = _outside_cell(x0, y0, y1 - y0, x1 - x0, sx, sy, list(others) + blobs)
+        if outside is not None:
+            roi[outside] = 0.0
+        px = roi.sum(axis=0, dtype=np.float64)
+        py = roi.sum(axis=1, dtype=np.float64)
+        m0 = px.sum()
+        if m0 <= 0:
+            return result
+        xr, xr2 = _ramp(len(px))
+        yr, yr2 = _ramp(len(py))
+        cx, cy = px @ xr / m0, py @ yr / m0
+        d4x = 4.0 * np.sqrt(max(px @ xr2 / m0 - cx * cx, 0.0))
+        d4y = 4.0 * np.sqrt(max(py @ yr2 / m0 - cy * cy, 0.0))
+        x, y = x0 + cx, y0 + cy
+        result = (x, y, d4x, d4y)
+        new_half = int(np.ceil(1.5 * max(d4x, d4y))) + 1
+        if limit is not None:
+            new_half = min(new_half, limit)
+        if new_half == half:
+            break
+        half = new_half
+    return result
+
+def _background_level(ctx):
+    """暗背景均值：噪声 σ 取 84.1% 与 50% 分位之差，只统计不超过 中位数 + 3σ 的灰度级"""
+    if ctx.gray.dtype == np.uint8:
+        median = ctx.percentile(50)
+        sigma = max(ctx.percentile(84.1) - median, 1.0)
+        top = min(int(median + 3.0 * sigma), 255) + 1
+        hist = ctx.hist[:top]
+        n = hist.sum()
+        if n:
+            return float(hist @ np.arange(top)) / n
+    return ctx.percentile(50)
+
+def _add_moments(ctx, spots):
+    """
+    为每个光斑填充 cx / cy / d4x / d4y。初始窗口半宽为检测半径的 8 倍
+    （0.85 阈值圆约为 0.57σ，8r 约覆盖 ±4.5σ），之后按 D4σ 迭代。
+    多光斑时每个光斑的窗口不超过到最近邻光斑距离的一半，并且只统计自己 Voronoi 单元内的像素。
+    背景为直方图中 中位数 + 3σ噪声 以下各灰度级的平均值，即暗背景像素的均值。
+    """
+    if not len(spots):
+        return spots
+    gray = ctx.gray
+    background = _background_level(ctx)
+    limits = _neighbour_limits(spots)
+    centers = [(float(s["x"]), float(s["y"])) for s in spots]
+    for i, s in enumerate(spots):
+        half = max(int(float(s["radius"]) * 8), 16)
+        others = centers[:i] + centers[i + 1:]
+        m = _beam_moments(gray, float(s["x"]), float(s["y"]), half, background,
+                          limit=limits[i], others=others)
+        if m is not None:
+            s["cx"], s["cy"], s["d4x"], s["d4y"] = m
+    return spots
+
+# ================== E：单次连通域 ==================
+def _components(gray, thresh_val, max_spots, min_area, scratch, x0=0, y0=0):
+    """
+    对 gray 只做一次阈值和 connectedComponentsWithStats，按面积取前 max_spots 个
+    面积不小于 min_area 的连通域；圆心为外接框内的亮度加权质心，半径为等面积圆半径，
+    面积为真实像素数。x0 / y0 为 gray 在整幅图中的偏移（ROI 调用时使用）。
+    """
+    shape = gray.shape[:2]
+    binary = scratch("binary", shape, np.uint8)
+    cv2.threshold(gray, thresh_val, 255, cv2.THRESH_BINARY, binary)
+    n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(
+        binary, labels=scratch("labels", shape, np.int32), connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    big = np.flatnonzero(areas >= min_area)
+    order = big[_top_k(areas[big], max_spots)] + 1
+    spots = np.zeros(len(order), dtype=SPOT_DTYPE)
+    for k, i in enumerate(order):
+        bx, by, bw, bh, area = stats[i]
+        sy, sx = slice(by, by + bh), slice(bx, bx + bw)
+        weights = gray[sy, sx] * (labels[sy, sx] == i)
+        total = float(weights.sum())
+        cx = float(weights.sum(axis=0) @ np.arange(bw)) / total + bx + x0
+        cy = float(weights.sum(axis=1) @ np.arange(bh)) / total + by + y0
+        r = int(np.sqrt(area / np.pi))
+        _put(spots, k, cx, cy, r, area, total / area)
+    return spots
+
+def _algo_E(ctx, max_spots, p, scratch):
+    gray, err = _pre_check(ctx)
+    if gray is None: return _empty_spots(), err
+    thresh_val = ctx.threshold(p["threshold"], p["ratio"])
+    spots = _components(gray, thresh_val, max_spots, p["min_area"], scratch)
+    if not len(spots):
+        _die(ERR_NO_VALID_SPOT, "无面积足够的连通域")
+        return _empty_spots(), ERR_NO_VALID_SPOT
+    return spots, ERR_OK
+
+# ================== 金字塔粗到精检测 ==================
+# 检测分辨率选项（界面下拉框显示文字, 缩小倍数），1 表示全分辨率
+PYRAMID_MODES = [("全分辨率", 1), ("1/4 金字塔", 4), ("1/8 金字塔", 8)]
+
+def _refine_in_roi(gray, thresh_val, x, y, half, kernel, iterations):
+    """
+    在全分辨率 ROI 内重做 阈值 → 开运算 → 距离变换，取距离峰值作为圆心和内切半径。
+    ROI 位于图像内部的边用 0 补一圈，避免 distanceTransform 把 ROI 外当成前景；
+    光斑完整落在 ROI 内时结果与整幅计算一致。返回 (x, y, r)，无前景时返回 None
+    """
+    h, w = gray.shape[:2]
+    x0, y0 = max(x - half, 0), max(y - half, 0)
+    x1, y1 = min(x + half + 1, w), min(y + half + 1, h)
+    _, binary = cv2.threshold(gray[y0:y1, x0:x1], thresh_val, 255, cv2.THRESH_BINARY)
+    opening = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel, iterations=iterations) if iterations > 0 else binary
+    top, left = int(y0 > 0), int(x0 > 0)
+    opening = cv2.copyMakeBorder(opening, top, int(y1 < h), left, int(x1 < w),
+                                 cv2.BORDER_CONSTANT, value=0)
+    dist = cv2.distanceTransform(opening, cv2.DIST_L2, 5)
+    iy, ix = np.unravel_index(int(np.argmax(dist)), dist.shape)
+    r = float(dist[iy, ix])
+    if r <= 0:
+        return None
+    return x0 + int(ix) - left, y0 + int(iy) - top, r
+
+def _coarse_params(p, factor):
+    """
+    粗检测用的参数快照：长度类参数（最小 / 最大半径、开运算核）按 1/factor 缩小，
+    面积类参数按 1/factor² 缩小。缩小图由 INTER_AREA 平均得到，孤立热像素和噪点已被抹平，
+    核缩到 3 以下时不再做开运算，3×3 核只用于找距离局部极大值
+    """
+    q = dict(p)
+    for name in ("min_radius", "max_radius"):
+        if name in q:
+            q[name] = max(1, q[name] // factor)
+    for name in ("min_core_area", "min_area"):
+        if name in q:
+            q[name] = max(1, q[name] // (factor * factor))
+    if "kernel" in q:
+        kernel = q["kernel"] // factor
+        if kernel < 3:
+            q["open_iter"] = q["open_iter_clean"] = 0
+        q["kernel"] = max(3, kernel | 1)
+    return q
+
+_pyramid_lock = threading.Lock()
+_pyramid_fallbacks = {}     # 退回原因 -> 次数
+
+def _pyramid_fallback(reason):
+    with _pyramid_lock:
+        _pyramid_fallbacks[reason] = _pyramid_fallbacks.get(reason, 0) + 1
+
+def get_pyramid_fallbacks():
+    """金字塔检测退回全分辨率的累计次数 {原因: 次数}"""
+    with _pyramid_lock:
+        return dict(_pyramid_fallbacks)
+
+def reset_pyramid_fallbacks():
+    with _pyramid_lock:
+        _pyramid_fallbacks.clear()
+
+def _algo_pyramid(ctx, algo, max_spots, factor, p):
+    """
+    粗到精检测：先在 1/factor 缩小图上用所选算法（SpotAlgorithm）和缩小后的参数（_coarse_params）
+    找候选光斑，再只在每个候选周围的全分辨率 ROI 内精修圆心和半径。p 为参数快照。
+    缩小图过小或粗检测失败时退回全分辨率检测并计数（get_pyramid_fallbacks）。
+    返回 (spots, 错误码, 实际使用的倍数)
+    """
+    gray, err = _pre_check(ctx)
+    if gray is None: return _empty_spots(), err, factor
+    h, w = gray.shape[:2]
+    # E 本身就是一次 O(N) 扫描，没有需要精修的距离变换（refine 为 None），直接整幅运行
+    if algo.refine is None:
+        return algo.func(ctx, max_spots, p, algo.scratch) + (1,)
+    if min(h, w) // factor < 20:
+        _pyramid_fallback("缩小图过小")
+        return algo.func(ctx, max_spots, p, algo.scratch) + (1,)
+    small = cv2.resize(gray, (w // factor, h // factor), interpolation=cv2.INTER_AREA)
+    coarse, err = algo.func(FrameContext(small), max_spots, _coarse_params(p, factor), algo.scratch)
+    if err != ERR_OK:
+        _pyramid_fallback("粗检测失败")
+        return algo.func(ctx, max_spots, p, algo.scratch) + (1,)
+    thresh_val = ctx.threshold(p["threshold"], p["ratio"])
+    kernel = _ellipse_kernel(p["kernel"])
+    min_r, max_r = p["min_radius"], p.get("max_radius", 3000)
+    grid = _SpotGrid(gray.shape, 2 * int(coarse["radius"].max()) * factor + 1)
+    det = 0
+    spots = np.zeros(len(coarse), dtype=SPOT_DTYPE)
+    for s in coarse:
+        rc = float(s["radius"]) * factor
+        # ROI 半宽：粗半径的 2 倍再留出开运算和缩放误差的余量
+        half = int(rc * 2) + 4 * factor
+        cx = int(round((float(s["x"]) + 0.5) * factor - 0.5))
+        cy = int(round((float(s["y"]) + 0.5) * factor - 0.5))
+        refined = _refine_in_roi(gray, thresh_val, cx, cy, half, kernel, _open_iter(ctx, p))
+        if refined is None: continue
+        x, y, r = refined
+        # A/B/D 的半径即距离峰值；C 的半径是按核心面积放大的经验值，沿用粗检测结果
+        r = int(rc) if algo.refine == "coarse" else int(r)
+        if r < min_r or r > max_r: continue
+        roi, stamp, overlap, mean_val, area = _score_candidate(gray, grid, x, y, r)
+        if overlap > p.get("max_overlap", 0.5): continue
+        if mean_val < thresh_val: continue
+        _put(spots, det, x, y, r, area, mean_val)
+        grid.add(x, y, r)
+        det += 1
+    if not det:
+        _die(ERR_NO_VALID_SPOT, "金字塔精修后可画光斑数为 0")
+        return _empty_spots(), ERR_NO_VALID_SPOT, factor
+    return spots[:det], ERR_OK, factor
+
+def compare_spots(ref, test):
+    """
+    以 ref（通常为全分辨率结果）为基准，按最近圆心一一配对，
+    返回 dict：matched / missed / extra 个数，圆心误差与半径误差的均值和最大值（像素）
+    """
+    remaining = list(range(len(test)))
+    center_err, radius_err = [], []
+    for s in ref:
+        if not remaining: break
+        d = [np.hypot(float(test[j]["x"]) - float(s["x"]), float(test[j]["y"]) - float(s["y"]))
+             for j in remaining]
+        k = int(np.argmin(d))
+        if d[k] > max(float(s["radius"]), 3.0): continue
+        j = remaining.pop(k)
+        center_err.append(d[k])
+        radius_err.append(abs(float(test[j]["radius"]) - float(s["radius"])))
+    matched = len(center_err)
+    return {
+        "matched": matched,
+        "missed": len(ref) - matched,
+        "extra": len(test) - matched,
+        "center_err_mean": float(np.mean(center_err)) if matched else 0.0,
+        "center_err_max": float(np.max(center_err)) if matched else 0.0,
+        "radius_err_mean": float(np.mean(radius_err)) if matched else 0.0,
+        "radius_err_max": float(np.max(radius_err)) if matched else 0.0,
+    }
+
+def pyramid_accuracy(img, algo_type="A", pyramid=4, max_spots=None, threshold=None):
+    """
+    对同一帧分别做全分辨率检测和金字塔检测，返回 (对比 dict, 全分辨率结果, 金字塔结果)，
+    对比 dict 在 compare_spots 的基础上增加 full_ms / pyramid_ms / speedup，
+    以及 fallback（金字塔检测退回了全分辨率）
+    """
+    ctx = FrameContext.of(img)
+    _, full = detect_spots(ctx, algo_type, max_spots, draw=False, threshold=threshold)
+    _, pyr = detect_spots(ctx, algo_type, max_spots, draw=False, pyramid=pyramid, threshold=threshold)
+    report = compare_spots(full.spots, pyr.spots)
+    report["full_ms"] = full.elapsed_ms
+    report["pyramid_ms"] = pyr.elapsed_ms
+    report["speedup"] = full.elapsed_ms / pyr.elapsed_ms if pyr.elapsed_ms > 0 else 0.0
+    report["fallback"] = pyr.pyramid != pyramid
+    return report, full, pyr
+
+def format_accuracy(report, pyramid):
+    """把 pyramid_accuracy 的对比结果格式化成一行日志"""
+    fallback = "（已退回全分辨率）" if report.get("fallback") else ""
+    return (f"1/{pyramid} 金字塔{fallback} vs 全分辨率：匹配 {report['matched']}，"
+            f"漏检 {report['missed']}，多检 {report['extra']}，"
+            f"圆心误差 均值 {report['center_err_mean']:.2f}px / 最大 {report['center_err_max']:.2f}px，"
+            f"半径误差 均值 {report['radius_err_mean']:.2f}px / 最大 {report['radius_err_max']:.2f}px，"
+            f"耗时 {report['full_ms']:.1f}ms → {report['pyramid_ms']:.1f}ms（×{report['speedup']:.1f}）")
+
+# ================== 叠加层绘制 ==================
+def draw_spots(img, spots, scale=1.0):
+    """
+    在 img 的副本上绘制光斑圆、圆心和编号；灰度图在这里才转成 BGR。
+    spots 为全分辨率坐标；img 若是已缩放到显示尺寸的图像，传入对应的 scale，
+    线宽和字号保持不变，只缩放坐标和半径。
+    """
+    out = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img.copy()
+    if spots is None:
+        return out
+    return paint_spots(out, spots, scale)
+
+def paint_spots(out, spots, scale=1.0, rgb=False):
+    """在 3 通道图 out 上原地绘制光斑；rgb=True 表示 out 为 RGB 通道顺序（直接交给 Qt 显示的缓冲区）"""
+    red, blue = ((255, 0, 0), (0, 0, 255)) if rgb else ((0, 0, 255), (255, 0, 0))
+    for i, s in enumerate(spots):
+        x, y = int(round(s["x"] * scale)), int(round(s["y"] * scale))
+        r = max(1, int(round(s["radius"] * scale)))
+        # 画圆
+        cv2.circle(out, (x, y), r, red, 2)
+        # 画圆心
+        cv2.circle(out, (x, y), 3, blue, -1)
+        # 标编号
+        cv2.putText(out, str(i + 1), (x + r + 5, y),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0),
                     2, cv2.LINE_AA)
-        used |= mask.astype(bool); det += 1
-    if not det:
-        print(f"【检测错误 {ERR_NO_VALID_SPOT}】最终可画光斑数为 0")
-        return img #修改4
-    global spot_center,spot_areas
-    spot_center = centers
-    spot_areas = areas
-    return out #修改5
-
-# ================== D：框选后 + 二次亮度校验 ==================
-def _algo_D(img, max_spots=1):
-    # 直接走 A，已含圆心、面积输出
-    return _algo_A(img, max_spots)
+    return out
+
+# ================== 算法注册表 ==================
+@dataclass(frozen=True)
+class AlgoParam:
+    """算法的一个可调参数；类型由默认值决定（int / float / str）"""
+    name: str
+    label: str                   # 界面显示文字
+    default: object
+    minimum: float = None
+    maximum: float = None
+    choices: tuple = ()          # 非空时为下拉选项 ((显示文字, 值), ...)
+    step: float = 1
+    odd: bool = False            # 只取奇数（核尺寸），偶数向上取到下一个奇数
+
+    def coerce(self, value):
+        """把界面或调用方给的值转换成参数类型并限制在取值范围内，非法值抛 ValueError"""
+        if self.choices:
+            if value not in [v for _, v in self.choices]:
+                raise ValueError(f"参数 {self.name} 不支持取值 {value!r}")
+            return value
+        value = type(self.default)(value)
+        if self.odd and value % 2 == 0:
+            value += 1
+        if self.minimum is not None:
+            value = max(value, type(self.default)(self.minimum))
+        if self.maximum is not None:
+            value = min(value, type(self.default)(self.maximum))
+        return value
+
+# 各算法共用的阈值参数
+_THRESHOLD_PARAMS = (
+    AlgoParam("threshold", "阈值方法", "max", choices=tuple(THRESHOLD_METHODS)),
+    AlgoParam("ratio", "最大值比例", 0.85, 0.1, 1.0, step=0.01),
+)
+
+# 距离变换类算法（A / B / C / D）共用的形态学参数
+_MORPH_PARAMS = (
+    AlgoParam("kernel", "开运算核尺寸", 5, 3, 15, step=2, odd=True),
+    AlgoParam("open_iter", "开运算次数", 2, 0, 5),
+    AlgoParam("open_iter_clean", "坏点校正后开运算次数", 1, 0, 5),
+)
+
+_PARAMS_A = _THRESHOLD_PARAMS + _MORPH_PARAMS + (
+    AlgoParam("candidates", "候选极大值数", 20, 1, 200),
+    AlgoParam("min_radius", "最小半径", 3, 1, 100),
+    AlgoParam("max_radius", "最大半径", 3000, 10, 5000),
+    AlgoParam("max_overlap", "最大重叠比例", 0.5, 0.0, 1.0, step=0.05),
+)
+
+_PARAMS_C = _THRESHOLD_PARAMS + _MORPH_PARAMS + (
+    AlgoParam("core_percentile", "核心距离百分位", 95.0, 50.0, 99.9, step=0.5),
+    AlgoParam("radius_scale", "半径放大系数", 3.6, 1.0, 10.0, step=0.1),
+    AlgoParam("min_core_area", "最小核心面积", 3, 1, 1000),
+    AlgoParam("min_radius", "最小半径", 3, 1, 100),
+)
+
+_PARAMS_E = _THRESHOLD_PARAMS + (
+    # 约等于半径 3 的圆，与 A/C 的最小半径一致，滤掉热像素和噪点
+    AlgoParam("min_area", "最小连通域面积", 28, 1, 100000),
+)
+
+class SpotAlgorithm:
+    """
+    注册表中的一个检测算法：实现函数 + 参数声明 + 当前参数值 + 耗时档案 + 复用缓冲区。
+      func(ctx, max_spots, p, scratch) -> (spots, 错误码)，p 为参数快照 dict；
+      refine 表示金字塔 / 跟踪时如何在全分辨率 ROI 内精修：
+        "dist" 取距离峰值为圆心和半径，"coarse" 只精修圆心、沿用粗半径，None 不走金字塔；
+      cost_ms_per_mpix 为参考耗时（毫秒 / 百万像素，measure_cost 实测），
+      live_cost 为实际检测耗时的滑动平均。
+    参数可在任意线程中随时修改（set_params），正在处理的帧使用调用开始时的参数快照，
+    下一帧起生效，不需要重启处理线程。中间缓冲区按算法实例、按线程复用。
+    """
+
+    def __init__(self, key, name, func, params, max_spots=3, refine="dist",
+                 cost_ms_per_mpix=None, description=""):
+        self.key = key
+        self.name = name
+        self.func = func
+        self.params = tuple(params)
+        self.max_spots = max_spots
+        self.refine = refine
+        self.cost_ms_per_mpix = cost_ms_per_mpix
+        self.description = description
+        self.live_cost = None
+        self._values = {p.name: p.default for p in self.params}
+        self._lock = threading.Lock()
+        self._tls = threading.local()
+
+    def __repr__(self):
+        return f"SpotAlgorithm({self.key!r}, {self.name!r})"
+
+    # ---------------- 参数 ----------------
+    def param(self, name):
+        for p in self.params:
+            if p.name == name:
+                return p
+        raise KeyError(f"算法 {self.key} 没有参数 {name}")
+
+    def get_params(self):
+        """当前参数值的快照"""
+        with self._lock:
+            return dict(self._values)
+
+    def set_params(self, **values):
+        """修改参数（可在界面线程中调用），返回实际生效的值"""
+        coerced = {name: self.param(name).coerce(v) for name, v in values.items()}
+        with self._lock:
+            self._values.update(coerced)
+        return coerced
+
+    def reset_params(self):
+        with self._lock:
+            self._values = {p.name: p.default for p in self.params}
+
+    def resolve(self, threshold=None):
+        """本次调用使用的参数快照；threshold 不为 None 时覆盖阈值方法"""
+        p = self.get_params()
+        if threshold is not None:
+            p["threshold"] = threshold
+        return p
+
+    # ---------------- 复用缓冲区 ----------------
+    def scratch(self, name, shape, dtype):
+        """
+        本算法实例、本线程的中间缓冲区（二值图、开运算、距离变换等），同尺寸的帧之间
+        反复复用，不再每帧重新分配；多线程并行检测互不干扰。
+        """
+        bufs = getattr(self._tls, "bufs", None)
+        if bufs is None:
+            bufs = self._tls.bufs = {}
+        key = (name, shape, np.dtype(dtype))
+        buf = bufs.get(key)
+        if buf is None:
+            if len(bufs) >= 32:      # 裁切等操作会产生很多尺寸，避免无限增长
+                bufs.clear()
+            buf = bufs[key] = np.empty(shape, dtype)
+        return buf
+
+    # ---------------- 运行与耗时 ----------------
+    def __call__(self, ctx, max_spots=None, threshold=None):
+        """直接运行（不含二阶矩），返回 (spots, 错误码)"""
+        return self.func(FrameContext.of(ctx), max_spots or self.max_spots,
+                         self.resolve(threshold), self.scratch)
+
+    def record_cost(self, elapsed_ms, n_pixels):
+        """记录一次全分辨率检测的耗时，更新滑动平均"""
+        if n_pixels <= 0:
+            return
+        cost = elapsed_ms / (n_pixels / 1e6)
+        with self._lock:
+            self.live_cost = cost if self.live_cost is None else 0.9 * self.live_cost + 0.1 * cost
+        return self.live_cost
+
+    def cost_text(self):
+        ref = f"{self.cost_ms_per_mpix:.1f}" if self.cost_ms_per_mpix else "-"
+        live = f"{self.live_cost:.1f}" if self.live_cost is not None else "-"
+        return f"参考 {ref} ms/MPix，实测 {live} ms/MPix"
+
+ALGORITHMS = {}
+
+def register_algorithm(algo):
+    """注册（或替换）一个 SpotAlgorithm，之后即可在 detect_spots 中用 algo.key 调用"""
+    ALGORITHMS[algo.key] = algo
+    return algo
+
+def get_algorithm(key):
+    try:
+        return ALGORITHMS[key]
+    except KeyError:
+        raise ValueError(f"未知算法类型 {key}")
+
+def measure_cost(keys=None, shape=(2048, 2448), repeat=3, seed=0):
+    """
+    在合成帧（暗噪声背景上 3 个高斯光斑）上实测各算法耗时，
+    写入 cost_ms_per_mpix 并返回 {key: 毫秒 / 百万像素}
+    """
+    h, w = shape
+    rng = np.random.RandomState(seed)
+    img = rng.normal(8, 2, shape).clip(0, 255)
+    yy, xx = np.mgrid[0:h, 0:w]
+    for fx, fy in ((0.3, 0.3), (0.7, 0.4), (0.5, 0.75)):
+        sigma = min(h, w) / 60.0
+        img += 230 * np.exp(-((xx - fx * w) ** 2 + (yy - fy * h) ** 2) / (2 * sigma ** 2))
+    img = img.clip(0, 255).astype(np.uint8)
+    costs = {}
+    for key in keys or sorted(ALGORITHMS):
+        algo = get_algorithm(key)
+        algo(FrameContext(img))            # 预热，分配缓冲区
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            algo(FrameContext(img))
+        ms = (time.perf_counter() - t0) * 1000.0 / repeat
+        algo.cost_ms_per_mpix = costs[key] = ms / (h * w / 1e6)
+    return costs
+
+# 参考耗时为 2448×2048 合成帧单线程实测，仅用于比较各算法的相对开销
+register_algorithm(SpotAlgorithm("A", "标准多光斑", _algo_A, _PARAMS_A, 3, "dist", 11.5,
+                                 "阈值 → 开运算 → 距离变换局部极大值，按半径取候选并去重叠"))
+register_algorithm(SpotAlgorithm("B", "双光斑", _algo_A, _PARAMS_A, 2, "dist", 11.5,
+                                 "与 A 相同，默认最多 2 个光斑"))
+register_algorithm(SpotAlgorithm("C", "单光斑 + 去噪", _algo_C, _PARAMS_C, 1, "coarse", 18.2,
+                                 "距离变换高百分位核心连通域，按核心面积放大得到半径"))
+register_algorithm(SpotAlgorithm("D", "框选识别", _algo_A, _PARAMS_A, 1, "dist", 11.5,
+                                 "框选后使用，与 A 相同，默认 1 个光斑"))
+register_algorithm(SpotAlgorithm("E", "连通域", _algo_E, _PARAMS_E, 3, None, 10.7,
+                                 "单次阈值 + 连通域，按面积取光斑，亮度加权质心"))
 
 # ================== 统一对外接口 ==================
-def detect_spots(img: np.ndarray, algo_type: str = "A", max_spots=3):
-    algo_map = {"A": _algo_A, "B": _algo_B, "C": _algo_C, "D": _algo_D}
-    if algo_type not in algo_map:
-        raise ValueError(f"未知算法类型 {algo_type}")
-    return algo_map[algo_type](img, max_spots)
\ No newline at end of file
+def detect_spots(img: np.ndarray, algo_type: str = "A", max_spots=None, draw=True, pyramid=1, threshold=None):
+    """
+    光斑检测统一入口。img 可以是图像，也可以是本帧的 FrameContext（与热度图等共享统计量）。
+    algo_type 为注册表 ALGORITHMS 中的算法键，参数取该算法当前的设置（见 SpotAlgorithm）。
+    max_spots 为 None 时取算法注册的最大光斑数（A / E 为 3，B 为 2，C / D 为 1）。
+    返回 (叠加图, SpotResult)：检测失败时叠加图为原图，SpotResult.error 为对应错误码。
+    draw=False 时只做检测，叠加图为 None，不复制也不绘制整幅图；
+    需要显示时再用 spot_detection.FrameRenderer / draw_spots 在显示分辨率上绘制。
+    pyramid 为 4 / 8 时先在缩小图上找候选，再在全分辨率 ROI 内精修（见 PYRAMID_MODES）。
+    threshold 不为 None 时覆盖算法的阈值方法：max / otsu / triangle（见 THRESHOLD_METHODS）。
+    结果只通过返回值传出，可安全地在多个线程中同时调用。
+    """
+    algo = get_algorithm(algo_type)
+    max_spots = max_spots or algo.max_spots
+    t0 = time.perf_counter()
+    ctx = FrameContext.of(img)
+    p = algo.resolve(threshold)
+    if pyramid > 1:
+        spots, err, pyramid = _algo_pyramid(ctx, algo, max_spots, int(pyramid), p)
+    else:
+        spots, err = algo.func(ctx, max_spots, p, algo.scratch)
+        if ctx.image is not None:
+            algo.record_cost((time.perf_counter() - t0) * 1000.0, ctx.shape[0] * ctx.shape[1])
+    if err == ERR_OK:
+        _add_moments(ctx, spots)
+    elapsed_ms = (time.perf_counter() - t0) * 1000.0
+    out = None
+    if draw:
+        out = draw_spots(ctx.image, spots) if err == ERR_OK else ctx.image
+    return out, SpotResult(spots, err, elapsed_ms, pyramid=int(pyramid))
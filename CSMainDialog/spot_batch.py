@@ -0,0 +1,98 @@
+# spot_batch.py
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+try:
+    from .spot_algorithms import detect_spots, SPOT_DTYPE, ERR_OK
+except ImportError:
+    from spot_algorithms import detect_spots, SPOT_DTYPE, ERR_OK
+
+# 批量结果：在单帧 SPOT_DTYPE 前面加上帧序号
+BATCH_DTYPE = np.dtype([("frame", np.int32)] + SPOT_DTYPE.descr)
+
+@dataclass
+class BatchResult:
+    """detect_spots_batch 的结果"""
+    spots: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=BATCH_DTYPE))
+    errors: np.ndarray = field(default_factory=lambda: np.zeros(0, np.int32))  # 每帧错误码
+    elapsed_ms: float = 0.0      # 整批耗时（毫秒）
+
+    @property
+    def n_frames(self) -> int:
+        return len(self.errors)
+
+    def frame(self, i):
+        """第 i 帧的光斑（BATCH_DTYPE 结构化数组）"""
+        return self.spots[self.spots["frame"] == i]
+
+    def fps(self) -> float:
+        """处理速度（帧/秒）"""
+        return self.n_frames / (self.elapsed_ms / 1000.0) if self.elapsed_ms > 0 else 0.0
+
+def iter_video_frames(path, start=0, stop=None):
+    """逐帧读取录像并转成单通道灰度图，供 detect_spots_batch 使用"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"无法打开视频文件: {path}")
+    try:
+        if start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        i = start
+        while stop is None or i < stop:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            i += 1
+    finally:
+        cap.release()
+
+def detect_spots_batch(frames, algo_type="A", max_spots=None, workers=None, pyramid=1, threshold=None):
+    """
+    批量检测一段录像。frames 可以是 (N, H, W) / (N, H, W, 3) 数组，也可以是逐帧产生图像的迭代器
+    （如 iter_video_frames）。每帧调用 detect_spots(draw=False)：
+      * 整块数组按帧切片，不复制；
+      * 参数（含开运算核尺寸）取所选算法的当前设置，每帧调用开始时取快照；
+        开运算核按尺寸缓存，二值图 / 开运算 / 距离变换缓冲区按算法、按线程复用；
+      * OpenCV 运算会释放 GIL，多帧在线程池中并行；
+      * 迭代器输入最多预读 2 × workers 帧，长录像不会一次读进内存。
+    返回 BatchResult：spots 为所有帧光斑拼成的一个 BATCH_DTYPE 数组（按帧序号排列），
+    errors 为每帧的错误码（ERR_OK 表示成功）。
+    """
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+
+    def _one(img):
+        _, result = detect_spots(img, algo_type, max_spots, draw=False, pyramid=pyramid,
+                                 threshold=threshold)
+        return result
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for img in frames:
+            pending.append(pool.submit(_one, img))
+            if len(pending) >= 2 * workers:
+                results.append(pending.popleft().result())
+        while pending:
+            results.append(pending.popleft().result())
+
+    errors = np.array([r.error for r in results], np.int32)
+    total = sum(len(r) for r in results if r.error == ERR_OK)
+    spots = np.zeros(total, dtype=BATCH_DTYPE)
+    k = 0
+    for i, r in enumerate(results):
+        if r.error != ERR_OK:
+            continue
+        n = len(r)
+        spots["frame"][k:k + n] = i
+        for name in SPOT_DTYPE.names:
+            spots[name][k:k + n] = r.spots[name]
+        k += n
+    return BatchResult(spots, errors, (time.perf_counter() - t0) * 1000.0)
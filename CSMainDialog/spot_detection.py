@@ -1,10 +1,19 @@
+from functools import lru_cache
+
 import cv2
 import numpy as np
 
+try:
+    from .frame_context import FrameContext
+    from .spot_algorithms import paint_spots
+except ImportError:
+    from frame_context import FrameContext
+    from spot_algorithms import paint_spots
+
 def preprocess_image_cv(img):
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    blur = cv2.GaussianBlur(gray, (51, 51), 0)
-    return gray, blur
+    # 单通道帧直接作为灰度图使用，不再来回转换；模糊图由 FrameContext 按需计算
+    ctx = FrameContext.of(img)
+    return ctx.gray, ctx.blur
 
 
 def detect_and_draw_spots(
@@ -24,7 +33,7 @@ def detect_and_draw_spots(
         log_func("输入图像无效，请传入OpenCV格式的numpy数组。")
         raise ValueError("输入图像无效，请传入OpenCV格式的numpy数组。")
 
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     max_val = np.max(gray)
     threshold_val = int(max_val * intensity_ratio)
     _, binary = cv2.threshold(gray, threshold_val, 255, cv2.THRESH_BINARY)
@@ -47,7 +56,7 @@ def detect_and_draw_spots(
     spot_coords = spot_coords[sorted_idx][:20]
     spot_radii = spot_radii[sorted_idx][:20]
 
-    output = img.copy()
+    output = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img.copy()
     used_mask = np.zeros_like(cleaned, dtype=bool)
     detected_spots = []
 
@@ -109,5 +118,65 @@ def detect_and_draw_spots(
 
 
 def energy_distribution(gray):
+    # 全分辨率彩色热度图，只在保存时使用；实时显示见 FrameRenderer
+    # 可直接传入本帧的 FrameContext，复用其中的灰度图
+    gray = FrameContext.of(gray).gray
     heatmap = cv2.applyColorMap(gray, cv2.COLORMAP_JET)
     return heatmap
+
+
+# ---------------- 显示分辨率热度图 ----------------
+@lru_cache(maxsize=1)
+def jet_lut():
+    """COLORMAP_JET 的 256 项查找表，形状 (256, 3)，BGR，与 applyColorMap 逐像素一致"""
+    ramp = np.arange(256, dtype=np.uint8).reshape(256, 1)
+    return cv2.applyColorMap(ramp, cv2.COLORMAP_JET).reshape(256, 3)
+
+@lru_cache(maxsize=1)
+def jet_color_table():
+    """同一张表的 Qt 颜色表（0xAARRGGBB 整数列表），供 QImage.Format_Indexed8 的 setColorTable 使用"""
+    return [0xFF000000 | (int(r) << 16) | (int(g) << 8) | int(b) for b, g, r in jet_lut()]
+
+
+class FrameRenderer:
+    """
+    实时显示的三个窗格一次生成：整幅图只缩小一次到显示区域内，之后都在这张小图上完成，
+    结果写入复用的缓冲区，每帧只处理几百 KB 的小图，不再有整幅图大小的拷贝和颜色转换：
+      original  缩小后的原图：灰度帧为灰度图，彩色帧为 RGB 图
+      overlay   RGB 叠加图：小图展开成 RGB 后原地画光斑（paint_spots）
+      heat      缩小后的灰度图，界面按 Indexed8 + jet_color_table() 显示，不生成彩色图
+    缩小用 INTER_LINEAR：每个输出像素只采样 4 个源像素，耗时只与显示区域大小有关
+    （INTER_AREA 要读遍整幅图，2448×2048 上比全分辨率着色还慢）；保存仍用全分辨率图像。
+    返回的数组在下一次 render 时被覆盖，一个实例只在一个线程（界面线程）中使用。
+    """
+
+    def __init__(self):
+        self._bufs = {}
+
+    def _buf(self, name, shape):
+        buf = self._bufs.get(name)
+        if buf is None or buf.shape != shape:
+            buf = self._bufs[name] = np.empty(shape, np.uint8)
+        return buf
+
+    def render(self, img, spots, width, height):
+        """img 为本帧图像或 FrameContext，spots 为全分辨率 SPOT_DTYPE（可为 None），返回 (original, overlay, heat)"""
+        img = FrameContext.of(img).image
+        h, w = img.shape[:2]
+        scale = min(width / w, height / h, 1.0) if width > 0 and height > 0 else 1.0
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        small_shape = (size[1], size[0])
+        if img.ndim == 2:
+            original = heat = cv2.resize(img, size, dst=self._buf("gray", small_shape),
+                                         interpolation=cv2.INTER_LINEAR)
+            overlay = cv2.cvtColor(original, cv2.COLOR_GRAY2RGB, dst=self._buf("overlay", small_shape + (3,)))
+        else:
+            small = cv2.resize(img, size, dst=self._buf("bgr", small_shape + (3,)),
+                               interpolation=cv2.INTER_LINEAR)
+            original = cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=self._buf("rgb", small_shape + (3,)))
+            heat = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=self._buf("gray", small_shape))
+            overlay = self._buf("overlay", small_shape + (3,))
+            np.copyto(overlay, original)
+        if spots is not None and len(spots):
+            paint_spots(overlay, spots, size[0] / w, rgb=True)
+        return original, overlay, heat
@@ -0,0 +1,224 @@
+# spot_pool.py
+import ctypes
+import multiprocessing as mp
+import os
+import queue
+import threading
+import traceback
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:          # Python < 3.8：退回到 sharedctypes，槽位只能在启动工作进程时继承
+    shared_memory = None
+
+try:
+    from .frame_context import FrameContext
+    from .spot_algorithms import detect_spots, get_algorithm, _die, ERR_NAMES, ERR_OK
+    from .beam_analysis import analyze_spots
+except ImportError:
+    from frame_context import FrameContext
+    from spot_algorithms import detect_spots, get_algorithm, _die, ERR_NAMES, ERR_OK
+    from beam_analysis import analyze_spots
+
+# 槽位实现：shared_memory（3.8+）或 sharedctypes.RawArray（3.6 / 3.7）
+BACKEND = "shared_memory" if shared_memory is not None else "sharedctypes"
+
+
+# ---------------- 帧槽位 ----------------
+def _alloc_slots(ctx, n, nbytes):
+    """主进程中分配 n 个 nbytes 字节的共享槽位，返回 (句柄列表, 主进程可写的缓冲区列表)"""
+    if shared_memory is not None:
+        blocks = [shared_memory.SharedMemory(create=True, size=nbytes) for _ in range(n)]
+        return blocks, [b.buf for b in blocks]
+    blocks = [ctx.RawArray(ctypes.c_uint8, nbytes) for _ in range(n)]
+    return blocks, blocks
+
+def _slot_handles(blocks):
+    """传给工作进程的句柄：shared_memory 传名字，RawArray 随进程参数继承"""
+    return [b.name for b in blocks] if shared_memory is not None else blocks
+
+def _attach_slots(handles):
+    """工作进程中打开槽位，返回 (缓冲区列表, 须保持引用的对象)"""
+    if shared_memory is None:
+        return handles, handles
+    blocks = [shared_memory.SharedMemory(name=name) for name in handles]
+    return [b.buf for b in blocks], blocks
+
+def _release_slots(blocks):
+    if shared_memory is None:
+        return
+    for b in blocks:
+        b.close()
+        b.unlink()
+
+
+# ---------------- 工作进程 ----------------
+def _worker_main(handles, tasks, results):
+    """
+    工作进程主循环：从 tasks 取 (序号, 槽位, 形状, dtype, 算法, max_spots, 金字塔, 阈值方法,
+    已做坏点替换, 算法参数)，直接在共享槽位上检测并计算环围能量，
+    把 SpotResult（几个光斑的结构化数组和各自的环围能量曲线）送回。
+    算法参数随任务一起发送，界面上修改的参数从下一帧起在工作进程中生效。
+    """
+    buffers, _keep = _attach_slots(handles)
+    applied = {}
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, slot, shape, dtype, algo_type, max_spots, pyramid, threshold, corrected, params = task
+        try:
+            if applied.get(algo_type) != params:
+                get_algorithm(algo_type).set_params(**params)
+                applied[algo_type] = params
+            frame = np.ndarray(shape, dtype, buffer=buffers[slot])
+            ctx = FrameContext(frame, corrected)
+            _, result = detect_spots(ctx, algo_type, max_spots, draw=False, pyramid=pyramid,
+                                     threshold=threshold)
+            analyze_spots(ctx, result)
+            del frame, ctx
+            results.put((seq, slot, result, None))
+        except Exception:
+            results.put((seq, slot, None, traceback.format_exc()))
+
+
+class SpotProcessPool:
+    """
+    多进程光斑检测：采集线程把帧写进共享内存环形槽位（只复制一次，不 pickle 像素），
+    工作进程在槽位上原地检测，只把 SpotResult 送回主进程，不再与界面线程争 GIL。
+      submit(frame, ...)  采集线程调用；没有空闲槽位（工作进程都忙）时丢弃本帧并返回 False；
+      callback(result, payload)  在结果线程中按完成顺序调用，比已送出结果更旧的帧直接丢弃；
+      close()  停止工作进程并释放共享内存。
+    槽位和工作进程在第一帧到达时按帧大小创建，之后帧变大才重建。
+    工作进程用 spawn 方式启动（不 fork 带 Qt 线程的主进程），打包后入口须调用 multiprocessing.freeze_support()；
+    spawn 会在工作进程中重新导入入口脚本，入口的界面 / 相机 SDK 导入须放在 __main__ 判断之内，
+    本模块及其导入链（spot_algorithms / beam_analysis / frame_context / hist_stats）不能依赖 Qt、tkinter 或相机 SDK。
+    检测错误码在主进程中重新计数，诊断面板照常可见；全分辨率检测的耗时也记回主进程的算法实例。
+    """
+
+    def __init__(self, workers=None, slots=None, callback=None, log_func=None):
+        self.workers = workers or max(min((os.cpu_count() or 2) - 1, 4), 1)
+        self.n_slots = slots or self.workers + 1
+        self.callback = callback
+        self.log_func = log_func
+        self.dropped = 0             # 因没有空闲槽位而丢弃的帧数
+        self._ctx = mp.get_context("spawn")
+        self._lock = threading.Lock()          # submit / close
+        self._pending_lock = threading.Lock()  # _pending，结果线程也会用，重建槽位时不能被 _lock 卡住
+        self._closed = False
+        self._nbytes = 0
+        self._blocks = []
+        self._buffers = []
+        self._procs = []
+        self._tasks = None
+        self._results = None
+        self._collector = None
+        self._free = queue.Queue()
+        self._pending = {}           # 序号 -> (payload, 算法, 金字塔, 像素数)
+        self._seq = 0
+        self._delivered = -1
+
+    # ---------------- 启停 ----------------
+    def _start(self, nbytes):
+        self._blocks, self._buffers = _alloc_slots(self._ctx, self.n_slots, nbytes)
+        self._nbytes = nbytes
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        handles = _slot_handles(self._blocks)
+        self._procs = [self._ctx.Process(target=_worker_main, args=(handles, self._tasks, self._results),
+                                         name=f"spot-worker-{i}", daemon=True)
+                       for i in range(self.workers)]
+        for p in self._procs:
+            p.start()
+        self._free = queue.Queue()
+        for i in range(self.n_slots):
+            self._free.put(i)
+        self._collector = threading.Thread(target=self._collect, args=(self._results,), daemon=True)
+        self._collector.start()
+
+    def _stop(self):
+        """停止工作进程和结果线程，释放槽位；未完成的帧直接丢弃"""
+        if not self._procs:
+            return
+        for _ in self._procs:
+            self._tasks.put(None)
+        for p in self._procs:
+            p.join(timeout=2.0)
+            if p.is_alive():
+                p.terminate()
+        self._results.put(None)
+        self._collector.join(timeout=2.0)
+        self._buffers = []
+        _release_slots(self._blocks)
+        self._blocks = []
+        self._procs = []
+        with self._pending_lock:
+            self._pending.clear()
+        self._nbytes = 0
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._stop()
+
+    @property
+    def running(self):
+        return bool(self._procs) and not self._closed
+
+    # ---------------- 采集线程 ----------------
+    def submit(self, frame, algo_type="A", max_spots=None, pyramid=1, threshold=None,
+               defects_corrected=False, payload=None):
+        """把一帧写入空闲槽位并排队检测；工作进程都忙或已关闭时返回 False"""
+        with self._lock:
+            if self._closed:
+                return False
+            if frame.nbytes > self._nbytes:
+                self._stop()
+                self._start(frame.nbytes)
+            try:
+                slot = self._free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                return False
+            view = np.ndarray(frame.shape, frame.dtype, buffer=self._buffers[slot])
+            np.copyto(view, frame)
+            del view
+            seq = self._seq
+            self._seq += 1
+            with self._pending_lock:
+                self._pending[seq] = (payload, algo_type, pyramid, frame.shape[0] * frame.shape[1])
+            params = get_algorithm(algo_type).get_params()
+            self._tasks.put((seq, slot, frame.shape, frame.dtype.str, algo_type, max_spots,
+                             pyramid, threshold, defects_corrected, params))
+            return True
+
+    # ---------------- 结果线程 ----------------
+    def _collect(self, results):
+        while True:
+            item = results.get()
+            if item is None:
+                break
+            seq, slot, result, error_text = item
+            self._free.put(slot)
+            with self._pending_lock:
+                pending = self._pending.pop(seq, None)
+            if pending is None:
+                continue
+            payload, algo_type, pyramid, pixels = pending
+            if result is None:
+                if self.log_func:
+                    self.log_func(f"检测进程异常：{error_text}")
+                continue
+            if result.error != ERR_OK:
+                _die(result.error, f"{ERR_NAMES.get(result.error, '')}（检测进程）")
+            elif pyramid == 1:
+                get_algorithm(algo_type).record_cost(result.elapsed_ms, pixels)
+            if seq < self._delivered:
+                continue
+            self._delivered = seq
+            if self.callback is not None:
+                self.callback(result, payload)
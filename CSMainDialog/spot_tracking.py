@@ -0,0 +1,194 @@
+# spot_tracking.py
+import time
+
+import numpy as np
+
+try:
+    from .frame_context import FrameContext
+    from .hist_stats import gray_hist, spot_threshold
+    from .spot_algorithms import (detect_spots, get_algorithm, SpotResult, SPOT_DTYPE, ERR_OK,
+                                  _add_moments, _components, _ellipse_kernel, _open_iter, _put, _refine_in_roi,
+                                  _score_candidate, _SpotGrid)
+except ImportError:
+    from frame_context import FrameContext
+    from hist_stats import gray_hist, spot_threshold
+    from spot_algorithms import (detect_spots, get_algorithm, SpotResult, SPOT_DTYPE, ERR_OK,
+                                 _add_moments, _components, _ellipse_kernel, _open_iter, _put, _refine_in_roi,
+                                 _score_candidate, _SpotGrid)
+
+
+class SpotTracker:
+    """
+    实时流的时域跟踪：记住上一帧各光斑的位置和速度，下一帧只在预测位置附近的窗口内
+    做 阈值 → 开运算 → 距离变换 精修，不再整幅检测。
+    出现以下情况时退回整幅 detect_spots 重新捕获：
+      * 还没有轨迹（第一帧 / reset 之后）；
+      * 任一轨迹在窗口内丢失；
+      * 距上次整幅检测已满 full_every 帧（定期校正，发现新出现的光斑）。
+    stats() 返回各类计数，用来观察整幅回退触发得有多频繁。
+    一个跟踪器只服务一路视频流，不要在多个线程间共享。
+    """
+
+    def __init__(self, algo_type="A", max_spots=None, full_every=30, margin=16, pyramid=1, threshold=None):
+        self.algo_type = algo_type
+        self.max_spots = max_spots
+        self.full_every = full_every   # 每隔多少帧强制整幅检测一次
+        self.margin = margin           # 搜索窗口在 2 倍半径之外额外留出的像素
+        self.pyramid = pyramid         # 整幅检测时使用的金字塔倍数
+        self.threshold = threshold     # 覆盖算法的阈值方法，None 表示用算法参数（见 THRESHOLD_METHODS）
+        self.reset()
+
+    def reset(self):
+        """清空轨迹和计数，下一帧整幅检测"""
+        self._tracks = np.zeros(0, dtype=SPOT_DTYPE)
+        self._velocity = np.zeros((0, 2), np.float32)
+        self._since_full = 0
+        self.frames = 0           # 处理的总帧数
+        self.tracked_frames = 0   # 只在窗口内完成检测的帧数
+        self.full_searches = 0    # 整幅检测次数（含首帧、定期、丢失重捕）
+        self.periodic = 0         # 因满 full_every 帧触发的整幅检测
+        self.reacquisitions = 0   # 因轨迹丢失触发的整幅检测
+
+    def configure(self, algo_type=None, pyramid=None, threshold=None):
+        """算法、检测分辨率或阈值方法改变时调用，轨迹作废，下一帧整幅检测"""
+        if algo_type is not None:
+            self.algo_type = algo_type
+        if pyramid is not None:
+            self.pyramid = pyramid
+        if threshold is not None:
+            self.threshold = threshold
+        self._tracks = np.zeros(0, dtype=SPOT_DTYPE)
+        self._velocity = np.zeros((0, 2), np.float32)
+
+    def stats(self):
+        """跟踪统计：总帧数、窗口跟踪帧数、整幅检测次数、定期校正次数、丢失重捕次数"""
+        return {
+            "frames": self.frames,
+            "tracked": self.tracked_frames,
+            "full_searches": self.full_searches,
+            "periodic": self.periodic,
+            "reacquisitions": self.reacquisitions,
+        }
+
+    def format_stats(self):
+        st = self.stats()
+        return (f"跟踪统计：共 {st['frames']} 帧，窗口跟踪 {st['tracked']} 帧，"
+                f"整幅检测 {st['full_searches']} 次（定期 {st['periodic']}，"
+                f"丢失重捕 {st['reacquisitions']}）")
+
+    # ---------------- 单帧入口 ----------------
+    def update(self, img):
+        """
+        处理一帧，img 可以是图像或 FrameContext。
+        返回与 detect_spots(draw=False) 相同含义的 SpotResult
+        """
+        t0 = time.perf_counter()
+        ctx = FrameContext.of(img)
+        self.frames += 1
+        spots = None
+        if len(self._tracks) and self._since_full < self.full_every:
+            spots = self._track(ctx)
+            if spots is None:
+                self.reacquisitions += 1
+        elif len(self._tracks):
+            self.periodic += 1
+        if spots is None:
+            return self._full_search(ctx, t0)
+        self._since_full += 1
+        self.tracked_frames += 1
+        _add_moments(ctx, spots)
+        self._associate(spots)
+        return SpotResult(spots, ERR_OK, (time.perf_counter() - t0) * 1000.0)
+
+    def _full_search(self, ctx, t0):
+        _, result = detect_spots(ctx, self.algo_type, self.max_spots, draw=False,
+                                 pyramid=self.pyramid, threshold=self.threshold)
+        self.full_searches += 1
+        self._since_full = 0
+        if result.ok:
+            self._associate(result.spots)
+        else:
+            self._tracks = np.zeros(0, dtype=SPOT_DTYPE)
+            self._velocity = np.zeros((0, 2), np.float32)
+        result.elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        return result
+
+    # ---------------- 预测窗口内精修 ----------------
+    def _track(self, ctx):
+        """
+        在每条轨迹的预测窗口内重新定位光斑。阈值取各窗口最大灰度的 ratio 倍
+        （最亮光斑总在轨迹中，与整幅检测的阈值一致）；otsu / triangle 方法
+        用各窗口合并的直方图计算。算法参数（核尺寸、半径范围等）每帧读取当前设置。
+        任一轨迹丢失返回 None
+        """
+        algo = get_algorithm(self.algo_type)
+        p = algo.resolve(self.threshold)
+        gray = ctx.gray
+        h, w = gray.shape[:2]
+        windows = []
+        peak = 0
+        hist = None
+        for s, (vx, vy) in zip(self._tracks, self._velocity):
+            px = int(round(float(s["x"]) + vx))
+            py = int(round(float(s["y"]) + vy))
+            if not (0 <= px < w and 0 <= py < h):
+                return None
+            half = int(float(s["radius"]) * 2) + self.margin + int(abs(vx) + abs(vy))
+            x0, y0 = max(px - half, 0), max(py - half, 0)
+            win = gray[y0:py + half + 1, x0:px + half + 1]
+            if p["threshold"] == "max":
+                peak = max(peak, int(win.max()))
+            else:
+                hist = gray_hist(win) if hist is None else hist + gray_hist(win)
+            windows.append((px, py, half, int(s["radius"])))
+        thresh_val = int(peak * p["ratio"]) if hist is None else spot_threshold(hist, p["threshold"])
+        if thresh_val <= 0:
+            return None
+        grid = _SpotGrid(gray.shape, 2 * max(w[3] for w in windows) + 1)
+        spots = np.zeros(len(windows), dtype=SPOT_DTYPE)
+        for i, (px, py, half, r_prev) in enumerate(windows):
+            if algo.refine is None:
+                # 连通域算法：窗口内取最大连通域的亮度加权质心
+                x0, y0 = max(px - half, 0), max(py - half, 0)
+                found = _components(gray[y0:py + half + 1, x0:px + half + 1], thresh_val, 1,
+                                    p["min_area"], algo.scratch, x0, y0)
+                if not len(found):
+                    return None
+                if i and np.any(np.hypot(spots["x"][:i] - found["x"][0],
+                                         spots["y"][:i] - found["y"][0]) < found["radius"][0]):
+                    return None   # 两条轨迹落到同一光斑上，整幅重新捕获
+                spots[i] = found[0]
+                continue
+            refined = _refine_in_roi(gray, thresh_val, px, py, half,
+                                     _ellipse_kernel(p["kernel"]), _open_iter(ctx, p))
+            if refined is None:
+                return None
+            x, y, r = refined
+            # C 的半径是经验放大值，跟踪期间沿用整幅检测得到的半径
+            r = r_prev if algo.refine == "coarse" else int(r)
+            if r < p["min_radius"] or r > p.get("max_radius", 3000):
+                return None
+            roi, stamp, overlap, mean_val, area = _score_candidate(gray, grid, x, y, r)
+            if overlap > p.get("max_overlap", 0.5) or mean_val < thresh_val:
+                return None
+            _put(spots, i, x, y, r, area, mean_val)
+            grid.add(x, y, r)
+        return spots
+
+    def _associate(self, spots):
+        """新结果按最近圆心与旧轨迹配对，更新速度（一阶平滑）；新出现的光斑速度为 0"""
+        velocity = np.zeros((len(spots), 2), np.float32)
+        free = list(range(len(self._tracks)))
+        for i, s in enumerate(spots):
+            if not free:
+                break
+            d = [np.hypot(float(s["x"] - self._tracks[j]["x"]), float(s["y"] - self._tracks[j]["y"]))
+                 for j in free]
+            k = int(np.argmin(d))
+            if d[k] > max(float(s["radius"]), 3.0) * 2:
+                continue
+            j = free.pop(k)
+            step = (float(s["x"] - self._tracks[j]["x"]), float(s["y"] - self._tracks[j]["y"]))
+            velocity[i] = 0.5 * self._velocity[j] + 0.5 * np.asarray(step, np.float32)
+        self._tracks = spots.copy()
+        self._velocity = velocity
@@ -22,11 +22,22 @@ sys.path.append(parent_dir)
 from cam2_3_serialControl import CameraController_1
 
 sys.path.append(os.path.dirname(__file__))
-from CSMainDialog.spot_detection import preprocess_image_cv, detect_and_draw_spots, energy_distribution
+from CSMainDialog.spot_detection import detect_and_draw_spots, energy_distribution, FrameRenderer
+from CSMainDialog.pane_view import show_panes
+from CSMainDialog.frame_context import FrameContext
+from CSMainDialog.beam_analysis import analyze_spots, save_energy_csv
+from CSMainDialog.energy_plot import EnergyPlotWidget
+from CSMainDialog.profile_plot import ProfilePlotWidget
+from CSMainDialog.diagnostics_dialog import DiagnosticsDialog
+from CSMainDialog.algo_params_dialog import AlgoParamsDialog
+from CSMainDialog.calibration import Calibrator
+from CSMainDialog.calibration_dialog import CalibrationDialog
+from CSMainDialog.frame_budget import FrameBudget
 from CSMainDialog.reconstruction3d import generate_3d_image
 from CSMainDialog.parameter_calculation import ParameterCalculationWindow
 from CSMainDialog.image_cropper import CropDialog
-from CSMainDialog.spot_algorithms import detect_spots,get_center_area
+from CSMainDialog.spot_algorithms import (detect_spots, draw_spots,
+                                          PYRAMID_MODES, pyramid_accuracy, format_accuracy)
 
 camera_frame = 15   # 手动设置相机帧率
 class DetailGainDialog(QDialog):
@@ -187,10 +198,13 @@ class Camera2Thread(QThread):
 
 class ImageProcessingWorker(QRunnable):
     """图像处理工作单元，用于线程池"""
-    def __init__(self, frame, algo_type, result_callback):
+    def __init__(self, frame, algo_type, result_callback, pyramid_level=1, budget=None, calibrator=None):
         super().__init__()
         self.frame = frame
         self.algo_type = algo_type
+        self.pyramid_level = pyramid_level
+        self.budget = budget  # 帧预算控制器，None 表示不降级（如裁切后的单张处理）
+        self.calibrator = calibrator  # 暗场 / 平场校正，None 表示不校正（裁切图已校正过）
         self.result_callback = result_callback
         self.is_running = True
 
@@ -202,16 +216,32 @@ class ImageProcessingWorker(QRunnable):
                 
             # 保存原始图像引用
             original = self.frame
+            if self.calibrator is not None:
+                # 传感器坐标系下原地校正，再镜像
+                original = self.calibrator.process(original)
             original = cv2.flip(original,1)
             
-            # 图像处理
-            gray, blur = preprocess_image_cv(original)
-            spots_output = detect_spots(original, self.algo_type)
-            heatmap = energy_distribution(gray)
+            # 按帧预算档位决定算法和分辨率
+            algo, pyramid = self.algo_type, self.pyramid_level
+            if self.budget is not None:
+                algo, pyramid = self.budget.plan(algo, pyramid)
+
+            # 图像处理（本帧统计量通过 FrameContext 共享，只计算一次）
+            ctx = FrameContext(original, self.calibrator is not None and
+                               self.calibrator.corrects_defects(original.shape))
+            gray = ctx.gray
+            _, result = detect_spots(ctx, algo, draw=False, pyramid=pyramid)
+            t0 = time.perf_counter()
+            analyze_spots(ctx, result)   # 环围能量，复用本帧的背景估计
+            energy_ms = (time.perf_counter() - t0) * 1000.0
+            # 热度图只传灰度图，在界面线程按标签尺寸着色（与原图、叠加图一起由 show_frame_panes 生成，耗时计入帧预算）
+            if self.budget is not None:
+                self.budget.record(detect=result.elapsed_ms, energy=energy_ms)
             
-            # 发送处理结果
+            # 发送处理结果（检测结果随本帧一起传递，多个工作单元互不干扰；
+            # 叠加层不在这里画，显示时按标签尺寸绘制，被丢弃的帧不付绘制开销）
             if self.is_running:
-                self.result_callback.emit((original, spots_output, heatmap, gray))
+                self.result_callback.emit((original, None, gray, result))
                 
         except Exception as e:
             print(f"图像处理错误: {str(e)}")
@@ -266,12 +296,16 @@ class Camera2Widget(QWidget):
         self.rtsp_url = "rtsp://192.168.0.105/live.sdp"
         self.detail_gain_value = 0
         self.algo_type = "B"
+        self.pyramid_level = 1  # 检测分辨率：1 为全分辨率，4 / 8 为金字塔粗到精
+        self.budget = FrameBudget(fps=camera_frame)  # 帧预算控制器
+        self.calibrator = Calibrator("Cam2")  # 暗场 / 平场校正，标定图按分辨率懒加载
         self.last_original_image = None
         self.last_gray = None
         self.last_3d_image = None
         self.cropped_image = None
-        self.spot_output = None
-        self.heatmap = None
+        self.heatmap_gray = None   # 最近显示的热度图对应的灰度图，保存时才按全分辨率着色
+        self.frame_renderer = FrameRenderer()
+        self.last_result = None
         
         # 录像相关变量
         self.is_recording = False
@@ -396,6 +430,21 @@ class Camera2Widget(QWidget):
         self.param_calc_btn.setMinimumHeight(40)
         self.param_calc_btn.clicked.connect(self.open_parameter_calculation_window)
 
+        self.diag_btn = QPushButton("🩺 检测诊断")
+        self.diag_btn.setObjectName("control_btn")
+        self.diag_btn.setMinimumHeight(40)
+        self.diag_btn.clicked.connect(self.open_diagnostics)
+
+        self.algo_params_btn = QPushButton("⚙ 算法参数")
+        self.algo_params_btn.setObjectName("control_btn")
+        self.algo_params_btn.setMinimumHeight(40)
+        self.algo_params_btn.clicked.connect(self.open_algo_params)
+
+        self.calib_btn = QPushButton("🎯 暗场/平场标定")
+        self.calib_btn.setObjectName("control_btn")
+        self.calib_btn.setMinimumHeight(40)
+        self.calib_btn.clicked.connect(self.open_calibration)
+
         self.save_log_btn = QPushButton("💾 保存日志")
         self.save_log_btn.setObjectName("control_btn")
         self.save_log_btn.setMinimumHeight(40)
@@ -405,6 +454,9 @@ class Camera2Widget(QWidget):
         top_layout.addWidget(self.show3d_btn)
         top_layout.addWidget(self.save_all_btn)
         top_layout.addWidget(self.param_calc_btn)
+        top_layout.addWidget(self.diag_btn)
+        top_layout.addWidget(self.algo_params_btn)
+        top_layout.addWidget(self.calib_btn)
         top_layout.addWidget(self.save_log_btn)
         
         top_layout.addStretch()
@@ -443,7 +495,8 @@ class Camera2Widget(QWidget):
             ("标准算法", "A"),
             ("双光斑算法", "B"),
             ("单光斑去噪", "C"),
-            ("框选识别", "D")
+            ("框选识别", "D"),
+            ("连通域算法", "E")
         ]
 
         for idx, (text, key) in enumerate(algo_buttons):
@@ -461,6 +514,18 @@ class Camera2Widget(QWidget):
             lambda b: setattr(self, 'algo_type', b.property("algo_key"))
         )
 
+        # 检测分辨率（金字塔粗到精）
+        self.pyramid_combo = QComboBox()
+        for text, level in PYRAMID_MODES:
+            self.pyramid_combo.addItem(text, level)
+        self.pyramid_combo.setFixedHeight(35)
+        self.pyramid_combo.currentIndexChanged.connect(self.on_pyramid_changed)
+        algo_layout.addWidget(self.pyramid_combo)
+
+        # 帧预算档位
+        self.budget_label = QLabel(f"性能档位: {self.budget.level_text()}")
+        algo_layout.addWidget(self.budget_label)
+
         left_layout.addWidget(algo_group)
         
         # 相机控制
@@ -620,6 +685,23 @@ class Camera2Widget(QWidget):
         
         right_layout.addWidget(display_group)
         right_layout.setStretch(0, 1)  # 让显示区域拉伸填充空间
+
+        energy_group = QGroupBox("环围能量")
+        energy_layout = QVBoxLayout(energy_group)
+        self.energy_plot = EnergyPlotWidget()
+        energy_layout.addWidget(self.energy_plot)
+        profile_group = QGroupBox("X / Y 剖面")
+        profile_layout = QVBoxLayout(profile_group)
+        self.profile_plot = ProfilePlotWidget()
+        profile_layout.addWidget(self.profile_plot)
+        # 环围能量与剖面并排，只占一行高度
+        plots_layout = QHBoxLayout()
+        plots_layout.addWidget(energy_group, 1)
+        plots_layout.addWidget(profile_group, 2)
+        plots_widget = QWidget()
+        plots_widget.setLayout(plots_layout)
+        plots_widget.setMaximumHeight(260)
+        right_layout.addWidget(plots_widget)
         
         content_layout.addWidget(left_panel)
         content_layout.addWidget(right_panel, 1)  # 右侧权重更高，获得更多空间
@@ -817,6 +899,10 @@ class Camera2Widget(QWidget):
                 if (frame.shape[1], frame.shape[0]) != (self.video_params["width"], self.video_params["height"]):
                     frame = cv2.resize(frame, (self.video_params["width"], self.video_params["height"]))
                 self.video_writer.write(frame)
+
+            # 帧预算隔帧档位下跳过本帧
+            if not self.budget.begin_frame():
+                return
             
             # 停止当前可能正在运行的处理任务
             if self.current_processing_worker:
@@ -824,7 +910,9 @@ class Camera2Widget(QWidget):
                 self.current_processing_worker = None
                 
             # 使用线程池处理图像
-            self.current_processing_worker = ImageProcessingWorker(frame, self.algo_type, self.processing_result)
+            self.current_processing_worker = ImageProcessingWorker(frame, self.algo_type, self.processing_result,
+                                                                  self.pyramid_level, self.budget,
+                                                                  self.calibrator)
             self.thread_pool.start(self.current_processing_worker)
                 
         except Exception as e:
@@ -837,10 +925,11 @@ class Camera2Widget(QWidget):
             if not results:
                 return
                 
-            frame, spots_output, heatmap, gray = results
+            frame, spots_output, gray, result = results
             self.last_original_image = frame
             self.last_gray = gray
-            self.image_signal.emit((frame, spots_output, heatmap))
+            self._update_budget_label()
+            self.image_signal.emit((frame, spots_output, gray, result))
         except Exception as e:
             self.update_status(f"处理结果更新失败: {str(e)}", level="error")
 
@@ -902,18 +991,29 @@ class Camera2Widget(QWidget):
         except Exception as e:
             self.update_status(f"图像显示错误: {str(e)}", level="error")
 
+    def show_frame_panes(self, frame, result):
+        """原图 / 光斑叠加 / 热度图三个窗格由同一张缩小图生成（见 FrameRenderer），耗时计入帧预算"""
+        try:
+            t0 = time.perf_counter()
+            spots = result.spots if result is not None else None
+            show_panes(self.frame_renderer, frame, spots, self.label1, self.label2, self.label3)
+            self.budget.record_deferred(display=(time.perf_counter() - t0) * 1000.0)
+        except Exception as e:
+            self.update_status(f"图像显示错误: {str(e)}", level="error")
+
     def _update_display(self, images):
-        frame, spots_output, heatmap = images
-        self.show_cv_image(self.label1, frame)
-        self.show_cv_image(self.label2, spots_output)
-        self.show_cv_image(self.label3, heatmap)
-        center,area = get_center_area()
-        self.update_status(f"光斑坐标：{center}")
-        self.update_status(f"光斑面积：{area}")
+        frame, spots_output, gray, result = images
+        self.show_frame_panes(frame, result)
+        self.energy_plot.update_energy(result.energy)
+        self.profile_plot.update_profile(result.profile)
+        self.update_status(f"光斑坐标：{result.centers()}")
+        self.update_status(f"光斑面积：{result.areas()}")
+        if len(result):
+            self.update_status("光斑 D4σ：" + ", ".join(f"{dx:.1f}×{dy:.1f}" for dx, dy in result.widths()))
 
         #更新图像
-        self.spot_output = spots_output
-        self.heatmap = heatmap
+        self.heatmap_gray = gray
+        self.last_result = result
         
         if self.last_3d_image is not None:
             self.show_cv_image(self.label4, self.last_3d_image)
@@ -933,28 +1033,60 @@ class Camera2Widget(QWidget):
                 
             # 使用线程池处理裁切后的图像
             self.current_processing_worker = ImageProcessingWorker(
-                cropped_img, self.algo_type, self.cropped_processing_result)
+                cropped_img, self.algo_type, self.cropped_processing_result, self.pyramid_level)
             self.thread_pool.start(self.current_processing_worker)
             self.update_status("图像裁切完成")
 
+    def open_diagnostics(self):
+        """打开检测诊断面板（各错误码计数和最后发生时间）"""
+        self.diagnostics_dialog = DiagnosticsDialog(self, self.add_log)
+        self.diagnostics_dialog.show()
+
+    def open_algo_params(self):
+        """打开检测算法参数面板，修改后下一帧生效"""
+        self.algo_params_dialog = AlgoParamsDialog(self, self.algo_type, self.add_log)
+        self.algo_params_dialog.show()
+
+    def open_calibration(self):
+        """打开暗场 / 平场标定面板"""
+        self.calibration_dialog = CalibrationDialog(self.calibrator, self, self.add_log)
+        self.calibration_dialog.show()
+
+    def _update_budget_label(self):
+        """刷新帧预算档位显示，档位变化时写日志"""
+        text = self.budget.level_text()
+        if not self.budget_label.text().endswith(text):
+            self.add_log(f"性能档位切换为 {self.budget.status_text()}")
+        self.budget_label.setText(f"性能档位: {text}")
+        self.budget_label.setToolTip(self.budget.status_text())
+
+    def on_pyramid_changed(self, index):
+        """切换检测分辨率；切到金字塔模式时用当前帧报告与全分辨率结果的差异"""
+        self.pyramid_level = self.pyramid_combo.itemData(index)
+        self.add_log(f"检测分辨率已切换为: {self.pyramid_combo.itemText(index)}")
+        if self.pyramid_level > 1 and self.last_original_image is not None:
+            report, _, _ = pyramid_accuracy(self.last_original_image, self.algo_type,
+                                            self.pyramid_level)
+            self.add_log(format_accuracy(report, self.pyramid_level))
+
     def on_cropped_image_processed(self, results):
         """裁切后的处理结果：务必同步更新 last_gray 和 last_original_image"""
         if not results:
             return
 
-        frame, spots_output, heatmap, gray = results
+        frame, spots_output, gray, result = results
 
         # 更新显示
-        self.show_cv_image(self.label1, frame)
-        self.show_cv_image(self.label2, spots_output)
-        self.show_cv_image(self.label3, heatmap)
+        self.show_frame_panes(frame, result)
+        self.energy_plot.update_energy(result.energy)
+        self.profile_plot.update_profile(result.profile)
 
         # 同步更新，用于 3D 重构
         self.cropped_image = frame.copy()
         self.last_original_image = frame.copy()
-        self.spot_output = spots_output
-        self.heatmap = heatmap
+        self.heatmap_gray = gray
         self.last_gray = gray
+        self.last_result = result
 
 
     def crop_image(self):
@@ -1005,16 +1137,26 @@ class Camera2Widget(QWidget):
 
             # 如果有处理后的图像也一并保存
 
-            spots_filename = f"{save_dir}/spots_{current_time}.png"
-            cv2.imwrite(spots_filename, self.spot_output)
+            # 光斑叠加图只在保存时按全分辨率绘制
+            if self.last_result is not None:
+                spots_filename = f"{save_dir}/spots_{current_time}.png"
+                cv2.imwrite(spots_filename, draw_spots(self.last_original_image, self.last_result.spots))
             
-            heatmap_filename = f"{save_dir}/heatmap_{current_time}.png"
-            cv2.imwrite(heatmap_filename, self.heatmap)
+            # 热度图同样只在保存时按全分辨率着色
+            if self.heatmap_gray is not None:
+                heatmap_filename = f"{save_dir}/heatmap_{current_time}.png"
+                cv2.imwrite(heatmap_filename, energy_distribution(self.heatmap_gray))
                 
             if self.last_3d_image is not None:
                 img3d_filename = f"{save_dir}/3d_{current_time}.png"
                 cv2.imwrite(img3d_filename, self.last_3d_image)
 
+            # 环围能量曲线（各光斑 EE 与桶内能量）
+            if self.last_result is not None and self.last_result.ok:
+                energies = self.last_result.energy or analyze_spots(self.last_original_image, self.last_result)
+                save_energy_csv(f"{save_dir}/energy_{current_time}.csv", energies,
+                                self.energy_plot.bucket_radius())
+
             self.update_status(f"所有图像已保存到 {save_dir}")
             QMessageBox.information(self, "成功", f"所有图像已保存到 {save_dir}")
             
@@ -1054,7 +1196,7 @@ class Camera2Widget(QWidget):
 
     def open_parameter_calculation_window(self):
         try:
-            self.param_window = ParameterCalculationWindow()
+            self.param_window = ParameterCalculationWindow(lambda: self.last_result)
             self.param_window.show()
         except Exception as e:
             self.update_status(f"打开参数计算窗口失败: {str(e)}", level="error")
@@ -11,7 +11,7 @@ from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
                             QDialog, QSlider, QMessageBox, QSpinBox, QDialogButtonBox,
                             QTextEdit, QComboBox, QStackedWidget, QTableWidget, 
                             QTableWidgetItem, QLineEdit, QGridLayout, QButtonGroup,
-                         QSpacerItem, QRadioButton, QScrollArea,QFileDialog)
+                         QSpacerItem, QRadioButton, QScrollArea,QFileDialog, QCheckBox)
 import serial
 import serial.tools.list_ports
 
@@ -24,11 +24,23 @@ sys.path.append(os.path.dirname(__file__))
 
 #导入自己写的包
 from cam2_3_serialControl import CameraController_2  # 导入相机控制类
-from CSMainDialog.spot_detection import preprocess_image_cv, detect_and_draw_spots, energy_distribution
+from CSMainDialog.spot_detection import detect_and_draw_spots, energy_distribution, FrameRenderer
+from CSMainDialog.pane_view import show_panes
+from CSMainDialog.frame_context import FrameContext
+from CSMainDialog.beam_analysis import analyze_spots, save_energy_csv
+from CSMainDialog.energy_plot import EnergyPlotWidget
+from CSMainDialog.profile_plot import ProfilePlotWidget
+from CSMainDialog.diagnostics_dialog import DiagnosticsDialog
+from CSMainDialog.algo_params_dialog import AlgoParamsDialog
+from CSMainDialog.calibration import Calibrator
+from CSMainDialog.calibration_dialog import CalibrationDialog
+from CSMainDialog.spot_tracking import SpotTracker
+from CSMainDialog.frame_budget import FrameBudget
 from CSMainDialog.reconstruction3d import generate_3d_image
 from CSMainDialog.parameter_calculation import ParameterCalculationWindow
 from CSMainDialog.image_cropper import CropDialog
-from CSMainDialog.spot_algorithms import detect_spots,get_center_area
+from CSMainDialog.spot_algorithms import (detect_spots,
+                                          PYRAMID_MODES, pyramid_accuracy, format_accuracy)
 
 camera_frame = 30
 
@@ -162,17 +174,23 @@ class Camera3Thread(QThread):
 
 class ImageProcessingThread(QThread):
     """图像处理线程，独立于UI线程"""
-    processed_signal = pyqtSignal(tuple)  # (原始帧, 光斑识别结果, 能量分布)
+    processed_signal = pyqtSignal(tuple)  # (原始帧, 光斑识别结果, 灰度图（热度图由它生成）, 检测结果)
     
     def __init__(self):
         super().__init__()
         self.running = True
         self.current_frame = None
         self.algo_type = "A"
+        self.pyramid_level = 1
+        self.tracker = None  # 跟踪模式下的 SpotTracker，None 表示每帧整幅检测
+        self.budget = FrameBudget(fps=camera_frame)  # 帧预算控制器
+        self.calibrator = Calibrator("Cam3")  # 暗场 / 平场校正，标定图按分辨率懒加载
         self.lock = False  # 用于帧丢弃机制的锁
         
     def set_frame(self, frame):
         """设置当前要处理的帧，如果正在处理则丢弃旧帧"""
+        if not self.budget.begin_frame():
+            return  # 帧预算隔帧档位下跳过本帧
         if self.lock:
             return  # 正在处理，丢弃当前帧
         self.current_frame = frame
@@ -180,6 +198,22 @@ class ImageProcessingThread(QThread):
     def set_algo_type(self, algo_type):
         """设置算法类型"""
         self.algo_type = algo_type
+        if self.tracker is not None:
+            self.tracker.configure(algo_type=algo_type)
+
+    def set_pyramid_level(self, level):
+        """设置检测分辨率（1 为全分辨率，4 / 8 为金字塔粗到精）"""
+        self.pyramid_level = level
+        if self.tracker is not None:
+            self.tracker.configure(pyramid=level)
+
+    def set_tracking(self, enabled):
+        """开启 / 关闭跟踪模式：只在上一帧光斑的预测窗口内检测，每 camera_frame 帧整幅校正一次"""
+        if enabled:
+            self.tracker = SpotTracker(self.algo_type, full_every=camera_frame,
+                                       pyramid=self.pyramid_level)
+        else:
+            self.tracker = None
         
     def run(self):
         while self.running:
@@ -190,12 +224,24 @@ class ImageProcessingThread(QThread):
                     self.current_frame = None  # 处理后清空，准备接收新帧
                     
                     # 处理帧
-                    gray, blur = preprocess_image_cv(frame)
-                    spots_output = detect_spots(frame, self.algo_type)
-                    heatmap = energy_distribution(gray)
+                    # 按帧预算档位决定分辨率和是否隔帧（跟踪模式本身已很廉价，不改分辨率）
+                    algo, pyramid = self.budget.plan(self.algo_type, self.pyramid_level)
+                    # 暗场 / 平场 / 坏点校正；界面线程同时在显示 / 录制同一帧，结果写进校正器轮流使用的输出缓冲区
+                    frame = self.calibrator.process(frame, inplace=False)
+                    ctx = FrameContext(frame, self.calibrator.corrects_defects(frame.shape))
+                    tracker = self.tracker
+                    if tracker is not None:
+                        result = tracker.update(ctx)
+                    else:
+                        _, result = detect_spots(ctx, algo, draw=False, pyramid=pyramid)
+                    t0 = time.perf_counter()
+                    analyze_spots(ctx, result)   # 环围能量，复用本帧的背景估计
+                    energy_ms = (time.perf_counter() - t0) * 1000.0
+                    # 热度图只传灰度图，在界面线程按标签尺寸着色（与原图、叠加图一起由 show_frame_panes 生成，耗时计入帧预算）
+                    self.budget.record(detect=result.elapsed_ms, energy=energy_ms)
                     
-                    # 发送处理结果
-                    self.processed_signal.emit((frame, spots_output, heatmap))
+                    # 发送处理结果（叠加层留到显示时按标签尺寸绘制）
+                    self.processed_signal.emit((frame, None, ctx.gray, result))
                 except Exception as e:
                     print(f"图像处理错误: {str(e)}")
                 finally:
@@ -221,11 +267,14 @@ class Camera3Widget(QWidget):
         self.controller = CameraController_2()  # 创建相机控制器实例
         self.setWindowTitle("RTSP视频流监控与相机控制")
         self.algo_type = "A"
+        self.pyramid_level = 1
         self.last_original_image = None
         self.last_gray = None
         self.last_3d_image = None
         self.cropped_image = None
-        self.heatmap = None
+        self.heatmap_gray = None   # 最近显示的热度图对应的灰度图，保存时才按全分辨率着色
+        self.frame_renderer = FrameRenderer()
+        self.last_result = None
 
         # 录像相关变量
         self.is_recording = False
@@ -346,6 +395,21 @@ class Camera3Widget(QWidget):
         self.param_calc_btn.setMinimumHeight(40)
         self.param_calc_btn.clicked.connect(self.open_parameter_calculation_window)
 
+        self.diag_btn = QPushButton("🩺 检测诊断")
+        self.diag_btn.setObjectName("control_btn")
+        self.diag_btn.setMinimumHeight(40)
+        self.diag_btn.clicked.connect(self.open_diagnostics)
+
+        self.algo_params_btn = QPushButton("⚙ 算法参数")
+        self.algo_params_btn.setObjectName("control_btn")
+        self.algo_params_btn.setMinimumHeight(40)
+        self.algo_params_btn.clicked.connect(self.open_algo_params)
+
+        self.calib_btn = QPushButton("🎯 暗场/平场标定")
+        self.calib_btn.setObjectName("control_btn")
+        self.calib_btn.setMinimumHeight(40)
+        self.calib_btn.clicked.connect(self.open_calibration)
+
         self.save_log_btn = QPushButton("💾 保存日志")
         self.save_log_btn.setObjectName("control_btn")
         self.save_log_btn.setMinimumHeight(40)
@@ -356,6 +420,9 @@ class Camera3Widget(QWidget):
         top_layout.addWidget(self.show3d_btn)
         top_layout.addWidget(self.save_all_btn)
         top_layout.addWidget(self.param_calc_btn)
+        top_layout.addWidget(self.diag_btn)
+        top_layout.addWidget(self.algo_params_btn)
+        top_layout.addWidget(self.calib_btn)
         top_layout.addWidget(self.save_log_btn)
 
         # 算法选择（顶部）
@@ -364,7 +431,7 @@ class Camera3Widget(QWidget):
         top_layout.addWidget(algo_label)
         
         self.btn_grp = QButtonGroup(self)
-        algo_buttons = [("标准", "A"), ("双光斑", "B"), ("单光斑去噪", "C"), ("框选识别", "D")]
+        algo_buttons = [("标准", "A"), ("双光斑", "B"), ("单光斑去噪", "C"), ("框选识别", "D"), ("连通域", "E")]
         for text, key in algo_buttons:
             btn = QPushButton(text)
             btn.setCheckable(True)
@@ -380,6 +447,23 @@ class Camera3Widget(QWidget):
         self.btn_grp.buttonClicked.connect(
             lambda b: self._on_algo_changed(b.property("algo_key"))
         )
+
+        # 检测分辨率（金字塔粗到精）
+        self.pyramid_combo = QComboBox()
+        for text, level in PYRAMID_MODES:
+            self.pyramid_combo.addItem(text, level)
+        self.pyramid_combo.setMinimumHeight(40)
+        self.pyramid_combo.currentIndexChanged.connect(self._on_pyramid_changed)
+        top_layout.addWidget(self.pyramid_combo)
+
+        # 跟踪模式：只搜索上一帧光斑附近的窗口
+        self.tracking_check = QCheckBox("跟踪模式")
+        self.tracking_check.toggled.connect(self._on_tracking_toggled)
+        top_layout.addWidget(self.tracking_check)
+
+        # 帧预算档位
+        self.budget_label = QLabel(f"性能档位: {self.processing_thread.budget.level_text()}")
+        top_layout.addWidget(self.budget_label)
         
         top_layout.addStretch()
         main_layout.addWidget(top_toolbar)
@@ -608,6 +692,23 @@ class Camera3Widget(QWidget):
         display_layout.setColumnStretch(1, 1)
         
         right_layout.addWidget(display_group)
+
+        energy_group = QGroupBox("环围能量")
+        energy_layout = QVBoxLayout(energy_group)
+        self.energy_plot = EnergyPlotWidget()
+        energy_layout.addWidget(self.energy_plot)
+        profile_group = QGroupBox("X / Y 剖面")
+        profile_layout = QVBoxLayout(profile_group)
+        self.profile_plot = ProfilePlotWidget()
+        profile_layout.addWidget(self.profile_plot)
+        # 环围能量与剖面并排，只占一行高度
+        plots_layout = QHBoxLayout()
+        plots_layout.addWidget(energy_group, 1)
+        plots_layout.addWidget(profile_group, 2)
+        plots_widget = QWidget()
+        plots_widget.setLayout(plots_layout)
+        plots_widget.setMaximumHeight(260)
+        right_layout.addWidget(plots_widget)
         content_layout.addWidget(right_panel, 1)  # 权重1，让显示区域尽可能大
         
         main_layout.addLayout(content_layout, 1)  # 权重1，让内容区域占据主要空间
@@ -887,16 +988,21 @@ class Camera3Widget(QWidget):
     def _on_processed(self, results):
         """处理图像处理线程返回的结果"""
         try:
-            frame, spots_output, heatmap = results
-            self.last_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            frame, spots_output, gray, result = results
+            self.last_gray = gray
             
             # 显示处理后的图像
-            self.show_cv_image(self.label2, spots_output)
-            self.show_cv_image(self.label3, heatmap)
-            self.heatmap = heatmap
-            center,area = get_center_area()
-            self.update_status(f"光斑坐标：{center}")
-            self.update_status(f"光斑面积：{area}")
+            # 原图窗格由 _fast_show_original 逐帧刷新，这里只生成叠加图和热度图
+            self.show_frame_panes(frame, result, original=False)
+            self.heatmap_gray = gray
+            self.energy_plot.update_energy(result.energy)
+            self.profile_plot.update_profile(result.profile)
+            self.last_result = result
+            self._update_budget_label()
+            self.update_status(f"光斑坐标：{result.centers()}")
+            self.update_status(f"光斑面积：{result.areas()}")
+            if len(result):
+                self.update_status("光斑 D4σ：" + ", ".join(f"{dx:.1f}×{dy:.1f}" for dx, dy in result.widths()))
             
         except Exception as e:
             error_msg = f"处理结果显示错误: {str(e)}"
@@ -937,14 +1043,22 @@ class Camera3Widget(QWidget):
         except Exception as e:
             self.update_status(f"图像显示错误: {str(e)}")
 
+    def show_frame_panes(self, frame, result, original=True):
+        """原图 / 光斑叠加 / 热度图三个窗格由同一张缩小图生成（见 FrameRenderer），耗时计入帧预算"""
+        try:
+            t0 = time.perf_counter()
+            spots = result.spots if result is not None else None
+            show_panes(self.frame_renderer, frame, spots, self.label1 if original else None, self.label2,
+                       self.label3)
+            self.processing_thread.budget.record_deferred(display=(time.perf_counter() - t0) * 1000.0)
+        except Exception as e:
+            self.update_status(f"图像显示错误: {str(e)}")
+
     def _update_display(self, images):
-        frame, spots_output, heatmap = images
-        self.show_cv_image(self.label1, frame)
-        self.show_cv_image(self.label2, spots_output)
-        self.show_cv_image(self.label3, heatmap)
-        center,area = get_center_area()
-        self.status_signal.emit(f"光斑坐标：{center}")
-        self.status_signal.emit(f"光斑面积：{area}")
+        frame, spots_output, gray, result = images
+        self.show_frame_panes(frame, result)
+        self.status_signal.emit(f"光斑坐标：{result.centers()}")
+        self.status_signal.emit(f"光斑面积：{result.areas()}")
 
         if self.last_3d_image is not None:
             self.show_cv_image(self.label4, self.last_3d_image)
@@ -963,17 +1077,20 @@ class Camera3Widget(QWidget):
         self.last_original_image = cropped_img.copy()
 
         # 重新处理裁切图像
-        gray, _ = preprocess_image_cv(cropped_img)
-        spots_output = detect_spots(cropped_img, self.algo_type)
-        heatmap = energy_distribution(gray)
+        ctx = FrameContext(cropped_img)
+        gray = ctx.gray
+        _, result = detect_spots(ctx, self.algo_type, draw=False, pyramid=self.pyramid_level)
+        analyze_spots(ctx, result)
 
         # 更新三个窗格
-        self.show_cv_image(self.label1, cropped_img)
-        self.show_cv_image(self.label2, spots_output)
-        self.show_cv_image(self.label3, heatmap)
+        self.show_frame_panes(cropped_img, result)
+        self.heatmap_gray = gray
+        self.energy_plot.update_energy(result.energy)
+        self.profile_plot.update_profile(result.profile)
 
         # 更新 last_gray，
         self.last_gray = gray
+        self.last_result = result
 
     def crop_image(self):
         if self.last_original_image is None:
@@ -1020,6 +1137,48 @@ class Camera3Widget(QWidget):
         self.processing_thread.set_algo_type(algo_type)
         print(f"算法类型已切换为: {algo_type}")
 
+    def open_diagnostics(self):
+        """打开检测诊断面板（各错误码计数和最后发生时间）"""
+        self.diagnostics_dialog = DiagnosticsDialog(self, self.add_log)
+        self.diagnostics_dialog.show()
+
+    def open_algo_params(self):
+        """打开检测算法参数面板，修改后下一帧生效"""
+        self.algo_params_dialog = AlgoParamsDialog(self, self.algo_type, self.add_log)
+        self.algo_params_dialog.show()
+
+    def open_calibration(self):
+        """打开暗场 / 平场标定面板"""
+        self.calibration_dialog = CalibrationDialog(self.processing_thread.calibrator, self, self.add_log)
+        self.calibration_dialog.show()
+
+    def _update_budget_label(self):
+        """刷新帧预算档位显示，档位变化时写日志"""
+        budget = self.processing_thread.budget
+        text = budget.level_text()
+        if not self.budget_label.text().endswith(text):
+            self.add_log(f"性能档位切换为 {budget.status_text()}")
+        self.budget_label.setText(f"性能档位: {text}")
+        self.budget_label.setToolTip(budget.status_text())
+
+    def _on_tracking_toggled(self, enabled):
+        """切换跟踪模式；关闭时输出本次跟踪的整幅回退统计"""
+        tracker = self.processing_thread.tracker
+        if not enabled and tracker is not None:
+            self.add_log(tracker.format_stats())
+        self.processing_thread.set_tracking(enabled)
+        self.add_log("跟踪模式已开启" if enabled else "跟踪模式已关闭")
+
+    def _on_pyramid_changed(self, index):
+        """检测分辨率改变时更新，并用当前帧报告金字塔与全分辨率结果的差异"""
+        self.pyramid_level = self.pyramid_combo.itemData(index)
+        self.processing_thread.set_pyramid_level(self.pyramid_level)
+        self.add_log(f"检测分辨率已切换为: {self.pyramid_combo.itemText(index)}")
+        if self.pyramid_level > 1 and self.last_original_image is not None:
+            report, _, _ = pyramid_accuracy(self.last_original_image, self.algo_type,
+                                            self.pyramid_level)
+            self.add_log(format_accuracy(report, self.pyramid_level))
+
     # 串口控制函数
     def connect_serial(self):
         """连接串口"""
@@ -1136,6 +1295,7 @@ class Camera3Widget(QWidget):
                 self.controller.set_frame_rate(fps)  # 假设控制器有此方法
                 global camera_frame
                 camera_frame = fps      # 帧频同步设置
+                self.processing_thread.budget.set_fps(fps)
                 self.update_status(f"帧频已设置为 {fps}Hz")
         except ValueError:
             QMessageBox.warning(self, "输入错误", "请输入有效的整数")
@@ -1160,9 +1320,16 @@ class Camera3Widget(QWidget):
                 img3d_path = f"{save_dir}/Cam3_3d_{current_time}.png"
                 cv2.imwrite(img3d_path, self.last_3d_image)
 
-            if self.heatmap is not None:
+            # 热度图只在保存时按全分辨率着色
+            if self.heatmap_gray is not None:
                 heatmap_path = f"{save_dir}/Cam3_heatmap_{current_time}.png"
-                cv2.imwrite(heatmap_path, self.heatmap)
+                cv2.imwrite(heatmap_path, energy_distribution(self.heatmap_gray))
+
+            # 环围能量曲线（各光斑 EE 与桶内能量）
+            if self.last_result is not None and self.last_result.ok and self.last_gray is not None:
+                energies = self.last_result.energy or analyze_spots(self.last_gray, self.last_result)
+                save_energy_csv(f"{save_dir}/Cam3_energy_{current_time}.csv", energies,
+                                self.energy_plot.bucket_radius())
 
             
                 
@@ -1174,7 +1341,7 @@ class Camera3Widget(QWidget):
     def open_parameter_calculation_window(self):
         """打开参数计算窗口"""
         self.update_status("已打开激光参数计算器")
-        self.param_window = ParameterCalculationWindow()
+        self.param_window = ParameterCalculationWindow(lambda: self.last_result)
         self.param_window.show()
 
     def closeEvent(self, event):
@@ -1,15 +1,20 @@
 #CommonStreamGUI.py
 import os
-
-os.environ['IPX_CAMSDK_ROOT'] = os.path.dirname(os.path.abspath(__file__)) + '\Imperx Camera SDK'
-
 import sys
-from PyQt5.QtGui import QIcon
-from PyQt5.QtWidgets import QApplication
-from CSMainDialog.mainDlg import main_Dialog
+import multiprocessing
 
 
 if __name__ == '__main__':
+	# 多进程检测的工作进程以 spawn 方式启动，打包成 exe 后需要这一行
+	multiprocessing.freeze_support()
+
+	# spawn 会在每个工作进程里把本脚本当作 __mp_main__ 重新导入一遍；
+	# 相机 SDK 路径和界面相关的导入（PyQt、tkinter、相机 SDK、matplotlib）都放在这里，
+	# 工作进程只导入 spot_pool → spot_algorithms / beam_analysis / frame_context，不加载界面
+	os.environ['IPX_CAMSDK_ROOT'] = os.path.dirname(os.path.abspath(__file__)) + '\\Imperx Camera SDK'
+	from PyQt5.QtGui import QIcon
+	from PyQt5.QtWidgets import QApplication
+	from CSMainDialog.mainDlg import main_Dialog
 
 	app = QApplication(sys.argv)
 	icon = os.path.dirname(os.path.abspath(__file__)) + '/CSMainDialog/CETC.ico'
@@ -0,0 +1,140 @@
+# bench_spots.py
+"""
+光斑检测基准测试：在合成图像上测注册表中的各算法（ALGORITHMS）、detect_spots、
+detect_and_draw_spots 和 energy_distribution 的耗时 / 吞吐量，
+并和真值对比给出圆心误差、漏检数、误检数；带二阶矩的目标在未饱和高斯光斑上
+另给出 D4σ 相对真值 4σ 的误差（multi3 / multi3_close 即多光斑时的宽度检查）。
+
+用法（在仓库根目录）：
+    python benchmarks/bench_spots.py
+    python benchmarks/bench_spots.py --resolutions IR Cam1 --frames 5 --repeat 3 --output bench_output.txt
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "CSMainDialog"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from frame_context import FrameContext
+from spot_algorithms import ALGORITHMS, detect_spots
+from spot_detection import detect_and_draw_spots, energy_distribution
+from synthetic import RESOLUTIONS, scenarios
+
+def _spots_xy(spots, sub_pixel=False):
+    """[(x, y), ...]；sub_pixel=True 时为 [(cx, cy, D4σ 均值), ...]"""
+    if sub_pixel:
+        return [(float(s["cx"]), float(s["cy"]), (float(s["d4x"]) + float(s["d4y"])) / 2.0) for s in spots]
+    return [(float(s["x"]), float(s["y"])) for s in spots]
+
+def _legacy_detect(img):
+    out = detect_and_draw_spots(img, log_func=lambda msg: None)
+    # 未找到局部极大值时只返回图像
+    return out[1] if isinstance(out, tuple) else []
+
+def _heatmap(img):
+    energy_distribution(img)
+    return None
+
+def _registered(key):
+    algo = ALGORITHMS[key]
+    return lambda img: _spots_xy(algo(FrameContext(img), 3)[0])
+
+# (名称, 调用方式)；返回 [(x, y), ...] 或 [(x, y, D4σ), ...]，返回 None 表示不参与精度统计
+TARGETS = [(f"算法 {key}", _registered(key)) for key in sorted(ALGORITHMS)] + [
+    ("detect_spots(A)+矩", lambda img: _spots_xy(detect_spots(img, "A", draw=False)[1].spots, True)),
+    ("detect_and_draw_spots", _legacy_detect),
+    ("energy_distribution", _heatmap),
+]
+
+def match(truth, found):
+    """
+    按最近距离一一配对：距离不超过 2σ（至少 3 像素）算命中。
+    返回 (圆心误差列表, D4σ 相对误差列表, 漏检数, 误检数)；found 不带宽度时 D4σ 误差列表为空
+    """
+    remaining = list(found)
+    errors, width_errors = [], []
+    for x, y, sigma in truth:
+        if not remaining:
+            break
+        d = [np.hypot(f[0] - x, f[1] - y) for f in remaining]
+        k = int(np.argmin(d))
+        if d[k] <= max(2 * sigma, 3.0):
+            errors.append(d[k])
+            hit = remaining.pop(k)
+            if len(hit) > 2:
+                width_errors.append(abs(hit[2] / (4.0 * sigma) - 1.0))
+    return errors, width_errors, len(truth) - len(errors), len(remaining)
+
+def run(resolutions, frames, repeat, seed=0):
+    """逐场景逐目标计时，返回结果行列表"""
+    rows = []
+    for scene, batch in scenarios(resolutions, frames, seed):
+        h, w = batch[0].image.shape
+        for name, fn in TARGETS:
+            times, errors, width_errors, missed, false = [], [], [], 0, 0
+            for frame in batch:
+                # 屏蔽算法里的错误提示，避免刷屏
+                with contextlib.redirect_stdout(io.StringIO()):
+                    found = fn(frame.image)           # 预热 + 取结果
+                    t0 = time.perf_counter()
+                    for _ in range(repeat):
+                        fn(frame.image)
+                    times.append((time.perf_counter() - t0) / repeat)
+                if found is not None:
+                    e, we, m, f = match(frame.truth, found)
+                    errors += e
+                    if frame.gaussian_width:
+                        width_errors += we
+                    missed += m
+                    false += f
+            ms = 1000.0 * float(np.median(times))
+            rows.append({
+                "scene": scene, "size": f"{w}x{h}", "target": name, "ms": ms,
+                "fps": 1000.0 / ms if ms > 0 else float("inf"),
+                "mpix_s": w * h / 1e6 / (ms / 1000.0) if ms > 0 else float("inf"),
+                "err_mean": float(np.mean(errors)) if errors else None,
+                "err_max": float(np.max(errors)) if errors else None,
+                "d4_err": 100.0 * float(np.max(width_errors)) if width_errors else None,
+                "missed": missed if found is not None else None,
+                "false": false if found is not None else None,
+            })
+    return rows
+
+def format_rows(rows):
+    header = (f"{'场景':<18}{'尺寸':<11}{'目标':<24}{'耗时ms':>9}{'帧/秒':>9}{'MPix/s':>9}"
+              f"{'误差均值':>9}{'误差最大':>9}{'D4σ最大误差%':>10}{'漏检':>6}{'误检':>6}")
+    lines = [header, "-" * len(header)]
+    fmt = lambda v, spec: format(v, spec) if v is not None else "-"
+    for r in rows:
+        lines.append(f"{r['scene']:<18}{r['size']:<11}{r['target']:<24}{r['ms']:>9.2f}{r['fps']:>9.1f}"
+                     f"{r['mpix_s']:>9.1f}{fmt(r['err_mean'], '.2f'):>9}{fmt(r['err_max'], '.2f'):>9}"
+                     f"{fmt(r['d4_err'], '.1f'):>10}"
+                     f"{fmt(r['missed'], 'd'):>6}{fmt(r['false'], 'd'):>6}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成光斑检测基准测试")
+    parser.add_argument("--resolutions", nargs="+", default=["IR", "HD", "Cam1"],
+                        help=f"分辨率名称 {list(RESOLUTIONS)} 或 高x宽，如 768x1024")
+    parser.add_argument("--frames", type=int, default=3, help="每个场景的帧数")
+    parser.add_argument("--repeat", type=int, default=3, help="每帧重复计时次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="同时把结果写入该文件")
+    args = parser.parse_args(argv)
+
+    resolutions = [r if r in RESOLUTIONS else tuple(int(v) for v in r.lower().split("x"))
+                   for r in args.resolutions]
+    text = format_rows(run(resolutions, args.frames, args.repeat, args.seed))
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
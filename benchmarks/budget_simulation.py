@@ -0,0 +1,58 @@
+# budget_simulation.py
+"""
+帧预算控制器（FrameBudget）的离线仿真：按给定的各分辨率每帧耗时喂给控制器，
+检查它能否稳定在合适的档位，不会在档位之间来回切换造成周期性卡顿，
+场景变廉价后又能恢复到全速。不需要相机，也不运行检测。
+
+用法（在仓库根目录）：
+    python benchmarks/budget_simulation.py
+有场景不满足预期时返回非 0 退出码。
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "CSMainDialog"))
+
+from frame_budget import BUDGET_LEVELS, FrameBudget
+
+# (场景名, 帧率, [(从第几帧起, {金字塔倍数: 每帧耗时 ms}), ...], 期望最终档位, 允许的最多切换次数)
+SCENARIOS = [
+    ("全速够用", 30, [(0, {1: 15.0, 4: 4.0})], 0, 0),
+    ("全分辨率超预算", 30, [(0, {1: 60.0, 4: 12.0})], 1, 1),
+    ("降采样也超预算", 30, [(0, {1: 120.0, 4: 40.0})], 2, 2),
+    ("场景变廉价后恢复", 30, [(0, {1: 60.0, 4: 12.0}), (1000, {1: 8.0, 4: 2.0})], 0, 2),
+]
+
+def simulate(fps, phases, frames=3000):
+    """逐帧仿真，返回 (最终档位, 档位切换次数, 第 100 帧以后耗时超出可用时间的帧数)"""
+    budget = FrameBudget(fps=fps)
+    period = 1000.0 / fps
+    switches = stalls = 0
+    costs = phases[0][1]
+    for i in range(frames):
+        for start, table in phases:
+            if i >= start:
+                costs = table
+        if not budget.begin_frame():
+            continue
+        _, pyramid = budget.plan("A", 1)
+        ms = costs[pyramid]
+        # 隔帧档位下每个被处理的帧可以用 stride 个帧周期
+        allowed = period * BUDGET_LEVELS[budget.level].stride
+        switches += budget.record(detect=ms)
+        if i >= 100 and ms > allowed:
+            stalls += 1
+    return budget.level, switches, stalls
+
+def main():
+    failed = 0
+    for name, fps, phases, level, max_switches in SCENARIOS:
+        final, switches, stalls = simulate(fps, phases)
+        ok = final == level and switches <= max_switches and stalls == 0
+        failed += not ok
+        print(f"{'通过' if ok else '失败'}  {name:12s} 最终档位 L{final}（期望 L{level}），"
+              f"切换 {switches} 次（最多 {max_switches}），稳定后卡顿帧 {stalls}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
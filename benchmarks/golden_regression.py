@@ -0,0 +1,200 @@
+# golden_regression.py
+"""
+金标准图像回归测试：用现场采集的真实帧（如 Saved_Files/Cam1..3）检查检测代码的改动
+有没有让测量结果或速度变差。
+
+目录中放参考图像和一份 annotations.json（标注的光斑中心，单位像素）：
+    {"spots_20250101_120000.png": [[1203.5, 880.2], [640.0, 512.0]], ...}
+没有标注的图像只统计耗时。
+
+对每个已注册的 detect_spots 算法，在进程池中逐图检测，统计耗时分位数（p50 / p95 / p99）
+和亚像素质心相对标注的误差、漏检、误检，写出报告，并与保存的基线比较：
+p95 耗时或平均质心误差超出阈值、或漏检 / 误检增加时返回非 0 退出码。
+多光斑图像上各光斑的质心互相串扰（几个光斑报告同一个质心）会表现为漏检加误检。
+
+用法（在仓库根目录）：
+    python benchmarks/golden_regression.py Saved_Files/Cam1 --update-baseline   # 记录基线
+    python benchmarks/golden_regression.py Saved_Files/Cam1                     # 回归检查
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "CSMainDialog"))
+
+import cv2
+from spot_algorithms import ALGORITHMS, detect_spots
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+ANNOTATION_FILE = "annotations.json"
+BASELINE_FILE = "golden_baseline.json"
+
+def find_images(root):
+    """递归查找参考图像，返回相对 root 的路径（统一用 / 分隔，便于跨平台对照标注）"""
+    found = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.lower().endswith(IMAGE_EXTS):
+                rel = os.path.relpath(os.path.join(dirpath, name), root)
+                found.append(rel.replace(os.sep, "/"))
+    return sorted(found)
+
+def _run_one(task):
+    """
+    进程池工作函数：读入一张图，用指定算法检测 repeat 次。
+    返回 (相对路径, 算法, 每次耗时毫秒列表, 质心 [(cx, cy), ...])；读图失败时质心为 None
+    """
+    root, rel, algo, repeat = task
+    img = cv2.imread(os.path.join(root, rel), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return rel, algo, [], None
+    if img.ndim == 3 and img.shape[2] == 4:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    times, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        _, result = detect_spots(img, algo, draw=False)
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return rel, algo, times, result.centroids() if result.ok else []
+
+def _match(truth, found, tol):
+    """最近邻一一配对，距离不超过 tol 算命中；返回 (误差列表, 漏检数, 误检数)"""
+    remaining = list(found)
+    errors = []
+    for tx, ty in truth:
+        if not remaining:
+            break
+        d = [np.hypot(fx - tx, fy - ty) for fx, fy in remaining]
+        k = int(np.argmin(d))
+        if d[k] <= tol:
+            errors.append(float(d[k]))
+            remaining.pop(k)
+    return errors, len(truth) - len(errors), len(remaining)
+
+def evaluate(root, algos, repeat=3, workers=None, tol=10.0):
+    """
+    在进程池中运行所有 (图像, 算法) 组合，返回报告 dict：
+    {算法: {images, p50_ms, p95_ms, p99_ms, err_mean, err_max, missed, false, failed}}
+    """
+    images = find_images(root)
+    ann_path = os.path.join(root, ANNOTATION_FILE)
+    annotations = {}
+    if os.path.exists(ann_path):
+        with open(ann_path, "r", encoding="utf-8") as f:
+            annotations = json.load(f)
+
+    tasks = [(root, rel, algo, repeat) for algo in algos for rel in images]
+    per_algo = {algo: {"lat": [], "err": [], "missed": 0, "false": 0, "failed": 0} for algo in algos}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rel, algo, times, centroids in pool.map(_run_one, tasks, chunksize=4):
+            acc = per_algo[algo]
+            if centroids is None:
+                acc["failed"] += 1
+                continue
+            acc["lat"].append(float(np.median(times)))   # 每张图取多次中位数
+            if rel in annotations:
+                e, m, f = _match(annotations[rel], centroids, tol)
+                acc["err"] += e
+                acc["missed"] += m
+                acc["false"] += f
+
+    report = {}
+    for algo, acc in per_algo.items():
+        lat, err = np.asarray(acc["lat"]), np.asarray(acc["err"])
+        report[algo] = {
+            "images": int(len(lat)),
+            "p50_ms": float(np.percentile(lat, 50)) if len(lat) else None,
+            "p95_ms": float(np.percentile(lat, 95)) if len(lat) else None,
+            "p99_ms": float(np.percentile(lat, 99)) if len(lat) else None,
+            "err_mean": float(err.mean()) if len(err) else None,
+            "err_max": float(err.max()) if len(err) else None,
+            "missed": acc["missed"],
+            "false": acc["false"],
+            "failed": acc["failed"],
+        }
+    return report
+
+def compare(report, baseline, max_latency_regress, max_error_regress):
+    """与基线比较，返回回归描述列表（空列表表示通过）"""
+    problems = []
+    for algo, cur in report.items():
+        old = baseline.get(algo)
+        if not old:
+            continue
+        if cur["p95_ms"] is not None and old.get("p95_ms"):
+            limit = old["p95_ms"] * (1.0 + max_latency_regress)
+            if cur["p95_ms"] > limit:
+                problems.append(f"算法 {algo}: p95 耗时 {cur['p95_ms']:.2f}ms 超过基线 "
+                                f"{old['p95_ms']:.2f}ms 的 {1 + max_latency_regress:.0%}")
+        if cur["err_mean"] is not None and old.get("err_mean") is not None:
+            if cur["err_mean"] > old["err_mean"] + max_error_regress:
+                problems.append(f"算法 {algo}: 平均质心误差 {cur['err_mean']:.3f}px 比基线 "
+                                f"{old['err_mean']:.3f}px 增大超过 {max_error_regress}px")
+        if cur["missed"] > old.get("missed", 0):
+            problems.append(f"算法 {algo}: 漏检 {cur['missed']} 个，基线为 {old.get('missed', 0)} 个")
+        if cur["false"] > old.get("false", 0):
+            problems.append(f"算法 {algo}: 误检 {cur['false']} 个，基线为 {old.get('false', 0)} 个")
+    return problems
+
+def format_report(report):
+    header = (f"{'算法':<6}{'图像数':>7}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}"
+              f"{'误差均值':>10}{'误差最大':>10}{'漏检':>6}{'误检':>6}{'读图失败':>9}")
+    lines = [header, "-" * len(header)]
+    fmt = lambda v, spec: format(v, spec) if v is not None else "-"
+    for algo, r in sorted(report.items()):
+        lines.append(f"{algo:<6}{r['images']:>7}{fmt(r['p50_ms'], '.2f'):>9}{fmt(r['p95_ms'], '.2f'):>9}"
+                     f"{fmt(r['p99_ms'], '.2f'):>9}{fmt(r['err_mean'], '.3f'):>10}{fmt(r['err_max'], '.3f'):>10}"
+                     f"{r['missed']:>6}{r['false']:>6}{r['failed']:>9}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="金标准图像检测回归测试")
+    parser.add_argument("root", help="参考图像目录（含 annotations.json）")
+    parser.add_argument("--algos", nargs="+", default=sorted(ALGORITHMS), help="要测试的算法，默认全部")
+    parser.add_argument("--repeat", type=int, default=3, help="每张图重复检测次数")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument("--tol", type=float, default=10.0, help="质心与标注配对的最大距离（像素）")
+    parser.add_argument("--baseline", help=f"基线文件，默认 <root>/{BASELINE_FILE}")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果写为新基线")
+    parser.add_argument("--report", help="把本次报告写入该 JSON 文件")
+    parser.add_argument("--max-latency-regress", type=float, default=0.2,
+                        help="允许 p95 耗时比基线增加的比例，默认 0.2（20%%）")
+    parser.add_argument("--max-error-regress", type=float, default=0.1,
+                        help="允许平均质心误差比基线增加的像素数，默认 0.1")
+    args = parser.parse_args(argv)
+
+    if not find_images(args.root):
+        print(f"目录中没有参考图像: {args.root}")
+        return 2
+    report = evaluate(args.root, args.algos, args.repeat, args.workers, args.tol)
+    print(format_report(report))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    baseline_path = args.baseline or os.path.join(args.root, BASELINE_FILE)
+    if args.update_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已写入: {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        print(f"没有基线文件 {baseline_path}，请先用 --update-baseline 记录")
+        return 0
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    problems = compare(report, baseline, args.max_latency_regress, args.max_error_regress)
+    for p in problems:
+        print(f"【回归】{p}")
+    if problems:
+        return 1
+    print("与基线相比无回归")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
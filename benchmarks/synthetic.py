@@ -0,0 +1,118 @@
+# synthetic.py
+"""
+合成光斑图像生成器：高斯光斑、平顶（top-hat）光斑、多光斑，
+可叠加背景噪声、热像素和饱和，分辨率可配（640×512 红外到 Cam1 多百万像素）。
+没有激光器和相机时用来测速度和精度。
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# 常用分辨率 (高, 宽)
+RESOLUTIONS = {
+    "IR": (512, 640),        # Cam2 / Cam3 红外
+    "HD": (1080, 1920),
+    "Cam1": (2048, 2448),    # Cam1 多百万像素
+}
+
+@dataclass
+class SyntheticFrame:
+    """一帧合成图像及其真值"""
+    name: str
+    image: np.ndarray                       # uint8 单通道
+    truth: np.ndarray = field(default_factory=lambda: np.zeros((0, 3), np.float64))  # 每行 (x, y, sigma)
+    gaussian_width: bool = False            # 未饱和的高斯光斑：真值 D4σ = 4σ，可以检查宽度
+
+def _add_spot(canvas, x, y, sigma, amp, kind):
+    """只在光斑 ±5σ 的范围内累加，避免对整幅图逐像素求值"""
+    h, w = canvas.shape
+    half = int(np.ceil(5 * sigma))
+    x0, x1 = max(int(x) - half, 0), min(int(x) + half + 1, w)
+    y0, y1 = max(int(y) - half, 0), min(int(y) + half + 1, h)
+    if x0 >= x1 or y0 >= y1:
+        return
+    dx = (np.arange(x0, x1) - x)[None, :]
+    dy = (np.arange(y0, y1) - y)[:, None]
+    r2 = (dx * dx + dy * dy) / (2.0 * sigma * sigma)
+    if kind == "tophat":
+        # 10 阶超高斯，近似平顶光斑
+        canvas[y0:y1, x0:x1] += amp * np.exp(-r2 ** 5)
+    else:
+        canvas[y0:y1, x0:x1] += amp * np.exp(-r2)
+
+def make_frame(shape, spots, kind="gaussian", background=10.0, noise=3.0,
+               hot_pixels=0, saturate=False, seed=0, name="frame"):
+    """
+    按给定光斑生成一帧。spots 为 [(x, y, sigma, amp), ...]；
+    kind 为 "gaussian" 或 "tophat"；hot_pixels 为随机满幅热像素个数；
+    saturate=True 时整体放大 1.6 倍，使光斑中心削顶饱和。
+    """
+    rng = np.random.default_rng(seed)
+    h, w = shape
+    canvas = rng.normal(background, noise, (h, w)).astype(np.float32)
+    for x, y, sigma, amp in spots:
+        _add_spot(canvas, x, y, sigma, amp, kind)
+    if saturate:
+        canvas *= 1.6
+    if hot_pixels:
+        idx = rng.integers(0, h * w, hot_pixels)
+        canvas.flat[idx] = 255
+    image = np.clip(canvas, 0, 255).astype(np.uint8)
+    truth = np.array([(x, y, sigma) for x, y, sigma, _ in spots], np.float64).reshape(-1, 3)
+    return SyntheticFrame(name, image, truth, kind == "gaussian" and not saturate)
+
+def random_spots(shape, n_spots, rng, sigma_range=None, amp_range=(200.0, 230.0)):
+    """
+    随机生成互不重叠的光斑参数。亮度相近（都高于最亮光斑的 0.85 倍），保证都应被检测到；
+    sigma 默认按分辨率取 短边的 1%~3%。
+    """
+    h, w = shape
+    if sigma_range is None:
+        sigma_range = (min(h, w) * 0.01, min(h, w) * 0.03)
+    spots = []
+    for _ in range(100 * n_spots):
+        if len(spots) == n_spots:
+            break
+        sigma = rng.uniform(*sigma_range)
+        margin = 4 * sigma
+        x, y = rng.uniform(margin, w - margin), rng.uniform(margin, h - margin)
+        if all(np.hypot(x - x2, y - y2) > 6 * max(sigma, s2) for x2, y2, s2, _ in spots):
+            spots.append((x, y, sigma, rng.uniform(*amp_range)))
+    return spots
+
+def row_spots(shape, n_spots, rng, spacing=7.0, amp_range=(200.0, 230.0)):
+    """
+    n_spots 个相同 sigma 的光斑排成一行、圆心间距 spacing·σ，位于图像中部：
+    各光斑的 D4σ 积分窗口（±1.5·D4σ = ±6σ）必然伸进相邻光斑，用来检查多光斑时的质心和宽度
+    """
+    h, w = shape
+    sigma = min(h, w) * 0.02
+    y = h / 2.0 + rng.uniform(-sigma, sigma)
+    x0 = w / 2.0 - (n_spots - 1) * spacing * sigma / 2.0
+    return [(x0 + i * spacing * sigma, y, sigma, rng.uniform(*amp_range)) for i in range(n_spots)]
+
+def scenarios(resolutions=("IR", "HD", "Cam1"), frames=3, seed=0):
+    """
+    基准测试场景：每个分辨率下 单高斯 / 平顶 / 三光斑 / 三光斑紧排 / 噪声+热像素 / 饱和 各 frames 帧。
+    逐个产生 (场景名, [SyntheticFrame, ...])
+    """
+    cases = [
+        ("gaussian", dict(n_spots=1, kind="gaussian")),
+        ("tophat", dict(n_spots=1, kind="tophat")),
+        ("multi3", dict(n_spots=3, kind="gaussian")),
+        ("multi3_close", dict(n_spots=3, kind="gaussian", layout=row_spots)),
+        ("noisy_hot", dict(n_spots=2, kind="gaussian", noise=8.0, hot_pixels=200)),
+        ("saturated", dict(n_spots=2, kind="gaussian", saturate=True)),
+    ]
+    for res in resolutions:
+        shape = RESOLUTIONS[res] if isinstance(res, str) else tuple(res)
+        for case, params in cases:
+            params = dict(params)
+            n_spots = params.pop("n_spots")
+            layout = params.pop("layout", random_spots)
+            rng = np.random.default_rng(seed)
+            batch = []
+            for i in range(frames):
+                spots = layout(shape, n_spots, rng)
+                batch.append(make_frame(shape, spots, seed=seed + i, name=f"{res}/{case}", **params))
+            yield f"{res}/{case}", batch